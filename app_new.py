@@ -74,6 +74,9 @@ def create_app(config_name=None):
     # Register request/response hooks
     register_hooks(app)
     
+    # Register CLI commands
+    register_commands(app)
+    
     # Health check route
     @app.route('/health')
     def health_check():
@@ -86,6 +89,11 @@ def initialize_extensions(app):
     """Initialize Flask extensions with the app instance"""
     db.init_app(app)
     
+    from utils.notify_events import register_notification_events
+    register_notification_events()
+    from utils.access import register_access_events
+    register_access_events()
+    
     # Create tables if they don't exist
     with app.app_context():
         try:
@@ -143,6 +151,108 @@ def register_error_handlers(app):
         return redirect(request.url), 413
 
 
+def register_commands(app):
+    """Register maintenance commands for the flask CLI"""
+    import click
+    
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats():
+        """Recompute every workspace's dashboard counters from scratch"""
+        from utils.stats import reconcile_workspace_stats
+        count = reconcile_workspace_stats()
+        click.echo(f"Reconciled stats for {count} workspaces")
+    
+    @app.cli.command('backfill-thread-summaries')
+    def backfill_thread_summaries_command():
+        """Rebuild reply counts, unread counts and last-reply previews of every thread"""
+        from utils.threads import backfill_thread_summaries
+        count = backfill_thread_summaries()
+        click.echo(f"Backfilled summaries for {count} threads with replies")
+    
+    @app.cli.command('dispatch-outbox')
+    @click.option('--loop', is_flag=True, help='Keep polling instead of exiting once the due rows are sent')
+    def dispatch_outbox(loop):
+        """Deliver due notification outbox rows"""
+        import time
+        from utils.outbox import dispatch_due
+        batch_size = app.config.get('OUTBOX_BATCH_SIZE', 50)
+        total = 0
+        while True:
+            claimed = dispatch_due(batch_size)
+            total += claimed
+            if claimed < batch_size:
+                if not loop:
+                    break
+                time.sleep(app.config.get('OUTBOX_POLL_INTERVAL', 5))
+        click.echo(f"Dispatched {total} outbox rows")
+    
+    @app.cli.command('check-query-plans')
+    @click.option('--database-url', default=None, help='Extra database to check (seeded rows are rolled back)')
+    @click.option('--rows', default=5000, show_default=True, help='Messages to seed')
+    def check_query_plans(database_url, rows):
+        """EXPLAIN the Message queries and fail if any is not served by its expected indexes"""
+        from utils.query_plans import check_message_query_plans
+        # Always check SQLite; Postgres too when the app (or --database-url) uses it
+        targets = [None]
+        app_url = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+        if app_url.startswith('postgresql'):
+            targets.append(app_url)
+        if database_url:
+            targets.append(database_url)
+        
+        failed = False
+        for url in targets:
+            report = check_message_query_plans(url, rows=rows)
+            for name, plan in report['plans'].items():
+                status = 'UNEXPECTED PLAN' if name in report['regressions'] else 'ok'
+                click.echo(f"[{report['dialect']}] {name}: {status} (expects {', '.join(report['expected'][name])})")
+                for line in plan:
+                    click.echo(f"    {line}")
+            failed = failed or bool(report['regressions'])
+        if failed:
+            raise SystemExit(1)
+    
+    @app.cli.command('notify-fakes')
+    @click.option('--telegram-port', default=8081, show_default=True)
+    @click.option('--smtp-port', default=8025, show_default=True)
+    @click.option('--latency', default=0.0, show_default=True, help='Seconds each request takes')
+    @click.option('--error-rate', default=0.0, show_default=True, help='Share of requests that fail')
+    def notify_fakes(telegram_port, smtp_port, latency, error_rate):
+        """Run a fake Telegram Bot API and an SMTP sink until interrupted"""
+        import time
+        from utils.notify_bench import FakeTelegramServer, SMTPSink
+        telegram = FakeTelegramServer(port=telegram_port, latency=latency, error_rate=error_rate).start()
+        smtp = SMTPSink(port=smtp_port, latency=latency, error_rate=error_rate).start()
+        click.echo("Point the app at the stand-ins with:")
+        click.echo(f"    TELEGRAM_API_URL={telegram.url}")
+        click.echo(f"    ADMIN_SMTP_HOST={smtp.host} ADMIN_SMTP_PORT={smtp.port}")
+        click.echo("    NOTIFY_SMTP_STARTTLS=false")
+        try:
+            while True:
+                time.sleep(10)
+                click.echo(f"telegram {telegram.stats()}  smtp {smtp.stats()}")
+        except KeyboardInterrupt:
+            telegram.stop()
+            smtp.stop()
+    
+    @app.cli.command('bench-notifications')
+    @click.option('--count', default=2000, show_default=True, help='Notifications to send')
+    @click.option('--users', default=50, show_default=True, help='Distinct recipient users')
+    @click.option('--latency', default=0.0, show_default=True, help='Seconds each fake request takes')
+    @click.option('--error-rate', default=0.0, show_default=True, help='Share of fake requests that fail')
+    @click.option('--coalesce', is_flag=True, help='Keep the configured coalescing windows')
+    @click.option('--rate-limits', is_flag=True, help='Keep the configured rate limits')
+    def bench_notifications(count, users, latency, error_rate, coalesce, rate_limits):
+        """Push notifications through local Telegram/SMTP stand-ins and report throughput"""
+        from utils.notify_bench import run_notification_benchmark
+        report = run_notification_benchmark(
+            count=count, users=users, latency=latency, error_rate=error_rate,
+            coalesce=coalesce, rate_limits=rate_limits
+        )
+        for key, value in report.items():
+            click.echo(f"{key}: {value}")
+
+
 def register_hooks(app):
     """Register request/response hooks and context processors"""
     
@@ -151,29 +261,29 @@ def register_hooks(app):
         """Initialize request context"""
         # This will be used for session validation, rate limiting, etc.
         # Implementation will be in blueprints
-        pass
+        from utils.outbox import get_outbox_dispatcher
+        # Keep this worker's outbox dispatcher running (rows survive restarts)
+        dispatcher = get_outbox_dispatcher()
+        if dispatcher is not None:
+            dispatcher.ensure_running()
     
     @app.context_processor
     def inject_global_vars():
         """Consolidated professional context processor for all templates"""
         from utils.helpers import get_unread_messages_count, get_visitor_count, get_clients_stats
         from utils.ui_helpers import inject_blueprint_assets, get_page_specific_class
+        from utils.site_globals import lazy, get_user_theme, get_admin_social
         
         username = session.get('username')
         
-        # Get current theme
-        if username:
-            user_data = load_data(username=username)
-            current_theme = user_data.get('settings', {}).get('theme', 'luxury-gold')
-        else:
-            current_theme = 'luxury-gold'
+        # Cached, and only looked up when the template uses them
+        current_theme = lazy(lambda: get_user_theme(username))
         
         is_demo_mode = session.get('is_demo_mode', True)
         is_admin = session.get('is_admin', False)
         
-        # Load admin social links strictly for the main platform footer
-        admin_data = load_data(username='admin')
-        admin_social = admin_data.get('social', {})
+        # Admin social links strictly for the main platform footer
+        admin_social = lazy(get_admin_social)
 
         # Default Meta Tags for SEO
         default_meta = {
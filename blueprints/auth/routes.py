@@ -2,8 +2,11 @@
 Auth Routes - Authentication and authorization
 """
 
-from flask import render_template, session, redirect, url_for, request, flash
-from utils.security import get_admin_credentials, get_client_ip, log_ip_activity, log_audit_event
+from flask import render_template, session, redirect, url_for, request, flash, current_app
+from utils.security import (
+    get_admin_credentials, get_client_ip, log_ip_activity, log_audit_event,
+    check_rate_limit, rehash_password_if_needed
+)
 from utils.data import load_data
 from werkzeug.security import check_password_hash
 from models import User
@@ -21,6 +24,12 @@ def login():
         password = request.form.get('password')
         client_ip = get_client_ip()
 
+        # Only failed attempts are charged (below), so signing in never uses up the limit
+        if not check_rate_limit('login', count=False):
+            log_ip_activity('login_rate_limited', f"User: {username}")
+            flash('Too many login attempts. Please wait a few minutes and try again.', 'danger')
+            return render_template('dashboard/login.html'), 429
+
         # Check main Admin
         if username == ADMIN_CREDENTIALS.get('username') and ADMIN_CREDENTIALS.get('username'):
             if check_password_hash(ADMIN_CREDENTIALS['password_hash'], password):
@@ -37,6 +46,13 @@ def login():
         # Check users in database first
         db_user = User.query.filter_by(username=username).first()
         if db_user and check_password_hash(db_user.password_hash, password):
+            # Move the stored hash to the configured method/cost if they changed
+            if rehash_password_if_needed(db_user, password):
+                try:
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.warning(f"Could not rehash password for {username}: {str(e)}")
             session['admin_logged_in'] = True
             session['user_id'] = db_user.id
             session['username'] = db_user.username
@@ -81,6 +97,7 @@ def login():
                         must_change_password=user.get('must_change_password', False),
                         workspace_id=workspace.id
                     )
+                    rehash_password_if_needed(db_user, password)
                     db.session.add(db_user)
                     db.session.commit()
                     current_app.logger.info(f"Created DB user {username} with workspace {workspace.id}")
@@ -104,6 +121,7 @@ def login():
                 log_ip_activity('user_login', f"User: {username}")
                 return redirect(url_for('pages.index'))
 
+        check_rate_limit('login')
         flash('Invalid credentials. Please try again.', 'error')
         log_ip_activity('failed_login', f"Username: {username}")
 
@@ -5,19 +5,27 @@ Handles: All dashboard routes for managing portfolio, projects, clients, message
 
 import os
 import json
+import hashlib
 import shutil
 import requests
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from flask import render_template, session, redirect, url_for, request, flash, current_app, jsonify, send_file
-from utils.data import load_data, save_data
+from utils.data import load_data, save_data, get_user_by_username
+from utils.repositories import ProjectRepository, ClientRepository
+from utils.stats import adjust_workspace_stats, adjust_for_removed_messages, get_workspace_stats
+from utils.message_queries import inbox_query, internal_threads_query, replies_query, unread_notifications_query, notifications_version_query
+from utils.threads import record_reply, mark_thread_read, recompute_thread_summary
+from utils.access import bump_access_version, get_access_cache
 from utils.decorators import login_required, admin_required, disable_in_demo
 from utils.helpers import allowed_file, get_clients_stats, create_backup, get_backups_list
-from utils.security import get_admin_credentials, log_audit_event
-from utils.notifications import send_telegram_notification, get_telegram_credentials, load_smtp_config, send_event_notification_async, send_email
+from utils.security import get_admin_credentials, hash_password, log_audit_event
+from utils.notifications import get_telegram_credentials, load_smtp_config, send_event_notification_async, send_email
+from utils.credentials import get_notification_credentials, save_telegram_credentials, save_smtp_credentials
+from utils.outbox import new_outbox_entry, wake_outbox, get_outbox_summary, retry_dead_entries
 from utils.badges import determine_badge
-from models import User, db, Message
+from models import User, db, Message, Workspace
 from . import dashboard_bp
 
 
@@ -89,10 +97,11 @@ def calculate_account_diagnostics(user_data, username=None, current_is_demo=Fals
     # Check if verified user no longer meets requirements - demote them
     if username and not current_is_demo and current_is_verified and not can_upgrade:
         try:
-            user = User.query.filter_by(username=username).first()
+            user = get_user_by_username(username)
             if user and not user.is_demo and user.is_verified:
                 user.is_demo = True
                 user.is_verified = False
+                bump_access_version(user)
                 db.session.commit()
                 current_app.logger.warning(f"Demoted user {username} back to demo mode - requirements no longer met")
                 
@@ -108,10 +117,11 @@ def calculate_account_diagnostics(user_data, username=None, current_is_demo=Fals
     # Auto-upgrade user if completed and username provided
     elif can_upgrade and username and current_is_demo:
         try:
-            user = User.query.filter_by(username=username).first()
+            user = get_user_by_username(username)
             if user and user.is_demo:
                 user.is_demo = False
                 user.is_verified = True
+                bump_access_version(user)
                 db.session.commit()
                 current_app.logger.info(f"Auto-upgraded user {username} to full access")
                 
@@ -151,13 +161,15 @@ def calculate_account_diagnostics(user_data, username=None, current_is_demo=Fals
 @login_required
 def index():
     """Main dashboard page"""
-    from models import Workspace, Project, Skill, Client, VisitorLog, Service
+    from models import Workspace, WorkspaceStats, VisitorLog
     from datetime import datetime, timedelta
     
     username = session.get('username')
     user_id = session.get('user_id')
     is_admin = session.get('is_admin', False)
-    data = load_data(username=username)
+    # The admin page reads only platform totals; account diagnostics need
+    # the scalar fields plus the projects, services and skills lists
+    data = {} if is_admin else load_data(username=username, sections={'projects', 'services', 'skills'})
     
     current_app.logger.info(f"Dashboard index for {username}, is_admin={is_admin}, user_id={user_id}")
     current_app.logger.info(f"Loaded data keys: {list(data.keys()) if data else 'None'}")
@@ -167,11 +179,21 @@ def index():
         total_users = User.query.count()
         active_users = User.query.filter_by(is_active=True).count()
         total_workspaces = Workspace.query.count()
-        total_messages = Message.query.count()
-        unread_messages = Message.query.filter_by(is_read=False).count()
-        total_projects = Project.query.count()
-        total_clients = Client.query.count()
-        total_services = Service.query.count()
+        # Workspace counters summed in one query, plus platform-level messages
+        totals = db.session.query(
+            db.func.coalesce(db.func.sum(WorkspaceStats.messages), 0),
+            db.func.coalesce(db.func.sum(WorkspaceStats.unread_messages), 0),
+            db.func.coalesce(db.func.sum(WorkspaceStats.projects), 0),
+            db.func.coalesce(db.func.sum(WorkspaceStats.clients), 0),
+            db.func.coalesce(db.func.sum(WorkspaceStats.services), 0)
+        ).one()
+        platform_messages, platform_unread = db.session.query(
+            db.func.count(Message.id),
+            db.func.coalesce(db.func.sum(db.case((Message.is_read.is_(False), 1), else_=0)), 0)
+        ).filter(Message.workspace_id.is_(None)).one()
+        total_messages = totals[0] + platform_messages
+        unread_messages = totals[1] + platform_unread
+        total_projects, total_clients, total_services = totals[2], totals[3], totals[4]
         
         # Visitors in last 30 days
         thirty_days_ago = datetime.now() - timedelta(days=30)
@@ -194,7 +216,7 @@ def index():
         }
     else:
         # User statistics from database
-        user = User.query.filter_by(username=username).first()
+        user = get_user_by_username(username)
         if user:
             workspace_id = user.workspace_id
             if not workspace_id:
@@ -203,27 +225,10 @@ def index():
             else:
                 current_app.logger.info(f"Loading stats for user {username}, workspace_id: {workspace_id}")
                 
-                # Count user's data
-                user_projects = Project.query.filter_by(workspace_id=workspace_id).count()
-                user_skills = Skill.query.filter_by(workspace_id=workspace_id).count()
-                user_clients = Client.query.filter_by(workspace_id=workspace_id).count()
-                user_services = Service.query.filter_by(workspace_id=workspace_id).count()
-                user_messages = Message.query.filter_by(workspace_id=workspace_id).count()
-                user_unread = Message.query.filter_by(
-                    workspace_id=workspace_id,
-                    is_read=False
-                ).count()
-                
-                current_app.logger.info(f"User {username} stats: projects={user_projects}, skills={user_skills}, clients={user_clients}, services={user_services}, messages={user_messages}")
+                # Counters are maintained on every write, read them in one row
+                counters = get_workspace_stats(workspace_id)
                 
-                # Visitors
-                today = datetime.now().date()
-                today_visitors = VisitorLog.query.filter(
-                    VisitorLog.workspace_id == workspace_id,
-                    db.func.date(VisitorLog.created_at) == today
-                ).count()
-                
-                total_visitors = VisitorLog.query.filter_by(workspace_id=workspace_id).count()
+                current_app.logger.info(f"User {username} stats: {counters}")
                 
                 # Calculate account diagnostics for demo users and check verified users
                 account_diagnostics = None
@@ -232,14 +237,14 @@ def index():
                     account_diagnostics = calculate_account_diagnostics(user_data, username, user.is_demo, user.is_verified)
                 
                 stats = {
-                    'projects': user_projects,
-                    'skills': user_skills,
-                    'clients': user_clients,
-                    'services': user_services,
-                    'messages': user_messages,
-                    'unread_messages': user_unread,
-                    'visitors': total_visitors,
-                    'today_visitors': today_visitors,
+                    'projects': counters['projects'],
+                    'skills': counters['skills'],
+                    'clients': counters['clients'],
+                    'services': counters['services'],
+                    'messages': counters['messages'],
+                    'unread_messages': counters['unread_messages'],
+                    'visitors': counters['visitors_total'],
+                    'today_visitors': counters['visitors_today'],
                     'is_verified': user.is_verified,
                     'is_demo': user.is_demo,
                     'account_diagnostics': account_diagnostics
@@ -266,7 +271,7 @@ def index():
                     if not m.get('read', False)
                 ]),
                 'visitors': user_data.get('visitors', {}).get('total', 0),
-                'today_visitors': len(user_data.get('visitors', {}).get('today', [])),
+                'today_visitors': user_data.get('visitors', {}).get('today', 0),
                 'is_demo': is_demo,
                 'account_diagnostics': account_diagnostics
             }
@@ -373,8 +378,6 @@ def add_project():
     """Add new project"""
     username = session.get('username')
     if request.method == 'POST':
-        data = load_data(username=username)
-
         # Generate UUID for new project
         import uuid
         new_id = str(uuid.uuid4())
@@ -455,16 +458,14 @@ def add_project():
             ]
             new_project['skill_related'] = skill_related
 
-        if 'projects' not in data:
-            data['projects'] = []
-        data['projects'].append(new_project)
-
-        save_data(data, username=username)
+        if not ProjectRepository(username).add(new_project):
+            flash('Could not save project', 'error')
+            return redirect(url_for('dashboard.projects'))
         flash('Project added successfully', 'success')
         return redirect(url_for('dashboard.projects'))
 
     # Load user's services and skills for the form
-    data = load_data(username=username)
+    data = load_data(username=username, sections={'services', 'skills'})
     user_services = data.get('services', [])
     user_skills = data.get('skills', [])
     return render_template('dashboard/add_project.html', data=data, user_services=user_services, user_skills=user_skills)
@@ -476,10 +477,8 @@ def add_project():
 def edit_project(project_id):
     """Edit existing project"""
     username = session.get('username')
-    data = load_data(username=username)
-    project = next(
-        (p for p in data.get('projects', []) if str(p.get('id', '')) == str(project_id)),
-        None)
+    repository = ProjectRepository(username)
+    project = repository.get(project_id)
 
     if not project:
         flash('Project not found', 'error')
@@ -583,11 +582,14 @@ def edit_project(project_id):
             project.pop('service_id', None)
             project.pop('skill_related', None)
 
-        save_data(data, username=username)
+        if repository.update(project_id, project, replace=True) is None:
+            flash('Could not save project', 'error')
+            return redirect(url_for('dashboard.projects'))
         flash('Project updated successfully', 'success')
         return redirect(url_for('dashboard.projects'))
 
     # Load user's services and skills for the form
+    data = load_data(username=username, sections={'services', 'skills'})
     user_services = data.get('services', [])
     user_skills = data.get('skills', [])
     return render_template('dashboard/edit_project.html', project=project, data=data, user_services=user_services, user_skills=user_skills)
@@ -599,11 +601,9 @@ def edit_project(project_id):
 def delete_project(project_id):
     """Delete project"""
     username = session.get('username')
-    data = load_data(username=username)
-    data['projects'] = [
-        p for p in data.get('projects', []) if str(p.get('id', '')) != str(project_id)
-    ]
-    save_data(data, username=username)
+    if not ProjectRepository(username).delete(project_id):
+        flash('Project not found', 'error')
+        return redirect(url_for('dashboard.projects'))
     flash('Project deleted successfully', 'success')
     return redirect(url_for('dashboard.projects'))
 
@@ -710,6 +710,8 @@ def settings():
     smtp_port = smtp_cfg.get('port', '')
     smtp_email = smtp_cfg.get('email', '')
     smtp_status = bool(all([smtp_host, smtp_port, smtp_email, smtp_cfg.get('password')]))
+    workspace_id = db.session.query(Workspace.id).filter_by(slug=username).scalar()
+    outbox = get_outbox_summary(workspace_id) if workspace_id else None
 
     return render_template(
         'dashboard/settings.html',
@@ -723,11 +725,28 @@ def settings():
         smtp_port=smtp_port,
         smtp_email=smtp_email,
         smtp_status=smtp_status,
+        outbox=outbox,
         is_demo_mode=is_demo_mode,
         is_admin=is_admin,
     )
 
 
+@dashboard_bp.route('/outbox/retry', methods=['POST'])
+@login_required
+@disable_in_demo
+def retry_outbox():
+    """Queue dead-lettered notifications of the current user for delivery again"""
+    username = session.get('username')
+    workspace_id = db.session.query(Workspace.id).filter_by(slug=username).scalar()
+    if workspace_id:
+        count = retry_dead_entries(workspace_id)
+        db.session.commit()
+        if count:
+            wake_outbox()
+        flash(f'{count} failed notification(s) queued for delivery', 'success')
+    return redirect(url_for('dashboard.settings'))
+
+
 @dashboard_bp.route('/telegram', methods=['POST'])
 @login_required
 @disable_in_demo
@@ -763,17 +782,10 @@ def telegram_settings():
             flash('Invalid Telegram Chat ID or permission denied. Please check and try again.', 'error')
             return redirect(url_for('dashboard.settings'))
 
-        # Save to user data (per-user configuration)
-        data = load_data(username=username)
-        if 'notifications' not in data:
-            data['notifications'] = {}
-
-        data['notifications']['telegram'] = {
-            'bot_token': bot_token,
-            'chat_id': chat_id,
-            'configured_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        save_data(data, username=username)
+        # Save to the user's notification settings (per-user configuration)
+        if not save_telegram_credentials(username, bot_token, chat_id):
+            flash('Could not save Telegram settings. Please try again.', 'error')
+            return redirect(url_for('dashboard.settings'))
 
         flash('✅ Telegram notifications configured successfully for your portfolio! Check your Telegram for a test message.', 'success')
 
@@ -848,21 +860,19 @@ def smtp_settings():
         return redirect(url_for('dashboard.settings'))
 
     try:
-        # Save to user data (per-user configuration)
-        data = load_data(username=username)
-        if 'notifications' not in data:
-            data['notifications'] = {}
-
-        data['notifications']['smtp'] = {
+        # Save to the user's notification settings (per-user configuration)
+        saved = save_smtp_credentials(username, {
             'host': smtp_host,
             'port': smtp_port,
             'email': smtp_email,
             'password': smtp_password,
             'configured_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        save_data(data, username=username)
+        })
 
-        flash('✅ SMTP settings saved successfully for your portfolio!', 'success')
+        if saved:
+            flash('✅ SMTP settings saved successfully for your portfolio!', 'success')
+        else:
+            flash('Could not save SMTP settings. Please try again.', 'error')
     except Exception as e:
         current_app.logger.error(f"SMTP configuration error: {str(e)}")
         flash('An error occurred. Please try again.', 'error')
@@ -886,8 +896,7 @@ def email_test_connection():
         return jsonify({'success': False, 'error': 'SMTP not configured'})
 
     try:
-        user_data = load_data(username=username)
-        user_email = smtp_config.get('email') or user_data.get('contact', {}).get('email')
+        user_email = smtp_config.get('email') or get_notification_credentials(username).contact_email
         
         if not user_email:
             return jsonify({'success': False, 'error': 'No recipient email found'})
@@ -958,11 +967,6 @@ def add_client():
             prefill = message
 
     if request.method == 'POST':
-        data = load_data(username=username)
-
-        if 'clients' not in data:
-            data['clients'] = []
-
         # Generate UUID for new client
         import uuid
         new_id = str(uuid.uuid4())
@@ -984,16 +988,17 @@ def add_client():
             'status_updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
-        data['clients'].append(new_client)
-        save_data(data, username=username)
-
-        send_telegram_notification(
+        notification = new_outbox_entry(
+            'client_added',
             f"📊 <b>New Lead Added</b>\n\n"
             f"👤 {new_client['name']}\n"
             f"📧 {new_client['email']}\n"
             f"📋 {new_client['project_title']}\n"
-            f"💰 ${new_client['price'] if new_client['price'] else 'TBD'}",
-            username=username)
+            f"💰 ${new_client['price'] if new_client['price'] else 'TBD'}")
+        if not ClientRepository(username).add(new_client, extra_rows=[notification]):
+            flash('Could not save client', 'error')
+            return redirect(url_for('dashboard.clients'))
+        wake_outbox()
 
         flash('Client added successfully', 'success')
         return redirect(url_for('dashboard.clients'))
@@ -1007,9 +1012,8 @@ def add_client():
 def edit_client(client_id):
     """Edit existing client"""
     username = session.get('username')
-    data = load_data(username=username)
-    client = next(
-        (c for c in data.get('clients', []) if str(c.get('id', '')) == str(client_id)), None)
+    repository = ClientRepository(username)
+    client = repository.get(client_id)
 
     if not client:
         flash('Client not found', 'error')
@@ -1018,6 +1022,7 @@ def edit_client(client_id):
     if request.method == 'POST':
         old_status = client.get('status', 'lead')
         new_status = request.form.get('status', 'lead')
+        notifications = []
 
         client['name'] = request.form.get('name', '').strip()
         client['email'] = request.form.get('email', '').strip()
@@ -1039,15 +1044,19 @@ def edit_client(client_id):
                 'in-progress': '⚙️',
                 'delivered': '✅'
             }
-            send_telegram_notification(
+            notifications.append(new_outbox_entry(
+                'client_status',
                 f"{status_emoji.get(new_status, '📊')} <b>Client Status Updated</b>\n\n"
                 f"👤 {client['name']}\n"
                 f"📋 {client['project_title']}\n"
                 f"📍 {old_status.title()} → {new_status.replace('-', ' ').title()}\n"
-                f"💰 ${client['price'] if client['price'] else 'TBD'}",
-                username=username)
+                f"💰 ${client['price'] if client['price'] else 'TBD'}"))
 
-        save_data(data, username=username)
+        if repository.update(client_id, client, replace=True, extra_rows=notifications) is None:
+            flash('Could not save client', 'error')
+            return redirect(url_for('dashboard.clients'))
+        if notifications:
+            wake_outbox()
         flash('Client updated successfully', 'success')
         return redirect(url_for('dashboard.clients'))
 
@@ -1059,9 +1068,7 @@ def edit_client(client_id):
 def view_client(client_id):
     """View client details"""
     username = session.get('username')
-    data = load_data(username=username)
-    client = next(
-        (c for c in data.get('clients', []) if str(c.get('id', '')) == str(client_id)), None)
+    client = ClientRepository(username).get(client_id)
 
     if not client:
         flash('Client not found', 'error')
@@ -1076,11 +1083,9 @@ def view_client(client_id):
 def delete_client(client_id):
     """Delete client"""
     username = session.get('username')
-    data = load_data(username=username)
-    data['clients'] = [
-        c for c in data.get('clients', []) if str(c.get('id', '')) != str(client_id)
-    ]
-    save_data(data, username=username)
+    if not ClientRepository(username).delete(client_id):
+        flash('Client not found', 'error')
+        return redirect(url_for('dashboard.clients'))
     flash('Client deleted successfully', 'success')
     return redirect(url_for('dashboard.clients'))
 
@@ -1098,35 +1103,13 @@ def messages():
     try:
         from models import Workspace
         
-        if is_admin:
-            # Admin inbox: platform messages only (NOT internal)
-            query = Message.query.filter(
-                Message.category != 'internal',  # Exclude internal
-                db.or_(
-                    Message.workspace_id.is_(None),  # Platform messages
-                    Message.category == 'platform'
-                )
-            )
-        else:
-            # User inbox: portfolio messages only (NOT internal)
-            user = User.query.filter_by(username=username).first()
-            if user:
-                query = Message.query.filter(
-                    Message.workspace_id == user.workspace_id,
-                    Message.category != 'internal'  # Exclude internal
-                )
-            else:
-                query = Message.query.filter(Message.id.is_(None))  # Empty query
-        
-        # Filter by category (only portfolio or platform allowed)
-        if category != 'all' and category != 'internal':
-            query = query.filter(Message.category == category)
-        
-        # Exclude replies (only show main messages)
-        query = query.filter(Message.parent_id.is_(None))
-        
-        # Order by date descending
-        db_messages = query.order_by(Message.created_at.desc()).all()
+        # Admin inbox holds platform messages, users see their portfolio messages
+        user = None if is_admin else get_user_by_username(username)
+        db_messages = inbox_query(
+            workspace_id=user.workspace_id if user else None,
+            is_admin=is_admin,
+            category=category
+        ).all()
         
         # Convert to dict format for template compatibility
         all_messages = []
@@ -1171,40 +1154,16 @@ def internal_messages():
     try:
         if is_admin:
             # Admin sees internal conversations (main messages only, not replies)
-            db_messages = Message.query.filter(
-                Message.category == 'internal',
-                Message.parent_id.is_(None),  # Only main messages
-                db.or_(
-                    Message.receiver_id == 'admin',
-                    Message.sender_role == 'admin'
-                )
-            ).order_by(Message.created_at.desc()).all()
+            db_messages = internal_threads_query(is_admin=True).all()
         else:
             # User sees their internal conversations
-            user = User.query.filter_by(username=username).first()
-            if user:
-                db_messages = Message.query.filter(
-                    Message.category == 'internal',
-                    Message.parent_id.is_(None),  # Only main messages
-                    db.or_(
-                        Message.sender_id == str(user.id),
-                        Message.receiver_id == str(user.id),
-                        Message.name == username
-                    )
-                ).order_by(Message.created_at.desc()).all()
-            else:
-                db_messages = []
+            user = get_user_by_username(username)
+            db_messages = internal_threads_query(user).all() if user else []
         
-        # Convert to dict format with reply count
+        # Convert to dict format; reply counts come from the thread summary columns
         all_messages = []
         for msg in db_messages:
-            # Count replies for this conversation
-            reply_count = Message.query.filter_by(parent_id=msg.id).count()
-            # Count unread replies
-            unread_replies = Message.query.filter(
-                Message.parent_id == msg.id,
-                Message.is_read == False
-            ).count()
+            unread_replies = msg.admin_unread_count if is_admin else msg.user_unread_count
             
             # Determine conversation partner name
             if is_admin:
@@ -1225,8 +1184,10 @@ def internal_messages():
                 'date': msg.created_at.strftime('%Y-%m-%d %H:%M:%S') if msg.created_at else '',
                 'display_name': partner_name,
                 'display_email': msg.email or '',
-                'reply_count': reply_count,
-                'unread_count': unread_replies + (0 if msg.is_read else 1)
+                'reply_count': msg.reply_count or 0,
+                'unread_count': (unread_replies or 0) + (0 if msg.is_read else 1),
+                'last_reply_date': msg.last_reply_at.strftime('%Y-%m-%d %H:%M:%S') if msg.last_reply_at else '',
+                'last_reply_preview': msg.last_reply_preview or ''
             })
         
         current_app.logger.info(f"Loaded {len(all_messages)} internal conversations from DB")
@@ -1266,6 +1227,8 @@ def internal_send():
     is_admin = session.get('is_admin', False)
     receiver_id = request.form.get('receiver_id')
     message_content = request.form.get('message')
+    # Optional: continue an existing conversation instead of starting one
+    parent_id = request.form.get('parent_id') or None
     
     if not message_content:
         flash('Message content cannot be empty.', 'danger')
@@ -1278,12 +1241,20 @@ def internal_send():
         sender_role = 'admin' if is_admin else 'user'
         
         # Get sender's workspace
-        sender_user = User.query.filter_by(username=username).first()
+        sender_user = get_user_by_username(username)
         sender_workspace_id = sender_user.workspace_id if sender_user else None
         
+        parent_message = None
+        if parent_id:
+            parent_message = Message.query.filter_by(id=parent_id, category='internal', parent_id=None).first()
+            if not parent_message:
+                flash('Original message not found.', 'danger')
+                return redirect(url_for('dashboard.internal_messages'))
+        
         # Create message in database
         new_message = Message(
             workspace_id=sender_workspace_id,
+            parent_id=parent_message.id if parent_message else None,
             name=username,
             email=session.get('email', ''),
             message=message_content[:5000],
@@ -1295,6 +1266,9 @@ def internal_send():
         )
         
         db.session.add(new_message)
+        adjust_workspace_stats(sender_workspace_id, messages=1, unread_messages=1)
+        if parent_message:
+            record_reply(parent_message, new_message)
         db.session.commit()
         
         current_app.logger.info(f"Internal message saved to DB, message_id: {new_message.id}")
@@ -1312,10 +1286,13 @@ def internal_send():
                 send_user_notification(
                     username=receiver_user.username,
                     subject="New Internal Message",
-                    message_text=f"From: {username}\n\nMessage: {message_content[:200]}"
+                    message_text=f"From: {username}\n\nMessage: {message_content[:200]}",
+                    category='message'
                 )
         
         flash('Message sent successfully.', 'success')
+        if parent_message:
+            return redirect(url_for('dashboard.internal_view', message_id=parent_message.id))
         return redirect(url_for('dashboard.internal_messages'))
     except Exception as e:
         current_app.logger.error(f"Error sending internal message: {str(e)}")
@@ -1340,9 +1317,13 @@ def internal_view(message_id):
             flash('Message not found.', 'danger')
             return redirect(url_for('dashboard.internal_messages'))
         
-        # Mark as read
+        # Mark as read, along with the replies waiting for this side
+        changed = mark_thread_read(db_message, is_admin)
         if not db_message.is_read:
             db_message.is_read = True
+            adjust_workspace_stats(db_message.workspace_id, unread_messages=-1)
+            changed = True
+        if changed:
             db.session.commit()
         
         # Convert to dict
@@ -1361,7 +1342,7 @@ def internal_view(message_id):
         }
         
         # Get replies from database
-        db_replies = Message.query.filter_by(parent_id=message_id).order_by(Message.created_at.asc()).all()
+        db_replies = replies_query(message_id).all()
         replies = []
         for r in db_replies:
             replies.append({
@@ -1426,7 +1407,7 @@ def reply_message(message_id):
             receiver_id = original_sender_id
         
         # Get sender's workspace
-        sender_user = User.query.filter_by(username=username).first()
+        sender_user = get_user_by_username(username)
         sender_workspace_id = sender_user.workspace_id if sender_user else parent_message.workspace_id
         
         # Create reply in database
@@ -1444,6 +1425,8 @@ def reply_message(message_id):
         )
         
         db.session.add(reply)
+        adjust_workspace_stats(sender_workspace_id, messages=1, unread_messages=1)
+        record_reply(parent_message, reply)
         db.session.commit()
         
         current_app.logger.info(f"Reply saved to DB, reply_id: {reply.id}, parent: {message_id}")
@@ -1464,7 +1447,8 @@ def reply_message(message_id):
                 send_user_notification(
                     username=receiver_user.username,
                     subject="New Reply to Your Message",
-                    message_text=f"From: {username}\n\nReply: {reply_content[:200]}"
+                    message_text=f"From: {username}\n\nReply: {reply_content[:200]}",
+                    category='message'
                 )
         
         flash('Reply sent successfully.', 'success')
@@ -1500,14 +1484,18 @@ def view_message(message_id):
         
         # Verify access (admin can see all, user can see their workspace messages)
         if not is_admin:
-            user = User.query.filter_by(username=username).first()
+            user = get_user_by_username(username)
             if user and db_message.workspace_id != user.workspace_id:
                 flash('Message not found', 'error')
                 return redirect(url_for('dashboard.messages'))
         
-        # Mark as read
+        # Mark as read, along with the replies waiting for this side
+        changed = mark_thread_read(db_message, is_admin)
         if not db_message.is_read:
             db_message.is_read = True
+            adjust_workspace_stats(db_message.workspace_id, unread_messages=-1)
+            changed = True
+        if changed:
             db.session.commit()
         
         # Convert to dict for template
@@ -1532,7 +1520,7 @@ def view_message(message_id):
         }
         
         # Get replies from database
-        db_replies = Message.query.filter_by(parent_id=message_id).order_by(Message.created_at.asc()).all()
+        db_replies = replies_query(message_id).all()
         replies = []
         for r in db_replies:
             replies.append({
@@ -1586,16 +1574,27 @@ def delete_message(message_id):
         
         # Verify access
         if not is_admin:
-            user = User.query.filter_by(username=username).first()
+            user = get_user_by_username(username)
             if user and db_message.workspace_id != user.workspace_id:
                 flash('Message not found', 'error')
                 return redirect(url_for('dashboard.messages'))
         
         # Delete replies first
-        Message.query.filter_by(parent_id=message_id).delete()
+        replies_query = Message.query.filter_by(parent_id=message_id)
+        adjust_for_removed_messages(replies_query)
+        replies_query.delete()
         
         # Delete message
+        adjust_workspace_stats(
+            db_message.workspace_id,
+            messages=-1,
+            unread_messages=0 if db_message.is_read else -1
+        )
         db.session.delete(db_message)
+        if db_message.parent_id:
+            # A single reply was removed; refresh its thread summary
+            db.session.flush()
+            recompute_thread_summary(db_message.parent_id)
         db.session.commit()
         
         current_app.logger.info(f"Deleted message {message_id} from DB")
@@ -1616,19 +1615,25 @@ def delete_message(message_id):
 @disable_in_demo
 def users():
     """Manage users and permissions (Admin only)"""
-    # Get users from database
-    db_users = User.query.all()
+    from models import WorkspaceStats
+    
+    # Get users from database with their workspace counters in one query
+    db_users = db.session.query(User, WorkspaceStats).outerjoin(
+        WorkspaceStats, WorkspaceStats.workspace_id == User.workspace_id
+    ).all()
     users_list = []
     
-    for user in db_users:
+    for user, workspace_stats in db_users:
         # Get user stats
-        user_data = load_data(username=user.username)
+        counters = get_workspace_stats(user.workspace_id) if workspace_stats is None else {
+            field: getattr(workspace_stats, field) for field in ('skills', 'projects', 'services', 'clients', 'messages')
+        }
         stats = {
-            'skills_count': len(user_data.get('skills', [])),
-            'projects_count': len(user_data.get('projects', [])),
-            'services_count': len(user_data.get('services', [])),
-            'clients_count': len(user_data.get('clients', [])),
-            'messages_count': len(user_data.get('messages', []))
+            'skills_count': counters['skills'],
+            'projects_count': counters['projects'],
+            'services_count': counters['services'],
+            'clients_count': counters['clients'],
+            'messages_count': counters['messages']
         }
         
         # Create user dict with stats
@@ -1749,7 +1754,7 @@ def add_user():
     new_user = {
         'id': new_id,
         'username': username,
-        'password_hash': generate_password_hash(password),
+        'password_hash': hash_password(password),
         'email': email,
         'role': role,
         'is_demo': is_demo,
@@ -1817,6 +1822,7 @@ def add_user():
             existing_db_user.role = role
             existing_db_user.is_demo = is_demo
             existing_db_user.must_change_password = True
+            bump_access_version(existing_db_user)
         else:
             db_user = User(username=username,
                            password_hash=new_user['password_hash'],
@@ -1856,6 +1862,7 @@ def toggle_user_demo(user_id):
     
     # Toggle demo status
     user.is_demo = not user.is_demo
+    bump_access_version(user)
     db.session.commit()
     
     flash(f'User {user.username} access updated to {"Demo Mode" if user.is_demo else "Full Access"}.', 'success')
@@ -1866,7 +1873,8 @@ def toggle_user_demo(user_id):
     send_user_notification(
         user.username,
         "Access Level Changed",
-        f"Your account access level has been updated to: <b>{access_type}</b>.\n\n<i>Advice: {advice}</i>"
+        f"Your account access level has been updated to: <b>{access_type}</b>.\n\n<i>Advice: {advice}</i>",
+        category='account'
     )
     
     return redirect(url_for('dashboard.view_user', user_id=user_id))
@@ -1886,6 +1894,7 @@ def delete_user(user_id):
             return redirect(url_for('dashboard.users'))
         
         # Delete from database
+        get_access_cache().invalidate(user.username)
         db.session.delete(user)
         db.session.commit()
         
@@ -1958,7 +1967,8 @@ def toggle_user_verification(user_id):
             send_user_notification(
                 target_user['username'],
                 "Portfolio Verified",
-                "Congratulations! Your professional portfolio has been officially verified by the Academy. Your proof-of-work is now showcased in our elite gallery.\n\n<i>Advice: Keep your portfolio updated with your latest high-impact projects to maintain your elite standing.</i>"
+                "Congratulations! Your professional portfolio has been officially verified by the Academy. Your proof-of-work is now showcased in our elite gallery.\n\n<i>Advice: Keep your portfolio updated with your latest high-impact projects to maintain your elite standing.</i>",
+                category='account'
             )
         else:
             target_user['is_verified'] = False
@@ -1968,7 +1978,8 @@ def toggle_user_verification(user_id):
             send_user_notification(
                 target_user['username'],
                 "Verification Status Updated",
-                "Your verification status has been updated. Please review your dashboard for required standards.\n\n<i>Advice: Ensure you have at least 3 high-quality projects and complete profile information to regain verification.</i>"
+                "Your verification status has been updated. Please review your dashboard for required standards.\n\n<i>Advice: Ensure you have at least 3 high-quality projects and complete profile information to regain verification.</i>",
+                category='account'
             )
 
         save_data(data)
@@ -1978,6 +1989,7 @@ def toggle_user_verification(user_id):
             user_obj = User.query.get(str(user_id))
             if user_obj:
                 user_obj.is_verified = target_user['is_verified']
+                bump_access_version(user_obj)
                 db.session.commit()
         except Exception as e:
             current_app.logger.error(f"Error syncing verification to DB: {str(e)}")
@@ -2036,7 +2048,7 @@ def change_password():
                     return render_template('dashboard/change_password.html')
 
                 # Update database user password
-                db_user.password_hash = generate_password_hash(new_password)
+                db_user.password_hash = hash_password(new_password)
                 db_user.must_change_password = False
                 db.session.commit()
 
@@ -2059,7 +2071,7 @@ def change_password():
                             flash('Current password is incorrect', 'error')
                             return render_template('dashboard/change_password.html')
 
-                        user['password_hash'] = generate_password_hash(new_password)
+                        user['password_hash'] = hash_password(new_password)
                         # Clear force flag after successful change
                         user['must_change_password'] = False
                         save_data(data)
@@ -2214,6 +2226,39 @@ def chat(user_id=None):
     return redirect(url_for('dashboard.messages'))
 
 
+def _notification_feed(user=None, is_admin=False):
+    """Latest unread notifications for the dropdown, as JSON-ready dicts"""
+    if is_admin:
+        # Admin sees: platform messages + internal messages to admin
+        unread_messages = unread_notifications_query(is_admin=True).limit(10).all()
+    else:
+        # User sees: portfolio messages + internal messages RECEIVED (not sent)
+        unread_messages = unread_notifications_query(user).limit(10).all()
+    
+    notifications = []
+    for msg in unread_messages:
+        # For internal messages, the "thread ID" to link to is the parent_id (if it's a reply) or its own ID (if it's a parent)
+        thread_id = msg.parent_id if msg.parent_id else msg.id
+        
+        notifications.append({
+            'id': msg.id,
+            'thread_id': thread_id,
+            'name': msg.name or 'Unknown',
+            'message': (msg.message[:50] + '...') if msg.message and len(msg.message) > 50 else (msg.message or ''),
+            'category': msg.category or 'portfolio',
+            'time': msg.created_at.strftime('%H:%M') if msg.created_at else ''
+        })
+    return notifications
+
+
+def _notification_etag(user=None, is_admin=False):
+    """Validator of the notification feed, from one aggregate query"""
+    count, latest = notifications_version_query(user, is_admin).one()
+    viewer = 'admin' if is_admin else user.id
+    token = f"{viewer}:{count}:{latest.isoformat() if latest else ''}"
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:20]
+
+
 @dashboard_bp.route('/notifications/latest')
 def get_latest_notifications():
     """Fetch latest unread notifications - includes inbox AND internal messages"""
@@ -2224,65 +2269,89 @@ def get_latest_notifications():
         if not username:
             return jsonify([])
         
-        if is_admin:
-            # Admin sees: platform messages + internal messages to admin
-            unread_messages = Message.query.filter(
-                Message.is_read == False,
-                Message.parent_id.is_(None),  # Only main messages, not replies
-                db.or_(
-                    Message.workspace_id.is_(None),  # Platform messages
-                    Message.receiver_id == 'admin',  # Messages/internal to admin
-                    Message.category == 'platform'
-                )
-            ).order_by(Message.created_at.desc()).limit(10).all()
-        else:
-            # User sees: portfolio messages + internal messages RECEIVED (not sent)
-            user = User.query.filter_by(username=username).first()
+        user = None
+        if not is_admin:
+            user = get_user_by_username(username)
             if not user:
                 return jsonify([])
-            
-            unread_messages = Message.query.filter(
-                Message.is_read == False,
-                Message.parent_id.is_(None),  # Only main messages
-                db.or_(
-                    # Portfolio messages from visitors (sender_id is NULL or not user)
-                    db.and_(
-                        Message.workspace_id == user.workspace_id,
-                        Message.category == 'portfolio',
-                        db.or_(
-                            Message.sender_id.is_(None),  # Visitor messages
-                            Message.sender_id != str(user.id)  # Not from self
-                        )
-                    ),
-                    # Internal messages FROM admin TO user
-                    db.and_(
-                        Message.category == 'internal',
-                        Message.sender_role == 'admin',
-                        Message.receiver_id == str(user.id)
-                    )
-                )
-            ).order_by(Message.created_at.desc()).limit(10).all()
-        
-        notifications = []
-        for msg in unread_messages:
-            # For internal messages, the "thread ID" to link to is the parent_id (if it's a reply) or its own ID (if it's a parent)
-            thread_id = msg.parent_id if msg.parent_id else msg.id
-            
-            notifications.append({
-                'id': msg.id,
-                'thread_id': thread_id,
-                'name': msg.name or 'Unknown',
-                'message': (msg.message[:50] + '...') if msg.message and len(msg.message) > 50 else (msg.message or ''),
-                'category': msg.category or 'portfolio',
-                'time': msg.created_at.strftime('%H:%M') if msg.created_at else ''
-            })
         
-        return jsonify(notifications)
+        # Unchanged polls cost the version query and an empty 304
+        etag = _notification_etag(user, is_admin)
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = jsonify(_notification_feed(user, is_admin))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         current_app.logger.error(f"Error fetching notifications: {str(e)}")
         return jsonify([]), 500
 
 
+@dashboard_bp.route('/notifications/stream')
+def notifications_stream():
+    """
+    Server-sent events carrying the notification feed whenever it changes
+    
+    Answers 204 (EventSource stops, the page falls back to polling) when
+    the server cannot hold streams or this worker is at its limit.
+    """
+    import time
+    from flask import Response, stream_with_context
+    from utils.notify_events import get_notification_signal, stream_available, viewer_audiences
+    
+    username = session.get('username')
+    is_admin = session.get('is_admin', False)
+    if not username or not stream_available(request.environ):
+        return '', 204
+    user = None
+    if not is_admin:
+        user = get_user_by_username(username)
+        if not user:
+            return '', 204
+    
+    signal = get_notification_signal()
+    if not signal.open_stream():
+        return '', 204
+    keys = viewer_audiences(user, is_admin)
+    config = current_app.config
+    check_interval = config.get('NOTIFY_STREAM_CHECK_INTERVAL', 15)
+    deadline = time.monotonic() + config.get('NOTIFY_STREAM_MAX_AGE', 300)
+    
+    def generate():
+        try:
+            # The browser reconnects this long after the stream ends
+            yield f"retry: {int(config.get('NOTIFY_STREAM_RETRY', 3) * 1000)}\n\n"
+            # A reconnecting browser sends the id of the last feed it got
+            last_etag = request.headers.get('Last-Event-ID')
+            while True:
+                snapshot = signal.snapshot(keys)
+                etag = _notification_etag(user, is_admin)
+                if etag != last_etag:
+                    body = json.dumps(_notification_feed(user, is_admin))
+                    chunk = f"id: {etag}\nevent: notifications\ndata: {body}\n\n"
+                    last_etag = etag
+                else:
+                    chunk = ": keep-alive\n\n"
+                # Hand the connection back to the pool while waiting
+                db.session.close()
+                yield chunk
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                signal.wait(keys, snapshot, min(check_interval, remaining))
+        except Exception as e:
+            current_app.logger.error(f"Notification stream error: {str(e)}")
+        finally:
+            signal.close_stream()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep nginx from buffering the stream
+    })
+
+
 @dashboard_bp.route('/admin/test-notifications', methods=['POST'])
 @admin_required
 def admin_test_notifications():
@@ -2292,10 +2361,69 @@ def admin_test_notifications():
         
         send_admin_notification(
             'Admin Notification Test',
-            'This is a test notification to verify that admin Telegram and SMTP settings are working correctly.'
+            'This is a test notification to verify that admin Telegram and SMTP settings are working correctly.',
+            coalesce=False
         )
         
         return jsonify({'success': True, 'message': 'Test notification sent successfully'})
     except Exception as e:
         current_app.logger.error(f"Admin notification test error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@dashboard_bp.route('/admin/<name>-stats')
+@login_required
+@admin_required
+def admin_component_stats(name):
+    """
+    Counters of one per-worker component, for this worker (Admin only)
+
+    name is cache (portfolio cache), page-cache, visitor-buffer, rate-limit
+    or notification (delivery pool, plus credentials cache, outbox totals
+    and live stream).
+    """
+    from utils.cache import get_portfolio_cache
+    from utils.page_cache import get_page_cache
+    from utils.visits import get_visit_buffer
+    from utils.ratelimit import get_rate_limiter
+    from utils.delivery import get_delivery_pool
+    
+    components = {
+        'cache': get_portfolio_cache,
+        'page-cache': get_page_cache,
+        'visitor-buffer': get_visit_buffer,
+        'rate-limit': get_rate_limiter,
+        'notification': get_delivery_pool
+    }
+    if name not in components:
+        return jsonify({'error': f"Unknown component '{name}'"}), 404
+    component = components[name]()
+    if component is None:
+        return jsonify({'enabled': False})
+    stats = component.stats()
+    if name == 'notification':
+        from utils.credentials import get_credentials_cache
+        from utils.outbox import get_outbox_counts
+        from utils.notify_events import get_notification_signal
+        
+        stats['credentials_cache'] = get_credentials_cache().stats()
+        stats['outbox'] = get_outbox_counts()
+        stats['live_stream'] = get_notification_signal().stats()
+    stats['enabled'] = True
+    stats['pid'] = os.getpid()
+    return jsonify(stats)
+
+
+@dashboard_bp.route('/admin/security-log')
+@login_required
+@admin_required
+def admin_security_log():
+    """Page through the audit or IP activity log, newest first (Admin only)"""
+    from utils.security import get_security_log_page, SECURITY_LOGS
+    
+    log = request.args.get('log', 'audit')
+    if log not in SECURITY_LOGS:
+        return jsonify({'error': f"Unknown log '{log}'"}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    entries, next_cursor = get_security_log_page(log, limit, request.args.get('cursor'))
+    return jsonify({'log': log, 'entries': entries, 'next_cursor': next_cursor})
@@ -4,7 +4,7 @@ Pages Routes - Public static pages
 
 from datetime import datetime
 from flask import render_template, session, redirect, url_for, request, flash, send_file, current_app
-from utils.data import load_data
+from utils.directory import get_directory_page, iter_directory
 from . import pages_bp
 
 
@@ -13,21 +13,16 @@ def index():
     """Landing page - shows academy and portfolios"""
     is_logged_in = 'admin_logged_in' in session
     username = session.get('username')
-    data = load_data()
-    portfolios = data.get('portfolios', {})
-    users = data.get('users', [])
-    
-    # Map verification status
-    user_verify_map = {u['username']: u.get('is_verified', False) for u in users}
-    for uname, port in portfolios.items():
-        port['is_verified'] = user_verify_map.get(uname, False)
+    cards, _ = get_directory_page(
+        verified=True, limit=current_app.config.get('DIRECTORY_PAGE_SIZE', 24)
+    )
+    portfolios = {card['username']: card for card in cards}
     
     return render_template('landing.html',
                            portfolios=portfolios,
                            is_logged_in=is_logged_in,
                            username=username,
-                           is_admin=session.get('is_admin', False),
-                           data=data)
+                           is_admin=session.get('is_admin', False))
 
 
 @pages_bp.route('/landing')
@@ -81,26 +76,25 @@ def security_audit():
 @pages_bp.route('/catalog')
 def catalog():
     """Public portfolios directory"""
-    data = load_data()
-    portfolios = data.get('portfolios', {})
-    users = data.get('users', [])
-    
-    # Map verification status
-    user_status_map = {u['username']: u for u in users}
-    classified_portfolios = {}
-    
-    for username, port in portfolios.items():
-        if username == 'admin':
-            continue
-        
-        user_info = user_status_map.get(username, {})
-        is_verified = user_info.get('is_verified', False)
-        
-        # Only show verified in public catalog
-        if is_verified or session.get('admin_logged_in'):
-            classified_portfolios[username] = port
+    # Only show verified in public catalog, admins see every portfolio
+    verified = None if session.get('admin_logged_in') else True
+    cards, next_cursor = get_directory_page(
+        verified=verified,
+        after=request.args.get('after') or None,
+        limit=current_app.config.get('DIRECTORY_PAGE_SIZE', 24)
+    )
+    portfolios = {
+        card['username']: {
+            'data': card,
+            'status': 'verified' if card['is_verified'] else 'demo'
+        }
+        for card in cards
+    }
     
-    return render_template('catalog.html', portfolios=classified_portfolios)
+    return render_template('catalog.html',
+                           portfolios=portfolios,
+                           next_cursor=next_cursor,
+                           is_admin_view=verified is None)
 
 
 @pages_bp.route('/contact/academy', methods=['POST'])
@@ -109,6 +103,11 @@ def contact_academy():
     from models import Message
     from extensions import db
     from utils.notifications import send_admin_notification
+    from utils.security import check_rate_limit
+    
+    if not check_rate_limit('platform_contact'):
+        flash('Too many requests. Please try again in a minute.', 'danger')
+        return redirect(url_for('pages.index', _anchor='academy-contact'))
     
     name = request.form.get('name', 'Guest').strip()
     email = request.form.get('email', 'no-email@codexx.academy').strip()
@@ -154,7 +153,6 @@ def contact_academy():
 @pages_bp.route('/sitemap.xml')
 def sitemap():
     """Generate dynamic sitemap for SEO"""
-    data = load_data()
     base_url = request.url_root.rstrip('/')
 
     sitemap_entries = []
@@ -165,12 +163,12 @@ def sitemap():
         'lastmod': datetime.now().strftime('%Y-%m-%d')
     })
 
-    for project in data.get('projects', []):
+    for card in iter_directory(verified=True):
         sitemap_entries.append({
-            'loc': f"{base_url}/project/{project['id']}",
-            'changefreq': 'monthly',
+            'loc': f"{base_url}/portfolio/{card['username']}",
+            'changefreq': 'weekly',
             'priority': '0.8',
-            'lastmod': project.get('created_at', datetime.now().strftime('%Y-%m-%d')).split()[0]
+            'lastmod': (card['updated_at'] or datetime.now()).strftime('%Y-%m-%d')
         })
 
     sitemap_xml = ['<?xml version="1.0" encoding="UTF-8"?>']
@@ -6,22 +6,22 @@ Handles: Portfolio display, project details, CV, contact forms
 import io
 from datetime import datetime
 from flask import render_template, session, redirect, url_for, request, flash, jsonify, send_file, current_app
-from utils.data import load_data, save_data, get_default_portfolio_data
+from utils.data import load_data, save_data, get_default_portfolio_data, get_user_by_username
 from utils.helpers import track_visitor
+from utils.stats import adjust_workspace_stats
 from utils.decorators import disable_in_demo
+from utils.page_cache import cached_page
 from utils.security import check_rate_limit
-from utils.notifications import send_telegram_notification
+from utils.outbox import add_outbox_entry, wake_outbox
 from . import portfolio_bp
 
 
 @portfolio_bp.route('/portfolio/<username>')
+@cached_page(on_hit=track_visitor)
 def user_portfolio(username):
     """Public view of user portfolio"""
     user_data = load_data(username=username)
-    all_data = load_data()
-    users = all_data.get('users', [])
-    
-    user_entry = next((u for u in users if u['username'] == username), None)
+    user_entry = get_user_by_username(username)
     
     # Check if workspace exists in DB even if not in data.json
     if not user_entry and username != 'admin':
@@ -34,13 +34,13 @@ def user_portfolio(username):
             user_data = get_default_portfolio_data()
     
     if user_entry:
-        user_data['is_verified'] = user_entry.get('is_verified', False)
+        user_data['is_verified'] = bool(user_entry.is_verified)
         user_data['username'] = username
     else:
         user_data['username'] = username
     
     # Redirect admin users to home
-    is_admin_user = (user_entry and user_entry.get('role') == 'admin') or username == 'admin'
+    is_admin_user = (user_entry and user_entry.role == 'admin') or username == 'admin'
     if is_admin_user:
         return redirect(url_for('pages.index'))
     
@@ -54,6 +54,7 @@ def user_portfolio(username):
 
 
 @portfolio_bp.route('/portfolio/<username>/project/<project_id>')
+@cached_page()
 def project_detail(username, project_id):
     """Project detail page"""
     user_data = load_data(username=username)
@@ -273,17 +274,19 @@ def contact():
         new_message.company = company or None
         
         db.session.add(new_message)
-        db.session.commit()
-        
-        current_app.logger.info(f"Portfolio message saved to DB for {portfolio_owner}, message_id: {new_message.id}")
-
-        # Send notification to portfolio owner via Telegram
-        send_telegram_notification(
+        adjust_workspace_stats(workspace.id, messages=1, unread_messages=1)
+        # Telegram notification to the portfolio owner, committed with the message
+        # and delivered in the background
+        add_outbox_entry(
+            workspace.id, 'portfolio_message',
             f"📧 <b>New Portfolio Message</b>\n\n"
             f"👤 <b>From:</b> {name}\n"
             f"📧 <b>Email:</b> {email}\n"
-            f"💬 <b>Message:</b>\n{message_content[:200]}{'...' if len(message_content) > 200 else ''}",
-            username=portfolio_owner)
+            f"💬 <b>Message:</b>\n{message_content[:200]}{'...' if len(message_content) > 200 else ''}")
+        db.session.commit()
+        wake_outbox()
+        
+        current_app.logger.info(f"Portfolio message saved to DB for {portfolio_owner}, message_id: {new_message.id}")
 
         flash('Message sent successfully! We will get back to you soon.', 'success')
         return redirect(request.referrer or url_for('pages.index'))
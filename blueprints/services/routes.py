@@ -8,8 +8,10 @@ import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import render_template, session, redirect, url_for, request, flash, current_app
-from utils.data import load_data, save_data
+from utils.data import load_data
+from utils.repositories import ServiceRepository
 from utils.decorators import login_required, disable_in_demo
+from utils.page_cache import cached_page
 from utils.helpers import allowed_file
 from . import services_bp
 
@@ -31,7 +33,6 @@ def list_services():
 def add_service():
     """Add new service"""
     username = session.get('username')
-    data = load_data(username=username)
     
     if request.method == 'POST':
         # Generate UUID for new service
@@ -99,16 +100,14 @@ def add_service():
             'updated_at': datetime.now().isoformat()
         }
         
-        # Initialize services list if not exists
-        if 'services' not in data:
-            data['services'] = []
-        data['services'].append(new_service)
-        
-        save_data(data, username=username)
+        if not ServiceRepository(username).add(new_service):
+            flash('Could not save service', 'error')
+            return redirect(url_for('services.list_services'))
         flash('Service added successfully', 'success')
         return redirect(url_for('services.list_services'))
     
     # Load user's skills for the form
+    data = load_data(username=username, sections={'skills'})
     user_skills = data.get('skills', [])
     return render_template('dashboard/add_service.html', data=data, user_skills=user_skills)
 
@@ -119,10 +118,8 @@ def add_service():
 def edit_service(service_id):
     """Edit existing service"""
     username = session.get('username')
-    data = load_data(username=username)
-    services = data.get('services', [])
-    
-    service = next((s for s in services if s.get('id') == service_id), None)
+    repository = ServiceRepository(username)
+    service = repository.get(service_id)
     if not service:
         flash('Service not found', 'error')
         return redirect(url_for('services.list_services'))
@@ -187,11 +184,14 @@ def edit_service(service_id):
                     file.save(os.path.join(upload_folder, filename))
                     service['gallery'].append(f"static/assets/uploads/{filename}")
         
-        save_data(data, username=username)
+        if repository.update(service_id, service, replace=True) is None:
+            flash('Could not save service', 'error')
+            return redirect(url_for('services.list_services'))
         flash('Service updated successfully', 'success')
         return redirect(url_for('services.list_services'))
     
     # Load user's skills for the form
+    data = load_data(username=username, sections={'skills'})
     user_skills = data.get('skills', [])
     return render_template('dashboard/edit_service.html', data=data, service=service, user_skills=user_skills)
 
@@ -202,17 +202,10 @@ def edit_service(service_id):
 def delete_service(service_id):
     """Delete service"""
     username = session.get('username')
-    data = load_data(username=username)
-    services = data.get('services', [])
-    
-    service = next((s for s in services if s.get('id') == service_id), None)
-    if not service:
+    if not ServiceRepository(username).delete(service_id):
         flash('Service not found', 'error')
         return redirect(url_for('services.list_services'))
     
-    # Remove service
-    data['services'] = [s for s in services if s.get('id') != service_id]
-    save_data(data, username=username)
     flash('Service deleted successfully', 'success')
     return redirect(url_for('services.list_services'))
 
@@ -223,17 +216,16 @@ def delete_service(service_id):
 def toggle_service_status(service_id):
     """Toggle service active status"""
     username = session.get('username')
-    data = load_data(username=username)
-    services = data.get('services', [])
-    
-    service = next((s for s in services if s.get('id') == service_id), None)
+    repository = ServiceRepository(username)
+    service = repository.get(service_id)
     if not service:
         flash('Service not found', 'error')
         return redirect(url_for('services.list_services'))
     
-    service['is_active'] = not service.get('is_active', True)
-    service['updated_at'] = datetime.now().isoformat()
-    save_data(data, username=username)
+    service = repository.update(service_id, {'is_active': not service.get('is_active', True)})
+    if service is None:
+        flash('Could not save service', 'error')
+        return redirect(url_for('services.list_services'))
     
     status = 'activated' if service['is_active'] else 'deactivated'
     flash(f'Service {status} successfully', 'success')
@@ -241,6 +233,7 @@ def toggle_service_status(service_id):
 
 
 @services_bp.route('/<username>')
+@cached_page()
 def user_services(username):
     """Display user's services (public view)"""
     user_data = load_data(username=username)
@@ -253,6 +246,7 @@ def user_services(username):
 
 
 @services_bp.route('/<username>/<service_id>')
+@cached_page()
 def service_detail(username, service_id):
     """Service detail page (public view)"""
     user_data = load_data(username=username)
@@ -42,6 +42,71 @@ class Config:
     # JSON Settings
     JSON_AS_ASCII = False
     
+    # Portfolio Cache Settings
+    # Backend: 'memory' (per-worker LRU only) or 'sqlite' (LRU plus a file shared by all workers on the host)
+    PORTFOLIO_CACHE_ENABLED = os.environ.get('PORTFOLIO_CACHE_ENABLED', 'true').lower() == 'true'
+    PORTFOLIO_CACHE_MAX_ENTRIES = int(os.environ.get('PORTFOLIO_CACHE_MAX_ENTRIES', '256'))
+    PORTFOLIO_CACHE_BACKEND = os.environ.get('PORTFOLIO_CACHE_BACKEND', 'memory')
+    PORTFOLIO_CACHE_PATH = os.environ.get('PORTFOLIO_CACHE_PATH', 'cache/portfolio.sqlite3')
+    PORTFOLIO_CACHE_SHARED_MAX_ENTRIES = int(os.environ.get('PORTFOLIO_CACHE_SHARED_MAX_ENTRIES', '4096'))
+    
+    # Page Cache (gzip HTML of public portfolio/project/service pages for anonymous
+    # visitors, keyed on Workspace.version; see utils/page_cache.py)
+    # Backend: 'memory' (per worker) or 'sqlite' (also shared by all workers on the host)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', '512'))
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    PAGE_CACHE_PATH = os.environ.get('PAGE_CACHE_PATH', 'cache/pages.sqlite3')
+    PAGE_CACHE_SHARED_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_SHARED_MAX_ENTRIES', '2048'))
+    
+    # Access Version Cache (lets disable_in_demo skip the users table; see utils/access.py)
+    # Backend: 'memory' (per worker, entries expire after ACCESS_CACHE_TTL seconds)
+    # or 'sqlite' (also shared by all workers on the host)
+    ACCESS_CACHE_BACKEND = os.environ.get('ACCESS_CACHE_BACKEND', 'memory')
+    ACCESS_CACHE_PATH = os.environ.get('ACCESS_CACHE_PATH', 'cache/access.sqlite3')
+    ACCESS_CACHE_TTL = int(os.environ.get('ACCESS_CACHE_TTL', '30'))
+    ACCESS_CACHE_MAX_ENTRIES = int(os.environ.get('ACCESS_CACHE_MAX_ENTRIES', '4096'))
+    
+    # Site Globals Cache (theme and footer links for every render; see utils/site_globals.py)
+    # Backend: 'memory' (per worker) or 'sqlite' (shared by all workers on the host)
+    SITE_GLOBALS_CACHE_BACKEND = os.environ.get('SITE_GLOBALS_CACHE_BACKEND', 'memory')
+    SITE_GLOBALS_CACHE_PATH = os.environ.get('SITE_GLOBALS_CACHE_PATH', 'cache/globals.sqlite3')
+    SITE_GLOBALS_CACHE_TTL = int(os.environ.get('SITE_GLOBALS_CACHE_TTL', '30'))
+    SITE_GLOBALS_CACHE_MAX_ENTRIES = int(os.environ.get('SITE_GLOBALS_CACHE_MAX_ENTRIES', '1024'))
+    
+    # Rate Limit Settings
+    # Backend: 'memory' (per worker), 'sqlite' (a file shared by all workers on the host)
+    # or 'redis' (any Redis-protocol store at RATE_LIMIT_REDIS_URL, shared across hosts).
+    # Defaults to 'sqlite': per-worker limits would multiply by the gunicorn worker count
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', 'cache/ratelimit.sqlite3')
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL') or os.environ.get('REDIS_URL')
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+    # (requests, seconds) per endpoint name passed to check_rate_limit()
+    RATE_LIMIT_DEFAULT = (10, 60)
+    RATE_LIMIT_POLICIES = {
+        'portfolio_contact': (10, 60),
+        'platform_contact': (5, 60),
+        'login': (10, 300),  # Failed attempts only
+    }
+    
+    # Security Log Settings (append-only JSONL in security/, see utils/logstore.py)
+    SECURITY_LOG_MAX_BYTES = int(os.environ.get('SECURITY_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+    SECURITY_LOG_MAX_AGE = int(os.environ.get('SECURITY_LOG_MAX_AGE', str(24 * 60 * 60)))  # Seconds
+    SECURITY_LOG_BACKUPS = int(os.environ.get('SECURITY_LOG_BACKUPS', '5'))
+    SECURITY_LOG_FLUSH_INTERVAL = float(os.environ.get('SECURITY_LOG_FLUSH_INTERVAL', '1.0'))
+    
+    # Directory Settings (landing gallery and catalog page size)
+    DIRECTORY_PAGE_SIZE = int(os.environ.get('DIRECTORY_PAGE_SIZE', '24'))
+    
+    # Password Hashing
+    # Method: 'scrypt' or 'pbkdf2:sha256'; cost: scrypt's N or the pbkdf2 iteration
+    # count (empty for werkzeug's default). Changing either upgrades each user's
+    # stored hash on their next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_COST = os.environ.get('PASSWORD_HASH_COST', '')
+    
     # Admin Settings
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD')
@@ -53,6 +118,71 @@ class Config:
     ADMIN_SMTP_PORT = os.environ.get('ADMIN_SMTP_PORT', '587')
     ADMIN_SMTP_EMAIL = os.environ.get('ADMIN_SMTP_EMAIL')
     ADMIN_SMTP_PASSWORD = os.environ.get('ADMIN_SMTP_PASSWORD')
+    
+    # Visitor Log Buffer (see utils/visits.py)
+    # Visits are written in batches of BATCH_SIZE or every FLUSH_MS; beyond
+    # MAX_PENDING buffered visits new ones are dropped. Disabled = one commit per view
+    VISITOR_BUFFER_ENABLED = os.environ.get('VISITOR_BUFFER_ENABLED', 'true').lower() == 'true'
+    VISITOR_BUFFER_BATCH_SIZE = int(os.environ.get('VISITOR_BUFFER_BATCH_SIZE', '100'))
+    VISITOR_BUFFER_FLUSH_MS = int(os.environ.get('VISITOR_BUFFER_FLUSH_MS', '1000'))
+    VISITOR_BUFFER_MAX_PENDING = int(os.environ.get('VISITOR_BUFFER_MAX_PENDING', '10000'))
+    
+    # Notification Delivery (per-worker pool, see utils/delivery.py)
+    NOTIFY_WORKERS = int(os.environ.get('NOTIFY_WORKERS', '4'))
+    NOTIFY_QUEUE_SIZE = int(os.environ.get('NOTIFY_QUEUE_SIZE', '1000'))
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '3'))
+    NOTIFY_TIMEOUT = int(os.environ.get('NOTIFY_TIMEOUT', '10'))  # Seconds per HTTP/SMTP call
+    NOTIFY_DRAIN_TIMEOUT = int(os.environ.get('NOTIFY_DRAIN_TIMEOUT', '10'))  # Seconds at shutdown
+    NOTIFY_SMTP_POOL_SIZE = int(os.environ.get('NOTIFY_SMTP_POOL_SIZE', '2'))  # Idle connections per account
+    NOTIFY_SMTP_IDLE_TIMEOUT = int(os.environ.get('NOTIFY_SMTP_IDLE_TIMEOUT', '60'))
+    # Only for local stand-ins such as `flask notify-fakes`; real servers need STARTTLS
+    NOTIFY_SMTP_STARTTLS = os.environ.get('NOTIFY_SMTP_STARTTLS', 'true').lower() == 'true'
+    TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+    # Per-worker cache of each workspace's Telegram/SMTP credentials (see utils/credentials.py)
+    NOTIFY_CREDENTIALS_TTL = int(os.environ.get('NOTIFY_CREDENTIALS_TTL', '60'))  # Seconds
+    NOTIFY_CREDENTIALS_MAX_ENTRIES = int(os.environ.get('NOTIFY_CREDENTIALS_MAX_ENTRIES', '2048'))
+    # (messages, seconds) per destination, counted in RATE_LIMIT_BACKEND when it is shared
+    NOTIFY_RATE_LIMITS = {
+        'telegram_chat': (1, 1),
+        'telegram_group': (20, 60),
+        'telegram_bot': (30, 1),
+        'smtp': (30, 60),
+    }
+    
+    # Notification Coalescing (see utils/outbox.py)
+    # Seconds per (recipient, channel): above 0, notifications are stored as outbox
+    # rows, the first goes out at once and later ones inside the window are merged
+    # into one digest; 0 (the default) sends each one right away
+    NOTIFY_COALESCE_WINDOWS = {
+        'telegram': int(os.environ.get('NOTIFY_COALESCE_TELEGRAM_WINDOW', '0')),
+        'email': int(os.environ.get('NOTIFY_COALESCE_EMAIL_WINDOW', '0')),
+    }
+    # Daily email digest for low-priority categories (send_user_notification(category=...))
+    NOTIFY_DIGEST_ENABLED = os.environ.get('NOTIFY_DIGEST_ENABLED', 'false').lower() == 'true'
+    NOTIFY_DIGEST_CATEGORIES = tuple(
+        c.strip() for c in os.environ.get('NOTIFY_DIGEST_CATEGORIES', 'account').split(',') if c.strip()
+    )
+    NOTIFY_DIGEST_HOUR = int(os.environ.get('NOTIFY_DIGEST_HOUR', '8'))  # UTC
+    
+    # Live notification stream (see utils/notify_events.py)
+    # 'auto' streams only on threaded servers (e.g. gunicorn -k gthread); a sync
+    # worker would be held by one stream, so those pages keep polling. 'on'/'off' force it.
+    # Each open stream holds a thread: keep the per-worker maximum below gunicorn's --threads
+    NOTIFY_STREAM_MODE = os.environ.get('NOTIFY_STREAM_MODE', 'auto')
+    NOTIFY_STREAM_MAX_PER_WORKER = int(os.environ.get('NOTIFY_STREAM_MAX_PER_WORKER', '8'))
+    NOTIFY_STREAM_MAX_AGE = int(os.environ.get('NOTIFY_STREAM_MAX_AGE', '300'))  # Seconds, then the browser reconnects
+    NOTIFY_STREAM_CHECK_INTERVAL = int(os.environ.get('NOTIFY_STREAM_CHECK_INTERVAL', '15'))  # Catches other workers' changes
+    NOTIFY_STREAM_RETRY = int(os.environ.get('NOTIFY_STREAM_RETRY', '3'))  # Seconds before reconnecting
+    
+    # Notification Outbox (see utils/outbox.py)
+    # Disable the in-worker dispatcher when `flask dispatch-outbox --loop` runs separately
+    OUTBOX_DISPATCHER_ENABLED = os.environ.get('OUTBOX_DISPATCHER_ENABLED', 'true').lower() == 'true'
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '5'))  # Seconds
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))  # Then dead-lettered
+    OUTBOX_BACKOFF_BASE = int(os.environ.get('OUTBOX_BACKOFF_BASE', '30'))  # Seconds, doubled per attempt
+    OUTBOX_BACKOFF_MAX = int(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+    OUTBOX_LEASE = int(os.environ.get('OUTBOX_LEASE', '120'))  # Seconds a claimed row stays hidden
 
 
 class DevelopmentConfig(Config):
@@ -76,6 +206,11 @@ class TestingConfig(Config):
     # For in-memory SQLite during tests, keep engine options empty to avoid
     # passing invalid pool settings like pool_size to SQLite's StaticPool.
     SQLALCHEMY_ENGINE_OPTIONS = {}
+    PORTFOLIO_CACHE_BACKEND = 'memory'
+    RATE_LIMIT_BACKEND = 'memory'
+    ACCESS_CACHE_BACKEND = 'memory'
+    SITE_GLOBALS_CACHE_BACKEND = 'memory'
+    PAGE_CACHE_BACKEND = 'memory'
 
 
 # Select configuration based on environment
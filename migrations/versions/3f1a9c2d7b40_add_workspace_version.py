@@ -0,0 +1,24 @@
+"""Add workspace version counter
+
+Revision ID: 3f1a9c2d7b40
+Revises: 8c06827ebd26
+Create Date: 2026-10-16 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b40'
+down_revision = '8c06827ebd26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workspaces', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('workspaces', 'version')
@@ -0,0 +1,24 @@
+"""Add directory index on users
+
+Revision ID: 5b7e2d4a9c13
+Revises: 3f1a9c2d7b40
+Create Date: 2026-10-16 11:05:27.440918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2d4a9c13'
+down_revision = '3f1a9c2d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_users_verified_username', 'users', ['is_verified', 'username'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_users_verified_username', table_name='users')
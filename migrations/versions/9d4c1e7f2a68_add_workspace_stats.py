@@ -0,0 +1,54 @@
+"""Add workspace stats counters
+
+Revision ID: 9d4c1e7f2a68
+Revises: 5b7e2d4a9c13
+Create Date: 2026-10-16 13:40:02.583115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4c1e7f2a68'
+down_revision = '5b7e2d4a9c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('workspace_stats',
+    sa.Column('workspace_id', sa.String(length=36), nullable=False),
+    sa.Column('projects', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('skills', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('services', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('clients', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('unread_messages', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('visitors_total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('visitors_today', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('visitors_day', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('workspace_id')
+    )
+    # Seed the totals; visitors_today starts at zero with no day set and is
+    # filled in by `flask reconcile-stats` or the first visit
+    op.execute(
+        "INSERT INTO workspace_stats (workspace_id, projects, skills, services, clients, "
+        "messages, unread_messages, visitors_total, visitors_today) "
+        "SELECT w.id, "
+        "(SELECT COUNT(*) FROM projects p WHERE p.workspace_id = w.id), "
+        "(SELECT COUNT(*) FROM skills s WHERE s.workspace_id = w.id), "
+        "(SELECT COUNT(*) FROM services v WHERE v.workspace_id = w.id), "
+        "(SELECT COUNT(*) FROM clients c WHERE c.workspace_id = w.id), "
+        "(SELECT COUNT(*) FROM messages m WHERE m.workspace_id = w.id), "
+        "(SELECT COUNT(*) FROM messages m WHERE m.workspace_id = w.id AND m.is_read = false), "
+        "(SELECT COUNT(*) FROM visitor_logs l WHERE l.workspace_id = w.id), "
+        "0 "
+        "FROM workspaces w"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workspace_stats')
@@ -0,0 +1,44 @@
+"""Add message thread summary columns
+
+Revision ID: a7d3c9e2f514
+Revises: e4b1f9a6c3d2
+Create Date: 2026-10-16 17:05:44.218730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c9e2f514'
+down_revision = 'e4b1f9a6c3d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('admin_unread_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('user_unread_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('last_reply_at', sa.DateTime(), nullable=True))
+    op.add_column('messages', sa.Column('last_reply_preview', sa.String(length=200), nullable=True))
+    # Seed counts and times; previews are filled in by
+    # `flask backfill-thread-summaries`
+    op.execute(
+        "UPDATE messages SET "
+        "reply_count = (SELECT COUNT(*) FROM messages r WHERE r.parent_id = messages.id), "
+        "admin_unread_count = (SELECT COUNT(*) FROM messages r WHERE r.parent_id = messages.id "
+        "AND r.is_read = false AND COALESCE(r.sender_role, '') <> 'admin'), "
+        "user_unread_count = (SELECT COUNT(*) FROM messages r WHERE r.parent_id = messages.id "
+        "AND r.is_read = false AND r.sender_role = 'admin'), "
+        "last_reply_at = (SELECT MAX(r.created_at) FROM messages r WHERE r.parent_id = messages.id) "
+        "WHERE parent_id IS NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'last_reply_preview')
+    op.drop_column('messages', 'last_reply_at')
+    op.drop_column('messages', 'user_unread_count')
+    op.drop_column('messages', 'admin_unread_count')
+    op.drop_column('messages', 'reply_count')
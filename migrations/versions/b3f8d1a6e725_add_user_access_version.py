@@ -0,0 +1,24 @@
+"""Add user access version
+
+Revision ID: b3f8d1a6e725
+Revises: a7d3c9e2f514
+Create Date: 2026-10-16 18:12:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f8d1a6e725'
+down_revision = 'a7d3c9e2f514'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('access_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'access_version')
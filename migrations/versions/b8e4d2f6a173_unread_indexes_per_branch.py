@@ -0,0 +1,52 @@
+"""Give every unread notification branch its own index range
+
+Revision ID: b8e4d2f6a173
+Revises: f7c3a1d9e842
+Create Date: 2026-10-17 15:41:09.286530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4d2f6a173'
+down_revision = 'f7c3a1d9e842'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_messages_unread_receiver', table_name='messages')
+    op.drop_index('idx_messages_unread_workspace', table_name='messages')
+    op.create_index(
+        'idx_messages_unread_workspace', 'messages', ['workspace_id', 'parent_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+    op.create_index(
+        'idx_messages_unread_receiver', 'messages', ['receiver_id', 'parent_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false AND receiver_id IS NOT NULL'),
+        sqlite_where=sa.text('is_read = 0 AND receiver_id IS NOT NULL')
+    )
+    op.create_index(
+        'idx_messages_unread_category', 'messages', ['category', 'parent_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_unread_category', table_name='messages')
+    op.drop_index('idx_messages_unread_receiver', table_name='messages')
+    op.drop_index('idx_messages_unread_workspace', table_name='messages')
+    op.create_index(
+        'idx_messages_unread_workspace', 'messages', ['workspace_id', 'category', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+    op.create_index(
+        'idx_messages_unread_receiver', 'messages', ['receiver_id', 'sender_role', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
@@ -0,0 +1,61 @@
+"""Add numeric client amount and currency
+
+Revision ID: c2e8a5f3b917
+Revises: 9d4c1e7f2a68
+Create Date: 2026-10-16 15:02:48.906431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e8a5f3b917'
+down_revision = '9d4c1e7f2a68'
+branch_labels = None
+depends_on = None
+
+# Kept local so the migration does not depend on application code
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY'}
+
+
+def parse_price(price):
+    """Split a free-form price string into (amount, currency)"""
+    text = str(price or '')
+    cleaned = ''.join(ch for ch in text if ch.isdigit() or ch == '.')
+    try:
+        amount = float(cleaned) if cleaned else None
+    except ValueError:
+        amount = None
+    currency = next((code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in text), None)
+    if currency is None:
+        letters = ''.join(ch for ch in text.upper() if ch.isalpha())
+        currency = letters if len(letters) == 3 and amount is not None else 'USD'
+    return amount, currency
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('amount', sa.Float(), nullable=True))
+    op.add_column('clients', sa.Column('currency', sa.String(length=10), nullable=True))
+    op.create_index('idx_clients_workspace_status', 'clients', ['workspace_id', 'status'], unique=False)
+
+    clients = sa.table(
+        'clients',
+        sa.column('id', sa.String),
+        sa.column('price', sa.String),
+        sa.column('amount', sa.Float),
+        sa.column('currency', sa.String)
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(clients.c.id, clients.c.price)).fetchall()
+    for client_id, price in rows:
+        amount, currency = parse_price(price)
+        connection.execute(
+            clients.update().where(clients.c.id == client_id).values(amount=amount, currency=currency)
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_clients_workspace_status', table_name='clients')
+    op.drop_column('clients', 'currency')
+    op.drop_column('clients', 'amount')
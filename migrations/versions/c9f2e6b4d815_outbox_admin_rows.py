@@ -0,0 +1,27 @@
+"""Allow outbox rows addressed to the platform admin
+
+Revision ID: c9f2e6b4d815
+Revises: b8e4d2f6a173
+Create Date: 2026-10-17 17:26:52.740318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9f2e6b4d815'
+down_revision = 'b8e4d2f6a173'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.alter_column('workspace_id', existing_type=sa.String(length=36), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM notification_outbox WHERE workspace_id IS NULL")
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.alter_column('workspace_id', existing_type=sa.String(length=36), nullable=False)
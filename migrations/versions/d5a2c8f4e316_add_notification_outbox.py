@@ -0,0 +1,42 @@
+"""Add notification outbox
+
+Revision ID: d5a2c8f4e316
+Revises: b3f8d1a6e725
+Create Date: 2026-10-16 20:05:48.216930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a2c8f4e316'
+down_revision = 'b3f8d1a6e725'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_outbox',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('workspace_id', sa.String(length=36), nullable=False),
+    sa.Column('channel', sa.String(length=20), nullable=False),
+    sa.Column('event', sa.String(length=50), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_outbox_status_next_attempt', 'notification_outbox', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('idx_outbox_workspace_created', 'notification_outbox', ['workspace_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_outbox_workspace_created', table_name='notification_outbox')
+    op.drop_index('idx_outbox_status_next_attempt', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,36 @@
+"""Add message access pattern indexes
+
+Revision ID: e4b1f9a6c3d2
+Revises: c2e8a5f3b917
+Create Date: 2026-10-16 16:21:09.377452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b1f9a6c3d2'
+down_revision = 'c2e8a5f3b917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_messages_workspace_parent_created', 'messages', ['workspace_id', 'parent_id', 'created_at'], unique=False)
+    op.create_index('idx_messages_category_parent_created', 'messages', ['category', 'parent_id', 'created_at'], unique=False)
+    op.create_index('idx_messages_parent_created', 'messages', ['parent_id', 'created_at'], unique=False)
+    op.create_index('idx_messages_receiver_read', 'messages', ['receiver_id', 'is_read'], unique=False)
+    op.create_index(
+        'idx_messages_unread_workspace', 'messages', ['workspace_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_unread_workspace', table_name='messages')
+    op.drop_index('idx_messages_receiver_read', table_name='messages')
+    op.drop_index('idx_messages_parent_created', table_name='messages')
+    op.drop_index('idx_messages_category_parent_created', table_name='messages')
+    op.drop_index('idx_messages_workspace_parent_created', table_name='messages')
@@ -0,0 +1,40 @@
+"""Index both halves of the notification dropdown
+
+Revision ID: f7c3a1d9e842
+Revises: d5a2c8f4e316
+Create Date: 2026-10-17 10:12:37.504218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3a1d9e842'
+down_revision = 'd5a2c8f4e316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('idx_messages_unread_workspace', table_name='messages')
+    op.create_index(
+        'idx_messages_unread_workspace', 'messages', ['workspace_id', 'category', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+    op.create_index(
+        'idx_messages_unread_receiver', 'messages', ['receiver_id', 'sender_role', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_unread_receiver', table_name='messages')
+    op.drop_index('idx_messages_unread_workspace', table_name='messages')
+    op.create_index(
+        'idx_messages_unread_workspace', 'messages', ['workspace_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0')
+    )
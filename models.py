@@ -29,6 +29,7 @@ class Workspace(db.Model):
     contact = db.Column(SafeJSON, default={})  # {email, phone, location}
     social = db.Column(SafeJSON, default={})  # {linkedin, github, twitter, facebook, etc}
     settings = db.Column(SafeJSON, default={'theme': 'luxury-gold'})
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on every portfolio write
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -39,6 +40,8 @@ class Workspace(db.Model):
     clients = db.relationship('Client', backref='workspace', lazy=True, cascade='all, delete-orphan')
     messages = db.relationship('Message', backref='workspace', lazy=True, cascade='all, delete-orphan')
     visitor_logs = db.relationship('VisitorLog', backref='workspace', lazy=True, cascade='all, delete-orphan')
+    notification_settings = db.relationship('NotificationSettings', backref='workspace', lazy=True, uselist=False, cascade='all, delete-orphan')
+    stats = db.relationship('WorkspaceStats', backref='workspace', lazy=True, uselist=False, cascade='all, delete-orphan')
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -53,9 +56,16 @@ class User(db.Model):
     is_demo = db.Column(db.Boolean, default=False)
     badges = db.Column(SafeJSON, default=[]) # List of badges: ["verified", "top_expert", "master"]
     must_change_password = db.Column(db.Boolean, default=False)
+    # Bumped when role/demo/verification change; see utils/access.py
+    access_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Directory listing filters on verification and pages by username
+    __table_args__ = (
+        db.Index('idx_users_verified_username', 'is_verified', 'username'),
+    )
+
 class Project(db.Model):
     __tablename__ = 'projects'
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -99,7 +109,9 @@ class Client(db.Model):
     project_title = db.Column(db.String(255))
     project_description = db.Column(db.Text)
     status = db.Column(db.String(50), default='lead')  # lead, in-progress, completed, cancelled
-    price = db.Column(db.String(50))
+    price = db.Column(db.String(50))  # As entered, amount/currency are parsed from it
+    amount = db.Column(db.Float)
+    currency = db.Column(db.String(10), default='USD')
     deadline = db.Column(db.Date)
     start_date = db.Column(db.Date)
     notes = db.Column(db.Text)
@@ -107,6 +119,11 @@ class Client(db.Model):
     status_updated_at = db.Column(db.DateTime)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # CRM stats group a workspace's clients by status
+    __table_args__ = (
+        db.Index('idx_clients_workspace_status', 'workspace_id', 'status'),
+    )
+
 class Message(db.Model):
     __tablename__ = 'messages'
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -129,6 +146,42 @@ class Message(db.Model):
     company = db.Column(db.String(255))  # Company/Project name
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Thread summary, kept on top-level messages by utils/threads.py
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    admin_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Unread replies for the admin side
+    user_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Unread replies from the admin
+    last_reply_at = db.Column(db.DateTime)
+    last_reply_preview = db.Column(db.String(200))
+
+    # Matched to utils/message_queries.py; checked by `flask check-query-plans`
+    __table_args__ = (
+        # Workspace inbox, newest top-level messages first
+        db.Index('idx_messages_workspace_parent_created', 'workspace_id', 'parent_id', 'created_at'),
+        # Platform inbox and internal thread lists
+        db.Index('idx_messages_category_parent_created', 'category', 'parent_id', 'created_at'),
+        # Replies of a thread in posting order
+        db.Index('idx_messages_parent_created', 'parent_id', 'created_at'),
+        # Messages addressed to the admin or a user id
+        db.Index('idx_messages_receiver_read', 'receiver_id', 'is_read'),
+        # Unread badge and notification dropdown only ever read unread rows
+        db.Index(
+            'idx_messages_unread_workspace', 'workspace_id', 'parent_id', 'created_at',
+            postgresql_where=db.text('is_read = false'),
+            sqlite_where=db.text('is_read = 0')
+        ),
+        # Unread messages to the admin, or from the admin to one user
+        db.Index(
+            'idx_messages_unread_receiver', 'receiver_id', 'parent_id', 'created_at',
+            postgresql_where=db.text('is_read = false AND receiver_id IS NOT NULL'),
+            sqlite_where=db.text('is_read = 0 AND receiver_id IS NOT NULL')
+        ),
+        # Unread platform messages filed under a workspace (admin badge and dropdown)
+        db.Index(
+            'idx_messages_unread_category', 'category', 'parent_id', 'created_at',
+            postgresql_where=db.text('is_read = false'),
+            sqlite_where=db.text('is_read = 0')
+        ),
+    )
 
 class VisitorLog(db.Model):
     __tablename__ = 'visitor_logs'
@@ -180,4 +233,41 @@ class NotificationSettings(db.Model):
     telegram_configured_at = db.Column(db.DateTime)
     smtp_config = db.Column(SafeJSON, default={})
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Notifications committed with the row that caused them, delivered by utils/outbox.py
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    workspace_id = db.Column(db.String(36), db.ForeignKey('workspaces.id'))  # None: the platform admin
+    channel = db.Column(db.String(20), nullable=False, default='telegram')
+    event = db.Column(db.String(50))  # e.g. 'portfolio_message', 'client_added'
+    payload = db.Column(SafeJSON, default={})  # Channel-specific, e.g. {'text': ...}
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sent', 'skipped', 'dead'
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Dispatcher: due rows in order
+        db.Index('idx_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        # Settings page: a workspace's recent deliveries
+        db.Index('idx_outbox_workspace_created', 'workspace_id', 'created_at'),
+    )
+
+# Per-workspace counters kept in step with the write paths (see utils/stats.py)
+class WorkspaceStats(db.Model):
+    __tablename__ = 'workspace_stats'
+    workspace_id = db.Column(db.String(36), db.ForeignKey('workspaces.id'), primary_key=True)
+    projects = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    skills = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    services = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    clients = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    messages = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unread_messages = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    visitors_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    visitors_today = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    visitors_day = db.Column(db.Date)  # UTC day visitors_today counts
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,35 +1,53 @@
 /**
  * Real-time Notifications System
- * Polls for new notifications and updates the UI without page refresh
+ * Receives notification updates over a server-sent events stream and falls
+ * back to polling when the server cannot stream
  */
 
 (function() {
     'use strict';
     
     let notificationInterval = null;
+    let notificationStream = null;
+    let streamUnavailable = !window.EventSource;
     let lastNotificationCount = 0;
     let lastNotificationIds = [];
+    let lastNotificationEtag = null;
     const POLL_INTERVAL = 5000; // 5 seconds for faster updates
+    const STREAM_URL = '/dashboard/notifications/stream';
     
     /**
      * Fetch and display latest notifications
      */
     function fetchNotifications() {
+        const headers = {
+            'Accept': 'application/json',
+            'Cache-Control': 'no-cache'
+        };
+        // Conditional request: the server answers 304 when nothing changed
+        if (lastNotificationEtag) {
+            headers['If-None-Match'] = lastNotificationEtag;
+        }
+        
         fetch('/dashboard/notifications/latest', {
             method: 'GET',
-            headers: {
-                'Accept': 'application/json',
-                'Cache-Control': 'no-cache'
-            }
+            cache: 'no-store',
+            headers: headers
         })
         .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
+            lastNotificationEtag = response.headers.get('ETag');
             return response.json();
         })
         .then(notifications => {
-            updateNotificationUI(notifications);
+            if (notifications) {
+                updateNotificationUI(notifications);
+            }
         })
         .catch(error => {
             console.log('Notification fetch error (will retry):', error.message);
@@ -220,6 +238,51 @@
         }
     }
     
+    /**
+     * Open the notification stream, or poll when streaming is unavailable
+     */
+    function startNotifications() {
+        if (streamUnavailable) {
+            startNotificationPolling();
+            return;
+        }
+        if (notificationStream) return;
+        
+        notificationStream = new EventSource(STREAM_URL);
+        notificationStream.addEventListener('notifications', function(event) {
+            try {
+                updateNotificationUI(JSON.parse(event.data));
+                // Event ids are the feed's ETag, so a later fetch stays conditional
+                if (event.lastEventId) {
+                    lastNotificationEtag = '"' + event.lastEventId + '"';
+                }
+            } catch (error) {
+                console.log('Notification stream parse error:', error.message);
+            }
+        });
+        notificationStream.onerror = function() {
+            // CLOSED means the server refused the stream (e.g. 204); otherwise
+            // the browser reconnects by itself
+            if (notificationStream && notificationStream.readyState === EventSource.CLOSED) {
+                console.log('Notification stream unavailable, falling back to polling');
+                streamUnavailable = true;
+                stopNotifications();
+                startNotificationPolling();
+            }
+        };
+    }
+    
+    /**
+     * Close the stream and stop polling
+     */
+    function stopNotifications() {
+        if (notificationStream) {
+            notificationStream.close();
+            notificationStream = null;
+        }
+        stopNotificationPolling();
+    }
+    
     /**
      * Start polling for notifications
      */
@@ -252,20 +315,20 @@
      * Initialize notification system
      */
     function initNotifications() {
-        // Start polling when page loads
+        // Start receiving updates when page loads
         if (document.readyState === 'loading') {
-            document.addEventListener('DOMContentLoaded', startNotificationPolling);
+            document.addEventListener('DOMContentLoaded', startNotifications);
         } else {
-            startNotificationPolling();
+            startNotifications();
         }
         
-        // Stop polling when page is hidden (battery saving)
+        // Stop updates when page is hidden (battery saving)
         document.addEventListener('visibilitychange', function() {
             if (document.hidden) {
-                stopNotificationPolling();
+                stopNotifications();
             } else {
-                // Resume polling and fetch immediately
-                startNotificationPolling();
+                // Resume; the stream sends the current feed on connect
+                startNotifications();
             }
         });
         
@@ -291,6 +354,6 @@
     
     // Expose to global scope for manual refresh
     window.refreshNotifications = fetchNotifications;
-    window.startNotificationPolling = startNotificationPolling;
-    window.stopNotificationPolling = stopNotificationPolling;
+    window.startNotificationPolling = startNotifications;
+    window.stopNotificationPolling = stopNotifications;
 })();
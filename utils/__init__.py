@@ -6,6 +6,7 @@ from .decorators import login_required, admin_required, disable_in_demo
 from .data import load_data, save_data, get_current_theme, get_global_meta
 from .notifications import (
     send_email,
+    queue_email,
     send_admin_notification,
     send_user_notification,
     get_telegram_credentials,
@@ -18,6 +19,7 @@ from .security import (
     check_rate_limit,
     log_ip_activity,
     get_admin_credentials,
+    hash_password,
     verify_password,
     DEMO_USER_CREDENTIALS
 )
@@ -52,6 +54,7 @@ __all__ = [
     
     # Notifications
     'send_email',
+    'queue_email',
     'send_admin_notification',
     'send_user_notification',
     'get_telegram_credentials',
@@ -64,6 +67,7 @@ __all__ = [
     'check_rate_limit',
     'log_ip_activity',
     'get_admin_credentials',
+    'hash_password',
     'verify_password',
     'DEMO_USER_CREDENTIALS',
     
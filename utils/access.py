@@ -0,0 +1,158 @@
+"""
+Access Module - Per-user access version cache for session refreshes
+
+User.access_version is bumped whenever a user's role, demo or verification
+state changes. The session remembers the version its flags were loaded
+from, and a small cache maps username -> current version, so a decorated
+request only reads the users table when the two disagree.
+
+The cache is a per-worker LRU whose entries live for ACCESS_CACHE_TTL
+seconds, optionally backed by a SQLite file shared by every worker on the
+host; a bump deletes the entry in both once its transaction commits, so
+the change is picked up on the next request (in other workers once the
+shared entry or the TTL expires). Dropping it before the commit would let
+a concurrent request cache the old version again until the TTL runs out.
+"""
+
+import time
+from flask import current_app, has_app_context, session
+from sqlalchemy import event
+from extensions import db
+from .cache import LRUCache, SQLiteCacheBackend
+from .data import get_user_by_username
+from .worker_state import app_singleton
+
+
+# Stored for usernames without a User row (e.g. the environment admin)
+NO_USER_VERSION = 0
+
+
+class AccessVersionCache:
+    """username -> access version, with a TTL on the local level"""
+
+    def __init__(self, max_entries=4096, ttl=30, backend=None):
+        self.local = LRUCache(max_entries)
+        self.ttl = ttl
+        self.backend = backend
+
+    def get(self, username):
+        entry = self.local.get(username)
+        if entry is not None:
+            version, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                return version
+            self.local.delete(username)
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(f'access:{username}')
+            except Exception as e:
+                current_app.logger.warning(f"Shared access cache read failed: {str(e)}")
+                shared = None
+            if shared is not None:
+                version = int(shared[1])
+                self.local.set(username, (version, time.time()))
+                return version
+        return None
+
+    def set(self, username, version):
+        self.local.set(username, (version, time.time()))
+        if self.backend is not None:
+            try:
+                self.backend.set(f'access:{username}', version, version)
+            except Exception as e:
+                current_app.logger.warning(f"Shared access cache write failed: {str(e)}")
+
+    def invalidate(self, username):
+        self.local.delete(username)
+        if self.backend is not None:
+            try:
+                self.backend.delete(f'access:{username}')
+            except Exception as e:
+                current_app.logger.warning(f"Shared access cache delete failed: {str(e)}")
+
+
+def _create_access_cache(app):
+    config = app.config
+    backend = None
+    if config.get('ACCESS_CACHE_BACKEND') == 'sqlite':
+        try:
+            backend = SQLiteCacheBackend(
+                config.get('ACCESS_CACHE_PATH', 'cache/access.sqlite3'),
+                max_entries=config.get('ACCESS_CACHE_MAX_ENTRIES', 4096)
+            )
+        except Exception as e:
+            app.logger.error(f"Could not open shared access cache: {str(e)}")
+    return AccessVersionCache(
+        config.get('ACCESS_CACHE_MAX_ENTRIES', 4096),
+        config.get('ACCESS_CACHE_TTL', 30),
+        backend
+    )
+
+
+def get_access_cache():
+    """Get the access version cache for the current app"""
+    return app_singleton('access_cache', _create_access_cache)
+
+
+def bump_access_version(user):
+    """
+    Mark a user's role/demo/verification state as changed
+
+    Increments User.access_version in the caller's transaction; the cached
+    version is dropped when that transaction commits (see
+    register_access_events()), so sessions reload their flags on the next
+    request.
+    """
+    user.access_version = (user.access_version or 0) + 1
+    db.session.info.setdefault('access_invalidations', set()).add(user.username)
+
+
+def _invalidate_committed(session):
+    usernames = session.info.pop('access_invalidations', None)
+    if usernames and has_app_context():
+        cache = get_access_cache()
+        for username in usernames:
+            cache.invalidate(username)
+
+
+def _discard_invalidations(session):
+    session.info.pop('access_invalidations', None)
+
+
+def register_access_events():
+    """Hook the access cache invalidation into the app's session (idempotent)"""
+    if not event.contains(db.session, 'after_commit', _invalidate_committed):
+        event.listen(db.session, 'after_commit', _invalidate_committed)
+        event.listen(db.session, 'after_rollback', _discard_invalidations)
+
+
+def refresh_session_access(username):
+    """
+    Reload is_demo_mode / is_admin into the session when the user's access changed
+
+    Returns:
+        bool: True when the database was read
+    """
+    cache = get_access_cache()
+    version = cache.get(username)
+    if version is not None and version == session.get('access_version'):
+        return False
+
+    user = get_user_by_username(username)
+    if user is not None:
+        # Update session with latest status from database
+        session['is_demo_mode'] = user.is_demo
+        session['is_admin'] = (user.role == 'admin')
+    version = user.access_version if user is not None else NO_USER_VERSION
+    session['access_version'] = version
+    cache.set(username, version)
+    return True
+
+
+__all__ = [
+    'AccessVersionCache',
+    'get_access_cache',
+    'bump_access_version',
+    'register_access_events',
+    'refresh_session_access'
+]
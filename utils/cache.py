@@ -0,0 +1,250 @@
+"""
+Cache Module - Bounded in-process LRU cache with an optional shared backend
+
+The portfolio cache stores serialized workspace sections keyed on the
+workspace slug. Every entry carries the workspace version it was built from;
+a lookup only hits when the caller's current version matches, so a save in
+any gunicorn worker invalidates the entry everywhere without messaging.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from .worker_state import app_singleton
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max(1, int(max_entries))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'max_entries': self.max_entries
+        }
+
+
+class SQLiteCacheBackend:
+    """
+    Shared cache backend in a local SQLite file
+
+    Lets every worker on one box reuse entries built by the others. Each
+    thread gets its own connection; WAL mode keeps readers from blocking
+    the writer.
+    """
+
+    def __init__(self, path, max_entries=4096):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            'key TEXT PRIMARY KEY, version TEXT NOT NULL, '
+            'value TEXT NOT NULL, stored_at REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return (version, value) or None"""
+        row = self._connection().execute(
+            'SELECT version, value FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key, version, value):
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, version, value, stored_at) VALUES (?, ?, ?, ?)',
+            (key, str(version), json.dumps(value, ensure_ascii=False), time.time())
+        )
+        # Trim the oldest entries once the table outgrows its bound
+        conn.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            'SELECT key FROM cache_entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+
+class VersionedCache:
+    """
+    Two-level cache of values tagged with a version
+
+    Level one is a per-process LRUCache, level two an optional shared
+    backend. get() only returns a value stored for the same version.
+    """
+
+    def __init__(self, max_entries=256, backend=None):
+        self.local = LRUCache(max_entries)
+        self.backend = backend
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key, version):
+        version = str(version)
+        entry = self.local.get(key)
+        if entry is not None:
+            if entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.stale += 1
+            self.local.delete(key)
+
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(key)
+            except Exception as e:
+                current_app.logger.warning(f"Shared cache read failed: {str(e)}")
+                shared = None
+            if shared is not None and shared[0] == version:
+                self.shared_hits += 1
+                self.local.set(key, shared)
+                return shared[1]
+        self.misses += 1
+        return None
+
+    def set(self, key, version, value):
+        version = str(version)
+        self.local.set(key, (version, value))
+        if self.backend is not None:
+            try:
+                self.backend.set(key, version, value)
+            except Exception as e:
+                current_app.logger.warning(f"Shared cache write failed: {str(e)}")
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(key)
+            except Exception as e:
+                current_app.logger.warning(f"Shared cache delete failed: {str(e)}")
+
+    def clear(self):
+        self.local.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """
+        Counters for sizing the cache
+
+        hits are served from this worker's LRU, shared_hits from the shared
+        backend, misses had no entry for the current version, stale counts
+        local entries discarded because the version moved on, and evictions
+        counts entries pushed out of the LRU by max_entries.
+        """
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'evictions': self.local.evictions,
+            'size': len(self.local),
+            'max_entries': self.local.max_entries,
+            'backend': type(self.backend).__name__ if self.backend is not None else None
+        }
+
+
+def create_backend(kind, path, max_entries):
+    """Build a shared backend from config ('sqlite' or None for process-local only)"""
+    if kind == 'sqlite':
+        return SQLiteCacheBackend(path, max_entries=max_entries)
+    return None
+
+
+def _create_portfolio_cache(app):
+    config = app.config
+    if not config.get('PORTFOLIO_CACHE_ENABLED', True):
+        return None
+    backend = None
+    try:
+        backend = create_backend(
+            config.get('PORTFOLIO_CACHE_BACKEND'),
+            config.get('PORTFOLIO_CACHE_PATH', 'cache/portfolio.sqlite3'),
+            config.get('PORTFOLIO_CACHE_SHARED_MAX_ENTRIES', 4096)
+        )
+    except Exception as e:
+        app.logger.error(f"Could not open shared portfolio cache: {str(e)}")
+    return VersionedCache(config.get('PORTFOLIO_CACHE_MAX_ENTRIES', 256), backend)
+
+
+def get_portfolio_cache():
+    """
+    Get the portfolio cache for the current app
+
+    Returns:
+        VersionedCache | None: None when PORTFOLIO_CACHE_ENABLED is off
+    """
+    return app_singleton('portfolio_cache', _create_portfolio_cache)
+
+
+__all__ = [
+    'LRUCache',
+    'SQLiteCacheBackend',
+    'VersionedCache',
+    'create_backend',
+    'get_portfolio_cache'
+]
@@ -0,0 +1,158 @@
+"""
+Credentials Module - Cached notification credentials per workspace
+
+Sending a notification needs a workspace's Telegram token and chat id, its
+SMTP settings and, as a fallback recipient, its contact email. These are
+read together with one query (workspaces by slug joined to
+notification_settings by workspace id, both unique indexes) and kept in a
+per-worker LRU for NOTIFY_CREDENTIALS_TTL seconds. The settings endpoints
+save through this module, which drops the entry in the saving worker;
+other workers pick the change up once their entry expires.
+"""
+
+import time
+from collections import namedtuple
+from datetime import datetime
+from flask import current_app
+from extensions import db
+from models import Workspace, NotificationSettings
+from .cache import LRUCache
+from .worker_state import app_singleton
+
+
+NotificationCredentials = namedtuple(
+    'NotificationCredentials', ['bot_token', 'chat_id', 'smtp', 'contact_email']
+)
+
+NO_CREDENTIALS = NotificationCredentials('', '', {}, '')
+
+
+class CredentialsCache:
+    """username -> NotificationCredentials, entries expire after ttl seconds"""
+
+    def __init__(self, max_entries=2048, ttl=60):
+        self.local = LRUCache(max_entries)
+        self.ttl = ttl
+        self.reads = 0
+
+    def get(self, username):
+        entry = self.local.get(username)
+        if entry is not None:
+            credentials, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                return credentials
+            self.local.delete(username)
+        return None
+
+    def set(self, username, credentials):
+        self.local.set(username, (credentials, time.time()))
+
+    def invalidate(self, username):
+        self.local.delete(username)
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['reads'] = self.reads
+        return stats
+
+
+def get_credentials_cache():
+    """Get the credentials cache for the current app"""
+    return app_singleton('credentials_cache', lambda app: CredentialsCache(
+        app.config.get('NOTIFY_CREDENTIALS_MAX_ENTRIES', 2048),
+        app.config.get('NOTIFY_CREDENTIALS_TTL', 60)
+    ))
+
+
+def fetch_notification_credentials(username):
+    """Read a workspace's credentials from the database (one row, no caching)"""
+    row = db.session.query(
+        NotificationSettings.telegram_bot_token,
+        NotificationSettings.telegram_chat_id,
+        NotificationSettings.smtp_config,
+        Workspace.contact
+    ).select_from(Workspace).outerjoin(
+        NotificationSettings, NotificationSettings.workspace_id == Workspace.id
+    ).filter(Workspace.slug == username).first()
+    if row is None:
+        return NO_CREDENTIALS
+    bot_token, chat_id, smtp_config, contact = row
+    return NotificationCredentials(
+        bot_token or '',
+        chat_id or '',
+        dict(smtp_config or {}),
+        (contact or {}).get('email', '') if isinstance(contact, dict) else ''
+    )
+
+
+def get_notification_credentials(username):
+    """
+    Credentials for a workspace, from the cache when fresh
+
+    Args:
+        username (str): Workspace slug
+
+    Returns:
+        NotificationCredentials: Empty fields when nothing is configured
+    """
+    if not username:
+        return NO_CREDENTIALS
+    cache = get_credentials_cache()
+    credentials = cache.get(username)
+    if credentials is None:
+        cache.reads += 1
+        credentials = fetch_notification_credentials(username)
+        cache.set(username, credentials)
+    return credentials
+
+
+def invalidate_notification_credentials(username):
+    """Drop a workspace's cached credentials in this worker"""
+    get_credentials_cache().invalidate(username)
+
+
+def _save_settings(username, values):
+    workspace_id = db.session.query(Workspace.id).filter_by(slug=username).scalar()
+    if workspace_id is None:
+        return False
+    try:
+        settings = NotificationSettings.query.filter_by(workspace_id=workspace_id).first()
+        if settings is None:
+            settings = NotificationSettings(workspace_id=workspace_id)
+            db.session.add(settings)
+        for column, value in values.items():
+            setattr(settings, column, value)
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving notification settings for {username}: {str(e)}")
+        return False
+    finally:
+        invalidate_notification_credentials(username)
+
+
+def save_telegram_credentials(username, bot_token, chat_id):
+    """Store a workspace's Telegram bot token and chat id; returns success"""
+    return _save_settings(username, {
+        'telegram_bot_token': bot_token,
+        'telegram_chat_id': chat_id,
+        'telegram_configured_at': datetime.utcnow()
+    })
+
+
+def save_smtp_credentials(username, smtp_config):
+    """Store a workspace's SMTP settings (host, port, email, password); returns success"""
+    return _save_settings(username, {'smtp_config': dict(smtp_config)})
+
+
+__all__ = [
+    'NotificationCredentials',
+    'CredentialsCache',
+    'get_credentials_cache',
+    'fetch_notification_credentials',
+    'get_notification_credentials',
+    'invalidate_notification_credentials',
+    'save_telegram_credentials',
+    'save_smtp_credentials'
+]
@@ -3,20 +3,166 @@ Data Management Module - Handles loading and saving portfolio data
 Unified database layer using SQLAlchemy with backward compatibility for JSON
 """
 
+import copy
 import json
 import os
-from flask import current_app
-from datetime import datetime
+from flask import current_app, g, has_request_context, session
+from datetime import datetime, timedelta
+from sqlalchemy.orm import selectinload, configure_mappers
 from extensions import db
+from .cache import get_portfolio_cache
+from .stats import adjust_workspace_stats
 from models import (
     Workspace, User, Project, Skill, Client, Message,
     VisitorLog, Service, NotificationSettings
 )
 
 
-def get_workspace_by_username(username):
-    """Get workspace by username slug"""
-    return Workspace.query.filter_by(slug=username).first()
+# Portfolio sections that live in child tables. The scalar workspace fields
+# (name, title, about, contact, social, settings, ...) are always included.
+PORTFOLIO_SECTIONS = frozenset({
+    'skills', 'projects', 'clients', 'messages', 'services', 'visitors', 'notifications'
+})
+
+# Workspace relationship backing each section. Visitors are summarized with
+# aggregate queries (see get_visitor_stats) rather than loaded row by row.
+SECTION_RELATIONSHIPS = {
+    'skills': 'skills',
+    'projects': 'projects',
+    'clients': 'clients',
+    'messages': 'messages',
+    'services': 'services',
+    'visitors': None,
+    'notifications': 'notification_settings',
+}
+
+# Number of individual visits included in the visitors section
+RECENT_VISITS_LIMIT = 20
+
+
+# Sections that only change through save_data() and the repository
+# functions, which bump Workspace.version. They are cached across requests
+# and workers keyed on that version. Messages, visitors and notification
+# settings are written on other paths and are always read live.
+VERSIONED_SECTIONS = frozenset({'skills', 'projects', 'services', 'clients'})
+
+
+def normalize_sections(sections=None):
+    """Resolve a sections argument to a frozenset (None means every section)"""
+    if sections is None:
+        return PORTFOLIO_SECTIONS
+    if isinstance(sections, str):
+        sections = [sections]
+    return frozenset(sections) & PORTFOLIO_SECTIONS
+
+
+def get_request_cache():
+    """
+    Per-request identity cache stored on flask.g
+
+    Holds User rows by username and serialized portfolio sections by
+    workspace slug so repeated lookups within one request (route, decorators,
+    context processor, template helpers) hit the database once.
+    Returns None outside a request, so scripts and background threads that
+    hold a long-lived app context never see stale data.
+    """
+    if not has_request_context():
+        return None
+    cache = g.get('_data_cache')
+    if cache is None:
+        cache = g._data_cache = {'users': {}, 'portfolios': {}}
+    return cache
+
+
+def invalidate_request_cache(username=None):
+    """Drop cached portfolio data for one workspace, or everything when username is None"""
+    cache = get_request_cache()
+    if cache is None:
+        return
+    if username is None:
+        cache['users'].clear()
+        cache['portfolios'].clear()
+    else:
+        cache['portfolios'].pop(username, None)
+
+
+def get_user_by_username(username):
+    """Get a User row by username, memoized for the current request"""
+    if not username:
+        return None
+    cache = get_request_cache()
+    if cache is not None and username in cache['users']:
+        return cache['users'][username]
+    user = User.query.filter_by(username=username).first()
+    if cache is not None and user is not None:
+        cache['users'][username] = user
+    return user
+
+
+def get_current_user():
+    """Get the User row for the logged-in session user, memoized for the current request"""
+    return get_user_by_username(session.get('username'))
+
+
+def get_workspace_by_username(username, sections=()):
+    """
+    Get workspace by username slug
+
+    Each requested section is eager-loaded with a single SELECT ... IN query
+    over the matching Workspace relationship, so serializing it afterwards
+    does not issue any further queries.
+    """
+    query = Workspace.query.filter_by(slug=username)
+    relationships = [SECTION_RELATIONSHIPS[name] for name in normalize_sections(sections)]
+    relationships = [name for name in relationships if name]
+    if relationships:
+        configure_mappers()
+        query = query.options(*[
+            selectinload(getattr(Workspace, name)) for name in relationships
+        ])
+    return query.first()
+
+
+def bump_workspace_version(workspace):
+    """
+    Increment the workspace version in the pending UPDATE
+
+    Uses a SQL expression (version = version + 1) so concurrent writers in
+    different workers never hand out the same version twice.
+    """
+    workspace.version = Workspace.version + 1
+
+
+def fetch_portfolio(username, sections=None):
+    """
+    Serialize the requested sections of a workspace
+
+    Versioned sections are served from the portfolio cache when the stored
+    entry was built from the current Workspace.version; everything else is
+    eager-loaded with the workspace row. The version check is free because
+    the workspace row is read anyway.
+
+    Returns:
+        dict | None: Portfolio dict, or None if the workspace does not exist
+    """
+    sections = normalize_sections(sections)
+    cache = get_portfolio_cache()
+    cached_sections = sections & VERSIONED_SECTIONS if cache is not None else frozenset()
+    live_sections = sections - cached_sections
+
+    workspace = get_workspace_by_username(username, sections=live_sections)
+    if not workspace:
+        return None
+    result = workspace_to_dict(workspace, sections=live_sections)
+
+    for name in cached_sections:
+        key = f"{workspace.slug}/{name}"
+        value = cache.get(key, workspace.version)
+        if value is None:
+            value = workspace_to_dict(workspace, sections={name})[name]
+            cache.set(key, workspace.version, value)
+        result[name] = copy.deepcopy(value)
+    return result
 
 
 def get_or_create_workspace(username, name=None):
@@ -34,24 +180,35 @@ def get_or_create_workspace(username, name=None):
     return workspace
 
 
-def load_data(username=None):
+def load_data(username=None, sections=None):
     """
     Load portfolio data for a specific user or global data
     Uses database first, falls back to JSON for backward compatibility
+
+    Args:
+        username (str, optional): Workspace slug to load
+        sections (iterable, optional): Subset of PORTFOLIO_SECTIONS to load.
+            None loads every section; an empty set loads only the scalar
+            workspace fields (name, title, contact, social, settings, ...).
+            Sections that were not requested are absent from the result.
     """
     try:
         if username:
-            workspace = get_workspace_by_username(username)
-            if workspace:
-                return workspace_to_dict(workspace)
+            # A None result means the workspace does not exist
+            if get_request_cache() is not None:
+                portfolio = load_cached_portfolio(username, sections)
             else:
-                json_data = load_data_from_json(username=username)
-                if json_data and json_data.get('username'):
-                    workspace = get_or_create_workspace(username, json_data.get('name', username))
-                    save_data(json_data, username=username)
-                    return workspace_to_dict(workspace)
-                else:
-                    return load_data_from_json(username=username)
+                portfolio = fetch_portfolio(username, sections)
+            if portfolio is not None:
+                return portfolio
+            
+            json_data = load_data_from_json(username=username)
+            if json_data and json_data.get('username'):
+                get_or_create_workspace(username, json_data.get('name', username))
+                save_data(json_data, username=username)
+                return fetch_portfolio(username, sections)
+            else:
+                return load_data_from_json(username=username)
         
         users = User.query.all()
         workspaces = Workspace.query.all()
@@ -72,55 +229,138 @@ def load_data(username=None):
         return load_data_from_json(username=username)
 
 
-def workspace_to_dict(workspace):
-    """Convert workspace model to dictionary"""
+def load_cached_portfolio(username, sections=None):
+    """
+    Serve load_data(username, sections) from the request cache
+
+    Sections already serialized earlier in the request are reused and only
+    the missing ones are queried. Returns a deep copy limited to the
+    requested sections (callers mutate the dict before save_data), or None
+    when there is no request cache or no workspace for username (the miss
+    is remembered until the next save_data for that workspace).
+    """
+    cache = get_request_cache()
+    if cache is None:
+        return None
+    wanted = normalize_sections(sections)
+    if username in cache['portfolios'] and cache['portfolios'][username] is None:
+        return None
+    entry = cache['portfolios'].get(username)
+    missing = wanted if entry is None else wanted - entry['sections']
+
+    if entry is None or missing:
+        fetched = fetch_portfolio(username, missing)
+        if fetched is None:
+            cache['portfolios'][username] = None
+            return None
+        if entry is None:
+            entry = cache['portfolios'][username] = {'sections': set(), 'data': {}}
+        entry['data'].update(fetched)
+        entry['sections'] |= missing
+
+    data = entry['data']
+    excluded = PORTFOLIO_SECTIONS - wanted
+    return copy.deepcopy({key: value for key, value in data.items() if key not in excluded})
+
+
+def workspace_to_dict(workspace, sections=None):
+    """Convert workspace model to dictionary, serializing only the requested sections"""
     if not workspace:
         return get_default_portfolio_data()
     
-    skills = [{'name': s.name, 'level': s.level} for s in Skill.query.filter_by(workspace_id=workspace.id).all()]
-    projects = [project_to_dict(p) for p in Project.query.filter_by(workspace_id=workspace.id).all()]
-    clients = [client_to_dict(c) for c in Client.query.filter_by(workspace_id=workspace.id).all()]
-    messages = [message_to_dict(m) for m in Message.query.filter_by(workspace_id=workspace.id).all()]
-    services = [service_to_dict(s) for s in Service.query.filter_by(workspace_id=workspace.id).all()]
-    
-    visitor_logs = VisitorLog.query.filter_by(workspace_id=workspace.id).all()
-    today_visits = []
-    unique_ips = set()
-    for log in visitor_logs:
-        if log.created_at.date() == datetime.utcnow().date():
-            today_visits.append({
-                'ip': log.ip_address,
-                'timestamp': log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'date': log.created_at.strftime('%Y-%m-%d')
-            })
-        unique_ips.add(log.ip_address)
-    
-    notifications = {}
-    notif_settings = NotificationSettings.query.filter_by(workspace_id=workspace.id).first()
-    if notif_settings and notif_settings.telegram_bot_token:
-        notifications['telegram'] = {
-            'bot_token': notif_settings.telegram_bot_token,
-            'chat_id': notif_settings.telegram_chat_id,
-            'configured_at': notif_settings.telegram_configured_at.strftime('%Y-%m-%d %H:%M:%S') if notif_settings.telegram_configured_at else None
-        }
-    
-    return {
+    sections = normalize_sections(sections)
+    result = {
         'username': workspace.slug,
         'name': workspace.name,
         'title': workspace.title or '',
         'description': workspace.description or '',
         'about': workspace.about or '',
         'photo': workspace.photo or '',
-        'skills': skills,
-        'projects': projects,
-        'clients': clients,
-        'messages': messages,
-        'services': services,
         'contact': workspace.contact or {},
         'social': workspace.social or {},
         'settings': workspace.settings or {'theme': 'luxury-gold'},
-        'visitors': {'total': len(visitor_logs), 'today': today_visits, 'unique_ips': list(unique_ips)},
-        'notifications': notifications
+    }
+    
+    if 'skills' in sections:
+        result['skills'] = [{'name': s.name, 'level': s.level} for s in workspace.skills]
+    if 'projects' in sections:
+        result['projects'] = [project_to_dict(p) for p in workspace.projects]
+    if 'clients' in sections:
+        result['clients'] = [client_to_dict(c) for c in workspace.clients]
+    if 'messages' in sections:
+        result['messages'] = [message_to_dict(m) for m in workspace.messages]
+    if 'services' in sections:
+        result['services'] = [service_to_dict(s) for s in workspace.services]
+    
+    if 'visitors' in sections:
+        result['visitors'] = get_visitor_stats(workspace.id)
+    
+    if 'notifications' in sections:
+        notifications = {}
+        notif_settings = workspace.notification_settings
+        if notif_settings and notif_settings.telegram_bot_token:
+            notifications['telegram'] = {
+                'bot_token': notif_settings.telegram_bot_token,
+                'chat_id': notif_settings.telegram_chat_id,
+                'configured_at': notif_settings.telegram_configured_at.strftime('%Y-%m-%d %H:%M:%S') if notif_settings.telegram_configured_at else None
+            }
+        result['notifications'] = notifications
+    
+    return result
+
+
+def utc_day_range(day=None):
+    """Half-open [start, end) datetime range covering a UTC day (today by default)"""
+    start = datetime.combine(day or datetime.utcnow().date(), datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def get_visitor_stats(workspace_id, recent_limit=RECENT_VISITS_LIMIT):
+    """
+    Summarize a workspace's visitor log with aggregate queries
+
+    All predicates are on (workspace_id, created_at) so they are served by
+    idx_visitor_workspace_date; "today" is a half-open UTC range instead of
+    func.date() so the index can be used for it.
+
+    Returns:
+        dict: {'total': int, 'today': int, 'unique': int, 'unique_today': int,
+               'recent': [{'ip', 'timestamp', 'date'}, ...]} with at most
+               recent_limit visits, newest first
+    """
+    today_start, today_end = utc_day_range()
+
+    total, unique = db.session.query(
+        db.func.count(VisitorLog.id),
+        db.func.count(db.distinct(VisitorLog.ip_address))
+    ).filter(VisitorLog.workspace_id == workspace_id).one()
+
+    today, unique_today = db.session.query(
+        db.func.count(VisitorLog.id),
+        db.func.count(db.distinct(VisitorLog.ip_address))
+    ).filter(
+        VisitorLog.workspace_id == workspace_id,
+        VisitorLog.created_at >= today_start,
+        VisitorLog.created_at < today_end
+    ).one()
+
+    recent = []
+    if recent_limit:
+        rows = db.session.query(VisitorLog.ip_address, VisitorLog.created_at).filter(
+            VisitorLog.workspace_id == workspace_id
+        ).order_by(VisitorLog.created_at.desc()).limit(recent_limit).all()
+        recent = [{
+            'ip': ip_address,
+            'timestamp': created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else None,
+            'date': created_at.strftime('%Y-%m-%d') if created_at else None
+        } for ip_address, created_at in rows]
+
+    return {
+        'total': total or 0,
+        'today': today or 0,
+        'unique': unique or 0,
+        'unique_today': unique_today or 0,
+        'recent': recent
     }
 
 
@@ -162,6 +402,8 @@ def client_to_dict(client):
         'project_description': client.project_description or '',
         'status': client.status or 'lead',
         'price': client.price or '',
+        'amount': client.amount,
+        'currency': client.currency or DEFAULT_CURRENCY,
         'deadline': client.deadline.strftime('%Y-%m-%d') if client.deadline else None,
         'start_date': client.start_date.strftime('%Y-%m-%d') if client.start_date else None,
         'notes': client.notes or '',
@@ -228,124 +470,281 @@ def get_default_portfolio_data():
         'description': 'Welcome to my professional portfolio.',
         'skills': [], 'projects': [], 'services': [], 'messages': [], 'clients': [],
         'settings': {'theme': 'luxury-gold'},
-        'visitors': {'total': 0, 'today': [], 'unique_ips': []}
+        'visitors': {'total': 0, 'today': 0, 'unique': 0, 'unique_today': 0, 'recent': []}
     }
 
 
-def save_data(user_data, username=None, auto_backup=True):
+def parse_date(value):
+    """Parse a YYYY-MM-DD string into a date, returning None when empty or invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_float(value):
+    """Coerce form/JSON numeric input to float, returning None when empty or invalid"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY'}
+DEFAULT_CURRENCY = 'USD'
+
+
+def parse_amount(value):
+    """Extract the numeric amount from a free-form price such as '$1,500.00'"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = ''.join(ch for ch in str(value) if ch.isdigit() or ch == '.')
+    return parse_float(cleaned)
+
+
+def parse_currency(value, default=DEFAULT_CURRENCY):
+    """Guess the ISO currency of a free-form price, or default when it names none"""
+    text = str(value or '').upper()
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            return code
+    letters = ''.join(ch for ch in text if ch.isalpha())
+    if len(letters) == 3 and any(ch.isdigit() for ch in text):
+        return letters
+    return default
+
+
+def project_values(project_data):
+    """Map a project dict to Project column values"""
+    return {
+        'title': project_data.get('title', ''),
+        'description': project_data.get('description', ''),
+        'short_description': project_data.get('short_description', ''),
+        'content': project_data.get('content', ''),
+        'image': project_data.get('image', ''),
+        'demo_url': project_data.get('demo_url', ''),
+        'github_url': project_data.get('github_url', ''),
+        'technologies': project_data.get('technologies', []),
+        'gallery': project_data.get('gallery', []),
+        'skill_related': project_data.get('skill_related', []),
+        'project_type': project_data.get('project_type', 'portfolio'),
+        'badge': project_data.get('badge', ''),
+        'request_budget_min': parse_float(project_data.get('request_budget_min')),
+        'request_budget_max': parse_float(project_data.get('request_budget_max')),
+        'request_deadline': parse_date(project_data.get('request_deadline')),
+        'request_status': project_data.get('request_status', 'open')
+    }
+
+
+def service_values(service_data):
+    """Map a service dict to Service column values"""
+    return {
+        'title': service_data.get('title', ''),
+        'description': service_data.get('description', ''),
+        'short_description': service_data.get('short_description', ''),
+        'category': service_data.get('category', ''),
+        'pricing_type': service_data.get('pricing_type', 'custom'),
+        'price_min': parse_float(service_data.get('price_min')),
+        'price_max': parse_float(service_data.get('price_max')),
+        'currency': service_data.get('currency', 'USD'),
+        'deliverables': service_data.get('deliverables', []),
+        'duration': service_data.get('duration', ''),
+        'skills_required': service_data.get('skills_required', []),
+        'image': service_data.get('image', ''),
+        'gallery': service_data.get('gallery', []),
+        'is_active': service_data.get('is_active', True),
+        'is_featured': service_data.get('is_featured', False)
+    }
+
+
+def client_values(client_data):
+    """Map a client dict to Client column values"""
+    return {
+        'name': client_data.get('name', ''),
+        'email': client_data.get('email', ''),
+        'phone': client_data.get('phone', ''),
+        'company': client_data.get('company', ''),
+        'project_title': client_data.get('project_title', ''),
+        'project_description': client_data.get('project_description', ''),
+        'status': client_data.get('status', 'lead'),
+        'price': client_data.get('price', ''),
+        'amount': parse_amount(client_data.get('price')),
+        # A currency named in the price wins over a stored or supplied one
+        'currency': parse_currency(client_data.get('price'), client_data.get('currency') or DEFAULT_CURRENCY),
+        'deadline': parse_date(client_data.get('deadline')),
+        'start_date': parse_date(client_data.get('start_date')),
+        'notes': client_data.get('notes', '')
+    }
+
+
+def apply_values(row, values):
+    """Assign only the column values that differ; returns True if the row changed"""
+    changed = False
+    for column, value in values.items():
+        if getattr(row, column) != value:
+            setattr(row, column, value)
+            changed = True
+    return changed
+
+
+def sync_rows(model, stored_rows, incoming, values_fn, workspace_id):
+    """
+    Reconcile stored child rows with incoming dicts, matching on id
+
+    Rows whose id is missing from the incoming list are deleted, unknown ids
+    are inserted and matching rows are updated only when a column differs,
+    so untouched rows keep their created_at and are not rewritten.
+
+    Returns:
+        dict: {'inserted': n, 'updated': n, 'deleted': n}
+    """
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0}
+    stored = {str(row.id): row for row in stored_rows}
+    seen = set()
+
+    for item in incoming:
+        values = values_fn(item)
+        item_id = item.get('id')
+        key = str(item_id) if item_id not in (None, '') else None
+        row = stored.get(key) if key and key not in seen else None
+
+        if row is not None:
+            if apply_values(row, values):
+                stats['updated'] += 1
+        else:
+            new_row = model(workspace_id=workspace_id, **values)
+            if key and key not in seen and key not in stored:
+                new_row.id = key
+            db.session.add(new_row)
+            stats['inserted'] += 1
+        if key:
+            seen.add(key)
+
+    for key, row in stored.items():
+        if key not in seen:
+            db.session.delete(row)
+            stats['deleted'] += 1
+    return stats
+
+
+def sync_skills(stored_rows, incoming, workspace_id):
+    """Reconcile skills, which carry no id in the portfolio dict, by name"""
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0}
+    stored = {}
+    for row in stored_rows:
+        stored.setdefault(row.name, []).append(row)
+
+    for skill_data in incoming:
+        name = skill_data.get('name', '')
+        level = skill_data.get('level', 50)
+        candidates = stored.get(name)
+        if candidates:
+            row = candidates.pop(0)
+            if apply_values(row, {'level': level}):
+                stats['updated'] += 1
+        else:
+            db.session.add(Skill(workspace_id=workspace_id, name=name, level=level))
+            stats['inserted'] += 1
+
+    for rows in stored.values():
+        for row in rows:
+            db.session.delete(row)
+            stats['deleted'] += 1
+    return stats
+
+
+def save_data(user_data, username=None, auto_backup=True, return_stats=False):
+    """
+    Persist portfolio data for a user
+
+    Child sections present in user_data (skills, projects, services, clients)
+    are diffed against the stored rows and only the required INSERT, UPDATE
+    and DELETE statements are issued, all in one transaction.
+
+    Args:
+        user_data (dict): Portfolio data as produced by load_data()
+        username (str, optional): Workspace slug; global JSON data when omitted
+        auto_backup (bool): Passed through to the JSON mirror
+        return_stats (bool): Return the per-table row counts instead of True
+
+    Returns:
+        bool | dict: Success status, or when return_stats is set a dict such as
+        {'inserted': 1, 'updated': 0, 'deleted': 0, 'tables': {...}}
+        (None on failure)
+    """
+    from .site_globals import invalidate_workspace_globals
+    
     try:
         if not username:
             if os.environ.get('FLASK_ENV') == 'production':
-                return False
+                return None if return_stats else False
             return save_data_to_json(user_data, username, auto_backup)
         
-        workspace = get_or_create_workspace(username, user_data.get('name'))
-        workspace.name = user_data.get('name', workspace.name)
-        workspace.title = user_data.get('title', '')
-        workspace.description = user_data.get('description', '')
-        workspace.photo = user_data.get('photo', '')
-        workspace.about = user_data.get('about', '')
-        workspace.contact = user_data.get('contact', {})
-        workspace.social = user_data.get('social', {})
-        workspace.settings = user_data.get('settings', {'theme': 'luxury-gold'})
+        synced_sections = [s for s in ('skills', 'projects', 'services', 'clients') if s in user_data]
+        workspace = get_workspace_by_username(username, sections=synced_sections)
+        if not workspace:
+            get_or_create_workspace(username, user_data.get('name'))
+            workspace = get_workspace_by_username(username, sections=synced_sections)
         
-        if 'skills' in user_data:
-            Skill.query.filter_by(workspace_id=workspace.id).delete()
-            for skill_data in user_data.get('skills', []):
-                skill = Skill(workspace_id=workspace.id, name=skill_data.get('name', ''), level=skill_data.get('level', 50))
-                db.session.add(skill)
+        tables = {}
+        workspace_changed = apply_values(workspace, {
+            'name': user_data.get('name', workspace.name),
+            'title': user_data.get('title', ''),
+            'description': user_data.get('description', ''),
+            'photo': user_data.get('photo', ''),
+            'about': user_data.get('about', ''),
+            'contact': user_data.get('contact', {}),
+            'social': user_data.get('social', {}),
+            'settings': user_data.get('settings', {'theme': 'luxury-gold'})
+        })
+        tables['workspaces'] = {'inserted': 0, 'updated': int(workspace_changed), 'deleted': 0}
         
+        if 'skills' in user_data:
+            tables['skills'] = sync_skills(workspace.skills, user_data.get('skills', []), workspace.id)
         if 'projects' in user_data:
-            Project.query.filter_by(workspace_id=workspace.id).delete()
-            for project_data in user_data.get('projects', []):
-                request_deadline = None
-                if project_data.get('request_deadline'):
-                    try:
-                        request_deadline = datetime.strptime(project_data['request_deadline'], '%Y-%m-%d').date()
-                    except: pass
-                project = Project(
-                    workspace_id=workspace.id,
-                    id=project_data.get('id'),
-                    title=project_data.get('title', ''),
-                    description=project_data.get('description', ''),
-                    short_description=project_data.get('short_description', ''),
-                    content=project_data.get('content', ''),
-                    image=project_data.get('image', ''),
-                    demo_url=project_data.get('demo_url', ''),
-                    github_url=project_data.get('github_url', ''),
-                    technologies=project_data.get('technologies', []),
-                    gallery=project_data.get('gallery', []),
-                    skill_related=project_data.get('skill_related', []),
-                    project_type=project_data.get('project_type', 'portfolio'),
-                    badge=project_data.get('badge', ''),
-                    request_budget_min=project_data.get('request_budget_min'),
-                    request_budget_max=project_data.get('request_budget_max'),
-                    request_deadline=request_deadline,
-                    request_status=project_data.get('request_status', 'open')
-                )
-                db.session.add(project)
-        
+            tables['projects'] = sync_rows(Project, workspace.projects, user_data.get('projects', []), project_values, workspace.id)
         if 'services' in user_data:
-            Service.query.filter_by(workspace_id=workspace.id).delete()
-            for service_data in user_data.get('services', []):
-                service = Service(
-                    workspace_id=workspace.id,
-                    id=service_data.get('id'),
-                    title=service_data.get('title', ''),
-                    description=service_data.get('description', ''),
-                    short_description=service_data.get('short_description', ''),
-                    category=service_data.get('category', ''),
-                    pricing_type=service_data.get('pricing_type', 'custom'),
-                    price_min=service_data.get('price_min'),
-                    price_max=service_data.get('price_max'),
-                    currency=service_data.get('currency', 'USD'),
-                    deliverables=service_data.get('deliverables', []),
-                    duration=service_data.get('duration', ''),
-                    skills_required=service_data.get('skills_required', []),
-                    image=service_data.get('image', ''),
-                    gallery=service_data.get('gallery', []),
-                    is_active=service_data.get('is_active', True),
-                    is_featured=service_data.get('is_featured', False)
-                )
-                db.session.add(service)
-        
+            tables['services'] = sync_rows(Service, workspace.services, user_data.get('services', []), service_values, workspace.id)
         if 'clients' in user_data:
-            Client.query.filter_by(workspace_id=workspace.id).delete()
-            for client_data in user_data.get('clients', []):
-                deadline = None
-                start_date = None
-                if client_data.get('deadline'):
-                    try: deadline = datetime.strptime(client_data['deadline'], '%Y-%m-%d').date()
-                    except: pass
-                if client_data.get('start_date'):
-                    try: start_date = datetime.strptime(client_data['start_date'], '%Y-%m-%d').date()
-                    except: pass
-                client = Client(
-                    workspace_id=workspace.id,
-                    id=client_data.get('id'),
-                    name=client_data.get('name', ''),
-                    email=client_data.get('email', ''),
-                    phone=client_data.get('phone', ''),
-                    company=client_data.get('company', ''),
-                    project_title=client_data.get('project_title', ''),
-                    project_description=client_data.get('project_description', ''),
-                    status=client_data.get('status', 'lead'),
-                    price=client_data.get('price', ''),
-                    deadline=deadline,
-                    start_date=start_date,
-                    notes=client_data.get('notes', '')
-                )
-                db.session.add(client)
+            tables['clients'] = sync_rows(Client, workspace.clients, user_data.get('clients', []), client_values, workspace.id)
+        
+        stats = {
+            key: sum(table[key] for table in tables.values())
+            for key in ('inserted', 'updated', 'deleted')
+        }
+        stats['tables'] = tables
+        if stats['inserted'] or stats['updated'] or stats['deleted']:
+            bump_workspace_version(workspace)
+        adjust_workspace_stats(workspace.id, **{
+            table: counts['inserted'] - counts['deleted']
+            for table, counts in tables.items() if table != 'workspaces'
+        })
         
         db.session.commit()
+        invalidate_request_cache(username)
+        invalidate_workspace_globals(username)
+        current_app.logger.debug(
+            f"Saved portfolio for {username}: {stats['inserted']} inserted, "
+            f"{stats['updated']} updated, {stats['deleted']} deleted"
+        )
+        
         if os.environ.get('FLASK_ENV') != 'production':
             save_data_to_json(user_data, username, auto_backup)
-        return True
+        return stats if return_stats else True
     except Exception as e:
         db.session.rollback()
+        invalidate_request_cache(username)
         current_app.logger.error(f"Error saving data: {str(e)}")
-        if os.environ.get('FLASK_ENV') == 'production': return False
-        return save_data_to_json(user_data, username, auto_backup)
+        if os.environ.get('FLASK_ENV') == 'production':
+            return None if return_stats else False
+        saved = save_data_to_json(user_data, username, auto_backup)
+        return None if return_stats else saved
 
 
 def load_data_from_json(username=None):
@@ -375,10 +774,8 @@ def save_data_to_json(user_data, username=None, auto_backup=True):
 
 
 def get_current_theme(session_obj):
-    username = session_obj.get('username')
-    if not username: return 'luxury-gold'
-    user_data = load_data(username=username)
-    return user_data.get('settings', {}).get('theme', 'luxury-gold')
+    from .site_globals import get_user_theme
+    return get_user_theme(session_obj.get('username'))
 
 
 def get_global_meta():
@@ -32,19 +32,15 @@ def disable_in_demo(f):
     """Decorator to disable actions in demo mode with specific endpoint rules"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from models import User
         from flask import request
+        from utils.access import refresh_session_access
         
-        # Refresh session data from database if user is logged in
+        # Refresh session data from database if the user's access version changed
         if 'admin_logged_in' in session:
             username = session.get('username')
             if username:
                 try:
-                    user = User.query.filter_by(username=username).first()
-                    if user:
-                        # Update session with latest status from database
-                        session['is_demo_mode'] = user.is_demo
-                        session['is_admin'] = (user.role == 'admin')
+                    refresh_session_access(username)
                 except Exception as e:
                     from flask import current_app
                     current_app.logger.error(f"Error refreshing session: {str(e)}")
@@ -0,0 +1,519 @@
+"""
+Delivery Module - Bounded notification delivery pool
+
+Each gunicorn worker runs one DeliveryPool: a fixed number of threads
+draining a bounded, time-ordered queue of Telegram and email jobs.
+Telegram calls reuse a keep-alive requests.Session per bot token, email
+reuses authenticated SMTP connections per SMTP account, and token buckets
+keep every destination under its rate limit (Telegram allows about one
+message per second per chat, 20 per minute per group and 30 per second
+per bot). With a shared RATE_LIMIT_BACKEND (sqlite or redis) those
+limits are counted in the shared store, so every worker and outbox
+dispatcher sending for the same bot draws on the same budget. Jobs that
+hit a limit or a transient error are rescheduled instead of blocking a
+thread. On shutdown the queue is drained for up to NOTIFY_DRAIN_TIMEOUT
+seconds.
+"""
+
+import hashlib
+import heapq
+import itertools
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from .ratelimit import MemoryRateLimitBackend, create_rate_limit_backend, retry_after
+from .worker_state import ProcessLocal, app_singleton
+
+
+DEFAULT_RATE_LIMITS = {
+    'telegram_chat': (1, 1),      # per private chat
+    'telegram_group': (20, 60),   # per group / channel (negative chat id)
+    'telegram_bot': (30, 1),      # per bot token
+    'smtp': (30, 60),             # per SMTP account
+}
+
+
+class RetryLater(Exception):
+    """Delivery should be retried after delay seconds (rate limited or transient failure)"""
+
+    def __init__(self, delay, reason=''):
+        super().__init__(reason or f'retry in {delay}s')
+        self.delay = max(0.0, float(delay))
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst"""
+
+    def __init__(self, rate, burst, now):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = now
+
+    def wait_time(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class DestinationLimiter:
+    """
+    Per-destination limits: token buckets keyed by destination, bounded by
+    LRU eviction, or counters in a shared rate limit backend
+
+    With a shared backend each limit is a sliding-window counter there
+    (utils/ratelimit.py), checked narrowest first; if the store fails the
+    local buckets take over until it answers again.
+    """
+
+    def __init__(self, max_keys=10000, backend=None):
+        self.max_keys = max_keys
+        self.backend = backend
+        self.backend_errors = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(key):
+        # Keys carry bot tokens and SMTP accounts; only a digest goes to the store
+        digest = hashlib.sha256(repr(key[1:]).encode('utf-8')).hexdigest()[:32]
+        return f'notify:{key[0]}:{digest}'
+
+    def reserve(self, limits, now=None):
+        """
+        Take one token from every bucket, or none of them
+
+        Args:
+            limits (list): (key, count, seconds) triples
+
+        Returns:
+            float: 0 when the job may go now, otherwise seconds to wait
+        """
+        if self.backend is not None:
+            try:
+                return self._reserve_shared(limits)
+            except Exception as e:
+                self.backend_errors += 1
+                current_app.logger.warning(f"Shared notification rate limits failed, using local buckets: {str(e)}")
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = []
+            for key, count, seconds in limits:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = TokenBucket(count / seconds, count, now)
+                    self._buckets[key] = bucket
+                self._buckets.move_to_end(key)
+                buckets.append(bucket)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            wait = max((bucket.wait_time(now) for bucket in buckets), default=0.0)
+            if wait == 0:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+            return wait
+
+    def _reserve_shared(self, limits):
+        # A denied hit is not counted, so the narrowest limit (last) is
+        # checked first and a refusal there costs the wider ones nothing
+        now = time.time()
+        for key, count, seconds in reversed(limits):
+            allowed, _ = self.backend.hit(self._shared_key(key), int(count), int(seconds), now)
+            if not allowed:
+                return float(retry_after(now, int(seconds)))
+        return 0.0
+
+
+class TelegramTransport:
+    """Bot API client keeping one keep-alive session per bot token"""
+
+    def __init__(self, api_url='https://api.telegram.org', timeout=10, max_sessions=64, pool_size=4):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.pool_size = pool_size
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, token):
+        with self._lock:
+            http = self._sessions.get(token)
+            if http is None:
+                http = requests.Session()
+                http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+                http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+                self._sessions[token] = http
+            self._sessions.move_to_end(token)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)[1].close()
+            return http
+
+    def send(self, token, chat_id, text, parse_mode='HTML'):
+        """
+        Call sendMessage
+
+        Returns:
+            bool: True when Telegram accepted the message
+
+        Raises:
+            RetryLater: On 429 (honouring retry_after), 5xx and connection errors
+        """
+        url = f"{self.api_url}/bot{token}/sendMessage"
+        payload = {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode}
+        try:
+            response = self._session(token).post(url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RetryLater(2, f'Telegram connection error: {e}')
+        if response.status_code == 429:
+            try:
+                delay = response.json().get('parameters', {}).get('retry_after', 1)
+            except ValueError:
+                delay = 1
+            raise RetryLater(delay, 'Telegram rate limit')
+        if response.status_code >= 500:
+            raise RetryLater(2, f'Telegram API error {response.status_code}')
+        return response.status_code == 200
+
+    def close(self):
+        with self._lock:
+            for http in self._sessions.values():
+                http.close()
+            self._sessions.clear()
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP connections reused per SMTP account
+
+    Idle connections older than idle_timeout are closed instead of reused;
+    a reused connection the server has dropped is replaced by a freshly
+    connected and logged-in one and the message is sent again.
+    """
+
+    def __init__(self, max_idle=2, idle_timeout=60, timeout=10, starttls=True):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.starttls = starttls
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    @staticmethod
+    def _key(cfg):
+        return (cfg.get('host'), int(cfg.get('port') or 587), cfg.get('email'), cfg.get('password'))
+
+    def _connect(self, cfg):
+        server = smtplib.SMTP(cfg['host'], int(cfg.get('port') or 587), timeout=self.timeout)
+        try:
+            if cfg.get('starttls', self.starttls):
+                server.starttls()
+            if cfg.get('password'):
+                server.login(cfg['email'], cfg['password'])
+        except Exception:
+            server.close()
+            raise
+        self.connects += 1
+        return server
+
+    def _checkout(self, cfg):
+        key = self._key(cfg)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                server, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return server, True
+                self._quit(server)
+        return self._connect(cfg), False
+
+    def _checkin(self, cfg, server):
+        key = self._key(cfg)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((server, time.monotonic()))
+                return
+        self._quit(server)
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def send(self, cfg, message):
+        """
+        Send an email.message.Message through a pooled connection for cfg
+
+        A connection is only checked back in after a successful send; on
+        any failure it is closed.
+        """
+        server, reused = self._checkout(cfg)
+        try:
+            server.send_message(message)
+        except Exception as e:
+            self._quit(server)
+            if not (reused and self._stale(e)):
+                raise
+            # The idle connection went stale; reconnect and authenticate again
+            server = self._connect(cfg)
+            try:
+                server.send_message(message)
+            except Exception:
+                self._quit(server)
+                raise
+        self._checkin(cfg, server)
+
+    @staticmethod
+    def _stale(error):
+        """Whether a failed send may be retried on a fresh connection"""
+        if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException)):
+            return True
+        # SMTPException subclasses OSError; refused recipients are not a connection problem
+        return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for server, _ in connections:
+                self._quit(server)
+
+
+class DeliveryPool(ProcessLocal):
+    """
+    Fixed-size thread pool delivering notification jobs
+
+    Jobs are dicts: {'channel': 'telegram', 'token', 'chat_id', 'text'} or
+    {'channel': 'email', 'smtp': config, 'message': MIME message}, plus an
+    optional 'label' for logging. The queue is a heap ordered by the time a
+    job becomes due, bounded by max_queue.
+    """
+
+    def __init__(self, app, workers=4, max_queue=1000, max_attempts=3,
+                 rate_limits=None, telegram=None, smtp=None, limiter=None, drain_timeout=10):
+        self.app = app
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.max_attempts = max(1, int(max_attempts))
+        self.drain_timeout = drain_timeout
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.telegram = telegram or TelegramTransport()
+        self.smtp = smtp or SMTPConnectionPool()
+        self.limiter = limiter or DestinationLimiter()
+        self.counters = {'submitted': 0, 'delivered': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._in_flight = 0
+        self._accepting = True
+        self._running = True
+
+    def _ensure_threads(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f'notify-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _push(self, job, due):
+        heapq.heappush(self._queue, (due, next(self._sequence), job))
+        self._condition.notify()
+
+    def submit(self, job):
+        """
+        Queue a job for delivery
+
+        Returns:
+            bool: False when the pool is shutting down or the queue is full
+        """
+        self._check_pid()
+        with self._condition:
+            if not self._accepting or len(self._queue) >= self.max_queue:
+                self.counters['dropped'] += 1
+                reason = 'queue full' if self._accepting else 'pool stopped'
+                self.app.logger.warning(f"Notification {reason}, dropped {job.get('label') or job['channel']}")
+                return False
+            job.setdefault('attempts', 0)
+            self._push(job, time.monotonic())
+            self.counters['submitted'] += 1
+            self._ensure_threads()
+        return True
+
+    def submit_telegram(self, token, chat_id, text, label=None):
+        return self.submit({'channel': 'telegram', 'token': token, 'chat_id': str(chat_id), 'text': text, 'label': label})
+
+    def submit_email(self, smtp_config, message, label=None):
+        return self.submit({'channel': 'email', 'smtp': dict(smtp_config), 'message': message, 'label': label})
+
+    def limits(self, job):
+        """(bucket key, count, seconds) triples a job must fit into"""
+        if job['channel'] == 'telegram':
+            token, chat_id = job['token'], job['chat_id']
+            chat_policy = 'telegram_group' if chat_id.startswith('-') else 'telegram_chat'
+            return [
+                (('bot', token),) + tuple(self.rate_limits['telegram_bot']),
+                (('chat', token, chat_id),) + tuple(self.rate_limits[chat_policy]),
+            ]
+        return [(('smtp', job['smtp'].get('host'), job['smtp'].get('email')),) + tuple(self.rate_limits['smtp'])]
+
+    def deliver(self, job):
+        """Deliver one job in the calling thread; raises RetryLater to reschedule"""
+        if job['channel'] == 'telegram':
+            if not self.telegram.send(job['token'], job['chat_id'], job['text']):
+                raise ValueError('Telegram rejected the message')
+        else:
+            try:
+                self.smtp.send(job['smtp'], job['message'])
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                raise RetryLater(5, f'SMTP unavailable: {e}')
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._queue and self._queue[0][0] <= now:
+                    self._in_flight += 1
+                    return heapq.heappop(self._queue)[2]
+                if not self._running:
+                    return None
+                timeout = self._queue[0][0] - now if self._queue else None
+                self._condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _process(self, job):
+        label = job.get('label') or job['channel']
+        wait = self.limiter.reserve(self.limits(job))
+        if wait > 0:
+            with self._condition:
+                self._push(job, time.monotonic() + wait)
+            return
+        try:
+            self.deliver(job)
+            self.counters['delivered'] += 1
+            return
+        except RetryLater as e:
+            delay, error = e.delay, str(e)
+        except Exception as e:
+            delay, error = 2 ** job['attempts'], str(e)
+        job['attempts'] += 1
+        if job['attempts'] >= self.max_attempts:
+            self.counters['failed'] += 1
+            self.app.logger.error(f"Notification {label} failed after {job['attempts']} attempts: {error}")
+            return
+        self.counters['retried'] += 1
+        with self._condition:
+            self._push(job, time.monotonic() + delay)
+
+    def pending(self):
+        with self._condition:
+            return len(self._queue) + self._in_flight
+
+    def shutdown(self, timeout=None):
+        """Stop accepting jobs, deliver what is queued for up to timeout (default drain_timeout) seconds, then stop"""
+        if self._forked():
+            return
+        deadline = time.monotonic() + (self.drain_timeout if timeout is None else timeout)
+        with self._condition:
+            self._accepting = False
+            while (self._queue or self._in_flight) and self._threads:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            left = len(self._queue)
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()) + 0.1)
+        if left:
+            self.counters['dropped'] += left
+            self.app.logger.warning(f"Notification pool stopped with {left} undelivered jobs")
+        self.telegram.close()
+        self.smtp.close()
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update({
+            'pending': self.pending(),
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'smtp_connects': self.smtp.connects,
+            'limiter_backend': type(self.limiter.backend).__name__ if self.limiter.backend is not None else 'local',
+            'limiter_errors': self.limiter.backend_errors
+        })
+        return stats
+
+
+def _create_delivery_pool(app):
+    config = app.config
+    backend = None
+    try:
+        backend = create_rate_limit_backend(
+            config.get('RATE_LIMIT_BACKEND', 'memory'),
+            config.get('RATE_LIMIT_PATH'),
+            config.get('RATE_LIMIT_REDIS_URL'),
+            config.get('RATE_LIMIT_MAX_KEYS', 10000)
+        )
+    except Exception as e:
+        app.logger.error(f"Could not open shared notification rate limits, using local buckets: {str(e)}")
+    if isinstance(backend, MemoryRateLimitBackend):
+        backend = None  # Per worker anyway; the token buckets are finer grained
+    return DeliveryPool(
+        app,
+        workers=config.get('NOTIFY_WORKERS', 4),
+        max_queue=config.get('NOTIFY_QUEUE_SIZE', 1000),
+        max_attempts=config.get('NOTIFY_MAX_ATTEMPTS', 3),
+        rate_limits=config.get('NOTIFY_RATE_LIMITS'),
+        telegram=TelegramTransport(
+            config.get('TELEGRAM_API_URL', 'https://api.telegram.org'),
+            timeout=config.get('NOTIFY_TIMEOUT', 10),
+            pool_size=config.get('NOTIFY_WORKERS', 4)
+        ),
+        smtp=SMTPConnectionPool(
+            max_idle=config.get('NOTIFY_SMTP_POOL_SIZE', 2),
+            idle_timeout=config.get('NOTIFY_SMTP_IDLE_TIMEOUT', 60),
+            timeout=config.get('NOTIFY_TIMEOUT', 10),
+            starttls=config.get('NOTIFY_SMTP_STARTTLS', True)
+        ),
+        limiter=DestinationLimiter(backend=backend),
+        drain_timeout=config.get('NOTIFY_DRAIN_TIMEOUT', 10)
+    )
+
+
+def get_delivery_pool():
+    """Get this worker's delivery pool for the current app"""
+    return app_singleton('delivery_pool', _create_delivery_pool, DeliveryPool.shutdown)
+
+
+__all__ = [
+    'RetryLater',
+    'DestinationLimiter',
+    'TelegramTransport',
+    'SMTPConnectionPool',
+    'DeliveryPool',
+    'get_delivery_pool'
+]
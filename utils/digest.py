@@ -0,0 +1,71 @@
+"""
+Digest Module - Coalescing bursts of notifications into digests
+
+A notification for a (recipient, channel) key that has been quiet for its
+coalescing window goes out immediately. Further notifications inside the
+window are held and delivered together as one digest when the window
+closes, so a burst costs one message per window instead of one per event.
+Windows come from NOTIFY_COALESCE_WINDOWS (seconds per channel, 0 turns
+coalescing off).
+
+Coalesced notifications are outbox rows: the dispatcher holds and merges
+them in the database (see utils/outbox.py), so every worker applies the
+same windows and a restart loses nothing. Low-priority categories can
+instead be collected into a daily email digest (NOTIFY_DIGEST_*).
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+
+
+TELEGRAM_MAX_LENGTH = 4096
+SEPARATOR = '\n\n➖➖➖\n\n'
+
+
+def coalesce_window(channel):
+    """Coalescing window in seconds for a channel ('telegram' or 'email')"""
+    windows = current_app.config.get('NOTIFY_COALESCE_WINDOWS') or {}
+    return max(0, int(windows.get(channel, 0)))
+
+
+def digest_category(category):
+    """Whether email for a category goes into the daily digest"""
+    config = current_app.config
+    return bool(
+        category and config.get('NOTIFY_DIGEST_ENABLED', False)
+        and category in config.get('NOTIFY_DIGEST_CATEGORIES', ())
+    )
+
+
+def next_digest_time(now=None):
+    """Next NOTIFY_DIGEST_HOUR:00 UTC"""
+    now = now or datetime.utcnow()
+    hour = int(current_app.config.get('NOTIFY_DIGEST_HOUR', 8))
+    due = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    return due if due > now else due + timedelta(days=1)
+
+
+def merge_entries(header, entries, limit=TELEGRAM_MAX_LENGTH, separator=SEPARATOR):
+    """
+    Join entries under a header, within limit characters
+
+    Entries that no longer fit are summarized as a trailing "+N more" line.
+    """
+    text = header
+    for index, entry in enumerate(entries):
+        piece = (separator if index else '') + entry
+        remaining = len(entries) - index
+        more = f"{separator}… +{remaining} more"
+        if len(text) + len(piece) + (len(more) if remaining > 1 else 0) > limit:
+            return text + more
+        text += piece
+    return text
+
+
+__all__ = [
+    'TELEGRAM_MAX_LENGTH',
+    'coalesce_window',
+    'digest_category',
+    'next_digest_time',
+    'merge_entries'
+]
@@ -0,0 +1,110 @@
+"""
+Directory Module - Paginated listing of public portfolios
+
+Backs the landing gallery, the catalog and the sitemap. Only the columns a
+portfolio card renders are selected, verification comes from a join on the
+owning user, and pages are fetched with keyset pagination on the username
+so the cost of a page does not grow with the size of the platform.
+"""
+
+from sqlalchemy import func
+from extensions import db
+from models import Workspace, User
+
+
+# Cards truncate their blurb to ~120 characters, never ship whole about texts
+CARD_SUMMARY_LENGTH = 240
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def directory_query(verified=None, after=None, include_admin=False):
+    """
+    Build the directory SELECT (without LIMIT)
+
+    A workspace is listed under the user whose username equals its slug,
+    the same pairing load_data() uses. Rows are ordered by username so
+    the (is_verified, username) index serves both the filter and the order.
+
+    Args:
+        verified (bool, optional): True/False to filter on User.is_verified,
+            None for every portfolio
+        after (str, optional): Keyset cursor, the last username of the
+            previous page
+        include_admin (bool): Whether admin accounts are listed
+    """
+    summary = func.substr(
+        func.coalesce(func.nullif(Workspace.description, ''), Workspace.about, ''),
+        1, CARD_SUMMARY_LENGTH
+    )
+    query = db.session.query(
+        User.username,
+        User.is_verified,
+        Workspace.name,
+        Workspace.title,
+        Workspace.photo,
+        Workspace.updated_at,
+        summary.label('summary')
+    ).join(Workspace, Workspace.slug == User.username)
+
+    if verified is not None:
+        query = query.filter(User.is_verified == bool(verified))
+    if not include_admin:
+        query = query.filter(User.role != 'admin', User.username != 'admin')
+    if after:
+        query = query.filter(User.username > after)
+    return query.order_by(User.username)
+
+
+def row_to_card(row):
+    """Convert a directory row to the dict portfolio cards render"""
+    return {
+        'username': row.username,
+        'name': row.name,
+        'title': row.title or '',
+        'photo': row.photo or '',
+        'description': row.summary or '',
+        'is_verified': bool(row.is_verified),
+        'updated_at': row.updated_at
+    }
+
+
+def get_directory_page(verified=True, after=None, limit=DEFAULT_PAGE_SIZE, include_admin=False):
+    """
+    Fetch one page of portfolio cards
+
+    Args:
+        verified (bool, optional): Verification filter, see directory_query()
+        after (str, optional): Cursor returned as next_cursor by the previous page
+        limit (int): Page size, clamped to MAX_PAGE_SIZE
+        include_admin (bool): Whether admin accounts are listed
+
+    Returns:
+        tuple: (cards, next_cursor) - next_cursor is None on the last page
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    # One extra row tells us whether another page exists
+    rows = directory_query(verified, after, include_admin).limit(limit + 1).all()
+    cards = [row_to_card(row) for row in rows[:limit]]
+    next_cursor = cards[-1]['username'] if len(rows) > limit else None
+    return cards, next_cursor
+
+
+def iter_directory(verified=True, batch_size=MAX_PAGE_SIZE, include_admin=False):
+    """Yield every matching card, one keyset page at a time"""
+    after = None
+    while True:
+        cards, after = get_directory_page(verified, after, batch_size, include_admin)
+        yield from cards
+        if after is None:
+            return
+
+
+__all__ = [
+    'CARD_SUMMARY_LENGTH',
+    'DEFAULT_PAGE_SIZE',
+    'MAX_PAGE_SIZE',
+    'directory_query',
+    'get_directory_page',
+    'iter_directory'
+]
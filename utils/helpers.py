@@ -7,7 +7,9 @@ import json
 import shutil
 from datetime import datetime
 from flask import current_app, session
-from .data import load_data
+from .data import load_data, get_user_by_username, DEFAULT_CURRENCY
+from .stats import get_workspace_stats, record_visit
+from .visits import get_visit_buffer
 
 
 def allowed_file(filename):
@@ -105,8 +107,7 @@ def keep_recent_backups(max_backups=20):
 def get_unread_messages_count():
     """Get count of unread messages for current user or admin"""
     try:
-        from models import Message, User
-        from extensions import db
+        from .message_queries import unread_count_query
         
         username = session.get('username')
         is_admin = session.get('is_admin', False)
@@ -115,23 +116,13 @@ def get_unread_messages_count():
             return 0
         
         if is_admin:
-            unread_count = Message.query.filter(
-                Message.is_read == False,
-                db.or_(
-                    Message.workspace_id.is_(None),
-                    Message.receiver_id == 'admin',
-                    Message.category == 'platform'
-                )
-            ).count()
+            unread_count = unread_count_query(is_admin=True).count()
         else:
-            user = User.query.filter_by(username=username).first()
-            if not user:
+            user = get_user_by_username(username)
+            if not user or not user.workspace_id:
                 return 0
             
-            unread_count = Message.query.filter(
-                Message.is_read == False,
-                Message.workspace_id == user.workspace_id
-            ).count()
+            unread_count = get_workspace_stats(user.workspace_id)['unread_messages']
         
         return unread_count
     except Exception as e:
@@ -142,16 +133,15 @@ def get_unread_messages_count():
 def get_visitor_count():
     """Get visitor count for current user's portfolio"""
     try:
-        from models import User, VisitorLog
         username = session.get('username')
         if not username:
             return 0
         
-        user = User.query.filter_by(username=username).first()
+        user = get_user_by_username(username)
         if not user or not user.workspace_id:
             return 0
             
-        return VisitorLog.query.filter_by(workspace_id=user.workspace_id).count()
+        return get_workspace_stats(user.workspace_id)['visitors_total']
     except Exception as e:
         current_app.logger.error(f"Error getting visitor count: {str(e)}")
         return 0
@@ -160,7 +150,7 @@ def get_visitor_count():
 def get_clients_stats(username=None):
     """Get client statistics for user"""
     try:
-        from models import User, Project, Skill, Client, Service, Message, VisitorLog
+        from models import Client
         from extensions import db
         
         if not username:
@@ -169,52 +159,49 @@ def get_clients_stats(username=None):
         if not username:
             return {'total': 0, 'active': 0, 'pending': 0, 'revenue': 0.0, 'recent': [], 'projects': 0, 'skills': 0, 'services': 0, 'messages': 0, 'visitors': 0, 'today_visitors': 0}
         
-        user = User.query.filter_by(username=username).first()
+        user = get_user_by_username(username)
         if not user or not user.workspace_id:
              return {'total': 0, 'active': 0, 'pending': 0, 'revenue': 0.0, 'recent': [], 'projects': 0, 'skills': 0, 'services': 0, 'messages': 0, 'visitors': 0, 'today_visitors': 0}
 
         workspace_id = user.workspace_id
         
-        projects_count = Project.query.filter_by(workspace_id=workspace_id).count()
-        skills_count = Skill.query.filter_by(workspace_id=workspace_id).count()
-        services_count = Service.query.filter_by(workspace_id=workspace_id).count()
-        messages_count = Message.query.filter_by(workspace_id=workspace_id).count()
-        
-        visitors_count = VisitorLog.query.filter_by(workspace_id=workspace_id).count()
-        today = datetime.now().date()
-        today_visitors = VisitorLog.query.filter(
-            VisitorLog.workspace_id == workspace_id,
-            db.func.date(VisitorLog.created_at) == today
-        ).count()
+        counters = get_workspace_stats(workspace_id)
         
-        clients = Client.query.filter_by(workspace_id=workspace_id).all()
-        total_clients = len(clients)
-        active_clients = len([c for c in clients if c.status in ['in-progress', 'negotiation']])
-        pending_clients = len([c for c in clients if c.status == 'lead'])
+        # One grouped query gives counts and revenue per status and currency
+        rows = db.session.query(
+            Client.status,
+            Client.currency,
+            db.func.count(Client.id),
+            db.func.coalesce(db.func.sum(Client.amount), 0.0)
+        ).filter(Client.workspace_id == workspace_id).group_by(Client.status, Client.currency).all()
+        by_status = {}
+        revenue_by_currency = {}
+        for status, currency, count, revenue in rows:
+            currency = currency or DEFAULT_CURRENCY
+            item = by_status.setdefault(status, {'count': 0, 'revenue': {}})
+            item['count'] += count
+            item['revenue'][currency] = item['revenue'].get(currency, 0.0) + float(revenue or 0)
+            revenue_by_currency[currency] = revenue_by_currency.get(currency, 0.0) + float(revenue or 0)
         
-        total_revenue = 0.0
-        for c in clients:
-            price = getattr(c, 'price', '')
-            if price:
-                try:
-                    price_clean = ''.join(ch for ch in str(price) if ch.isdigit() or ch == '.')
-                    if price_clean:
-                        total_revenue += float(price_clean)
-                except (ValueError, TypeError):
-                    pass
+        recent = Client.query.filter_by(workspace_id=workspace_id).order_by(
+            Client.created_at.desc()
+        ).limit(5).all()
         
         return {
-            'total': total_clients,
-            'active': active_clients,
-            'pending': pending_clients,
-            'revenue': total_revenue,
-            'recent': clients[-5:] if clients else [],
-            'projects': projects_count,
-            'skills': skills_count,
-            'services': services_count,
-            'messages': messages_count,
-            'visitors': visitors_count,
-            'today_visitors': today_visitors
+            'total': sum(item['count'] for item in by_status.values()),
+            'active': sum(by_status.get(status, {}).get('count', 0) for status in ('in-progress', 'negotiation')),
+            'pending': by_status.get('lead', {}).get('count', 0),
+            # Amounts in different currencies are never added together
+            'revenue': revenue_by_currency.get(DEFAULT_CURRENCY, 0.0),
+            'revenue_by_currency': revenue_by_currency,
+            'revenue_by_status': {status: item['revenue'] for status, item in by_status.items()},
+            'recent': recent,
+            'projects': counters['projects'],
+            'skills': counters['skills'],
+            'services': counters['services'],
+            'messages': counters['messages'],
+            'visitors': counters['visitors_total'],
+            'today_visitors': counters['visitors_today']
         }
     except Exception as e:
         current_app.logger.error(f"Error getting client stats: {str(e)}")
@@ -224,7 +211,7 @@ def get_clients_stats(username=None):
 def track_visitor(username=None):
     """Track visitor to user's portfolio"""
     try:
-        from models import User, VisitorLog, Workspace
+        from models import VisitorLog, Workspace
         from extensions import db
         from .security import get_client_ip
         
@@ -234,17 +221,23 @@ def track_visitor(username=None):
         if not username:
             return
 
-        user = User.query.filter_by(username=username).first()
+        user = get_user_by_username(username)
         if not user or not user.workspace_id:
             return
 
         client_ip = get_client_ip()
+        buffer = get_visit_buffer()
+        if buffer is not None:
+            # Written in batches by the buffer's thread (see utils/visits.py)
+            buffer.add(user.workspace_id, client_ip)
+            return
+        
         new_log = VisitorLog(
             workspace_id=user.workspace_id,
-            ip_address=client_ip,
-            user_agent=getattr(current_app, 'user_agent', 'Unknown')
+            ip_address=client_ip
         )
         db.session.add(new_log)
+        record_visit(user.workspace_id)
         db.session.commit()
     except Exception as e:
         current_app.logger.error(f"Error tracking visitor: {str(e)}")
@@ -0,0 +1,304 @@
+"""
+Log Store Module - Append-only JSONL security and audit logs
+
+Events are buffered in memory and appended by a background thread, one
+JSON object per line, so logging never rewrites (or even reads) the log on
+the request path. Appends take an exclusive lock on a sidecar .lock file,
+which also guards rotation, so several gunicorn workers can share a file.
+Files rotate by size and by age into path.1 ... path.N.
+
+read_log_page() pages backwards through the current file and its rotated
+predecessors, reading only the blocks it returns.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import current_app, has_app_context
+from .worker_state import ProcessLocal
+
+try:
+    import fcntl
+except ImportError:  # Windows: O_APPEND writes without a cross-process lock
+    fcntl = None
+
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 60 * 60
+DEFAULT_BACKUPS = 5
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BUFFER = 1000
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JSONLLogWriter(ProcessLocal):
+    """
+    Buffered append-only writer for one JSONL file
+
+    append() only queues the entry; a daemon thread writes the queue every
+    flush_interval seconds (sooner once max_buffer entries are waiting)
+    and at interpreter exit. If the disk stalls, at most 10 * max_buffer
+    entries are held and the oldest are dropped beyond that.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 backups=DEFAULT_BACKUPS, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_buffer=DEFAULT_MAX_BUFFER):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.max_age = int(max_age)
+        self.backups = max(1, int(backups))
+        self.flush_interval = float(flush_interval)
+        self.max_buffer = max(1, int(max_buffer))
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f'jsonl-log:{self.path}', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the entries for the next attempt; never kill the thread
+                time.sleep(self.flush_interval)
+
+    def append(self, entry):
+        """Queue one entry (a JSON-serializable dict)"""
+        self._check_pid()
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer * 10:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+            self._ensure_thread()
+        if pending >= self.max_buffer:
+            self._wake.set()
+
+    def flush(self):
+        """Write every queued entry with one locked append; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._buffer)
+                self._buffer.clear()
+            if not entries:
+                return 0
+            data = ''.join(
+                json.dumps(entry, ensure_ascii=False, default=str) + '\n' for entry in entries
+            ).encode('utf-8')
+            try:
+                self._write(data)
+            except Exception:
+                with self._lock:
+                    self._buffer.extendleft(reversed(entries))
+                raise
+            self.written += len(entries)
+            return len(entries)
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                if self._should_rotate(len(data)):
+                    self._rotate()
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _should_rotate(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        if self.max_bytes and size + incoming > self.max_bytes:
+            return True
+        if self.max_age:
+            started = first_entry_time(self.path)
+            return started is not None and time.time() - started > self.max_age
+        return False
+
+    def _rotate(self):
+        """Shift path -> path.1 -> ... -> path.N, dropping the oldest (lock held)"""
+        oldest = f'{self.path}.{self.backups}'
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        os.replace(self.path, f'{self.path}.1')
+        self.rotations += 1
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'pending': len(self._buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+            'rotations': self.rotations
+        }
+
+
+def first_entry_time(path):
+    """Epoch time of the first entry of a log file, or None"""
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline()
+        timestamp = json.loads(line).get('timestamp')
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(path):
+    """
+    Get the process-wide writer for a log file, creating it on first use
+
+    Rotation and flushing are read from the SECURITY_LOG_* settings when an
+    app context is available, otherwise the module defaults apply.
+    """
+    writer = _writers.get(path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(path)
+            if writer is None:
+                config = current_app.config if has_app_context() else {}
+                writer = JSONLLogWriter(
+                    path,
+                    max_bytes=config.get('SECURITY_LOG_MAX_BYTES', DEFAULT_MAX_BYTES),
+                    max_age=config.get('SECURITY_LOG_MAX_AGE', DEFAULT_MAX_AGE),
+                    backups=config.get('SECURITY_LOG_BACKUPS', DEFAULT_BACKUPS),
+                    flush_interval=config.get('SECURITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+                )
+                _writers[path] = writer
+    return writer
+
+
+def flush_all():
+    """Flush every writer of this process (runs at exit)"""
+    for writer in list(_writers.values()):
+        try:
+            writer.flush()
+        except Exception:
+            pass
+
+
+atexit.register(flush_all)
+
+
+def _lines_backwards(f, end, block_size=8192):
+    """Yield (offset, line) pairs from byte offset end towards the start of the file"""
+    position = end
+    remainder = b''
+    while position > 0:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b'\n')
+        remainder = lines[0]
+        offset = position + len(remainder) + 1
+        found = []
+        for line in lines[1:]:
+            found.append((offset, line))
+            offset += len(line) + 1
+        for item in reversed(found):
+            if item[1]:
+                yield item
+    if remainder:
+        yield 0, remainder
+
+
+def read_log_page(path, limit=50, cursor=None, backups=DEFAULT_BACKUPS):
+    """
+    Read one page of entries, newest first
+
+    Args:
+        path (str): Log file (rotated files are path.1 ... path.N)
+        limit (int): Maximum entries to return
+        cursor (str, optional): next_cursor of the previous page
+        backups (int): Number of rotated files to continue into
+
+    Returns:
+        tuple: (entries, next_cursor) - next_cursor is None after the oldest
+        entry. A rotation between two requests shifts the pages by one file.
+    """
+    limit = max(1, int(limit))
+    file_index, end = 0, None
+    if cursor:
+        # "<file index>:<byte offset>", the offset is empty for "whole file"
+        index, _, offset = str(cursor).partition(':')
+        try:
+            file_index, end = int(index), (int(offset) if offset else None)
+        except ValueError:
+            file_index, end = 0, None
+
+    entries = []
+    while file_index <= backups:
+        file_path = path if file_index == 0 else f'{path}.{file_index}'
+        try:
+            with open(file_path, 'rb') as f:
+                if end is None:
+                    end = os.fstat(f.fileno()).st_size
+                for offset, line in _lines_backwards(f, end):
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # Torn or foreign line
+                    if len(entries) == limit:
+                        if offset == 0:
+                            return entries, f'{file_index + 1}:'
+                        return entries, f'{file_index}:{offset}'
+        except FileNotFoundError:
+            pass
+        file_index, end = file_index + 1, None
+    return entries, None
+
+
+def tail_log(path, limit=50):
+    """The newest entries of a log, newest first"""
+    return read_log_page(path, limit)[0]
+
+
+__all__ = [
+    'TIMESTAMP_FORMAT',
+    'JSONLLogWriter',
+    'get_log_writer',
+    'flush_all',
+    'read_log_page',
+    'tail_log'
+]
@@ -0,0 +1,174 @@
+"""
+Message Queries Module - Shared builders for the inbox access patterns
+
+The dashboard routes and the unread helpers build their Message queries
+here so the query-plan harness (utils/query_plans.py) explains exactly the
+SQL that runs in production. Each builder returns an unexecuted
+Message.query; callers add .all(), .count() or .limit().
+
+Audiences defined by an OR across columns (the admin's inbox and unread
+messages, a user's notification dropdown) are split into disjoint
+branches, each a range on its own index, and combined with UNION ALL: an
+OR between them leaves the planner reading every unread or top-level row.
+"""
+
+from extensions import db
+from models import Message
+
+
+def _union_newest_first(branches):
+    """Message.query over disjoint branches, newest first"""
+    first, *rest = [Message.query.filter(branch) for branch in branches]
+    return (first.union_all(*rest) if rest else first).order_by(Message.created_at.desc())
+
+
+def inbox_query(workspace_id=None, is_admin=False, category='all'):
+    """Top-level inbox messages (portfolio & platform, never internal), newest first"""
+    if is_admin:
+        # Admin inbox: platform messages only - messages without a workspace,
+        # plus platform messages filed under one
+        branches = [
+            db.and_(Message.workspace_id.is_(None), Message.category != 'internal'),
+            db.and_(Message.workspace_id.isnot(None), Message.category == 'platform')
+        ]
+    elif workspace_id:
+        # User inbox: portfolio messages of their workspace
+        branches = [db.and_(
+            Message.workspace_id == workspace_id,
+            Message.category != 'internal'
+        )]
+    else:
+        branches = [Message.id.is_(None)]
+
+    if category not in ('all', 'internal'):
+        branches = [db.and_(branch, Message.category == category) for branch in branches]
+
+    # Exclude replies (only show main messages)
+    return _union_newest_first([db.and_(branch, Message.parent_id.is_(None)) for branch in branches])
+
+
+def internal_threads_query(user=None, is_admin=False):
+    """Top-level internal conversations visible to the admin or a user, newest first"""
+    if is_admin:
+        participant = db.or_(
+            Message.receiver_id == 'admin',
+            Message.sender_role == 'admin'
+        )
+    else:
+        participant = db.or_(
+            Message.sender_id == str(user.id),
+            Message.receiver_id == str(user.id),
+            Message.name == user.username
+        )
+    return Message.query.filter(
+        Message.category == 'internal',
+        Message.parent_id.is_(None),
+        participant
+    ).order_by(Message.created_at.desc())
+
+
+def replies_query(parent_id):
+    """Replies of one thread in posting order"""
+    return Message.query.filter(Message.parent_id == parent_id).order_by(Message.created_at.asc())
+
+
+def admin_unread_branches():
+    """
+    Unread messages addressed to the platform admin, as disjoint branches
+
+    Messages to 'admin' (unread receiver index), other messages without a
+    workspace (unread workspace index) and the remaining platform messages
+    (unread category index).
+    """
+    unread = Message.is_read == False
+    not_to_admin = db.or_(Message.receiver_id.is_(None), Message.receiver_id != 'admin')
+    return [
+        db.and_(unread, Message.receiver_id == 'admin'),
+        db.and_(unread, Message.workspace_id.is_(None), not_to_admin),
+        db.and_(unread, Message.category == 'platform', Message.workspace_id.isnot(None), not_to_admin)
+    ]
+
+
+def admin_unread_filter():
+    """Unread messages addressed to the platform admin"""
+    return db.or_(*admin_unread_branches())
+
+
+def unread_count_query(workspace_id=None, is_admin=False):
+    """Unread messages counted in the dashboard badge"""
+    if is_admin:
+        return _union_newest_first(admin_unread_branches()).order_by(None)
+    return Message.query.filter(
+        Message.is_read == False,
+        Message.workspace_id == workspace_id
+    )
+
+
+def notification_branches(user=None, is_admin=False):
+    """
+    Disjoint halves of a viewer's notification dropdown
+
+    For the admin, the top-level part of admin_unread_branches(). For a
+    user, portfolio messages of the workspace (unread workspace index) and
+    internal messages from the admin to the user (unread receiver index).
+    """
+    unread_top_level = (Message.is_read == False, Message.parent_id.is_(None))
+    if is_admin:
+        # Platform messages and internal messages to admin
+        return [db.and_(branch, Message.parent_id.is_(None)) for branch in admin_unread_branches()]
+    # Portfolio messages from visitors and internal messages from admin
+    portfolio = db.and_(
+        Message.workspace_id == user.workspace_id,
+        Message.category == 'portfolio',
+        db.or_(
+            Message.sender_id.is_(None),
+            Message.sender_id != str(user.id)
+        ),
+        *unread_top_level
+    )
+    from_admin = db.and_(
+        Message.receiver_id == str(user.id),
+        Message.sender_role == 'admin',
+        Message.category == 'internal',
+        *unread_top_level
+    )
+    return [portfolio, from_admin]
+
+
+def notifications_filter(user=None, is_admin=False):
+    """Unread top-level messages that belong in a viewer's notification dropdown"""
+    return db.or_(*notification_branches(user, is_admin))
+
+
+def unread_notifications_query(user=None, is_admin=False):
+    """Unread top-level messages shown in the notification dropdown, newest first"""
+    return _union_newest_first(notification_branches(user, is_admin))
+
+
+def notifications_version_query(user=None, is_admin=False):
+    """(count, latest updated_at) of the dropdown's messages; changes whenever the dropdown would"""
+    # One aggregate per branch, added up in the same statement
+    branches = db.union_all(*[
+        db.select(
+            db.func.count(Message.id).label('total'),
+            db.func.max(Message.updated_at).label('latest')
+        ).where(branch)
+        for branch in notification_branches(user, is_admin)
+    ]).subquery()
+    return db.session.query(
+        db.func.coalesce(db.func.sum(branches.c.total), 0),
+        db.func.max(branches.c.latest)
+    )
+
+
+__all__ = [
+    'inbox_query',
+    'internal_threads_query',
+    'replies_query',
+    'admin_unread_branches',
+    'unread_count_query',
+    'notification_branches',
+    'notifications_filter',
+    'unread_notifications_query',
+    'notifications_version_query'
+]
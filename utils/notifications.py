@@ -3,14 +3,15 @@ Notifications Module - Email and Telegram notifications
 """
 
 import os
-import smtplib
 import json
-import requests
-import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from flask import current_app
-from .data import load_data
+from extensions import db
+from models import Workspace
+from .credentials import get_notification_credentials
+from .delivery import RetryLater, get_delivery_pool
+from .digest import coalesce_window, digest_category, next_digest_time, merge_entries
 
 
 def get_admin_notifications_config():
@@ -45,16 +46,14 @@ def load_smtp_config(username=None):
     # Try to load user-specific config first
     if username:
         try:
-            user_data = load_data(username=username)
-            if 'notifications' in user_data and 'smtp' in user_data['notifications']:
-                smtp_cfg = user_data['notifications']['smtp']
-                if all([
-                    smtp_cfg.get('host'),
-                    smtp_cfg.get('email'),
-                    smtp_cfg.get('password')
-                ]):
-                    current_app.logger.debug(f"Loaded user-specific SMTP config for {username}")
-                    return smtp_cfg
+            smtp_cfg = get_notification_credentials(username).smtp
+            if all([
+                smtp_cfg.get('host'),
+                smtp_cfg.get('email'),
+                smtp_cfg.get('password')
+            ]):
+                current_app.logger.debug(f"Loaded user-specific SMTP config for {username}")
+                return dict(smtp_cfg)
         except Exception as e:
             current_app.logger.debug(f"Could not load user SMTP config for {username}: {str(e)}")
 
@@ -88,6 +87,25 @@ def save_smtp_config(config):
         return False
 
 
+def _smtp_config_complete(smtp_config):
+    return all([
+        smtp_config.get('host'),
+        smtp_config.get('port'),
+        smtp_config.get('email'),
+        smtp_config.get('password')
+    ])
+
+
+def build_email_message(smtp_config, recipient, subject, body, html=False):
+    """Build the MIME message sent from an SMTP account"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = smtp_config.get('email')
+    msg['To'] = recipient
+    msg.attach(MIMEText(body, 'html' if html else 'plain'))
+    return msg
+
+
 def send_email(recipient, subject, body, html=False, username=None):
     """
     Send email using SMTP - user-specific config ONLY (never admin config)
@@ -107,30 +125,13 @@ def send_email(recipient, subject, body, html=False, username=None):
     """
     try:
         smtp_config = load_smtp_config(username=username)
-        if not all([
-            smtp_config.get('host'),
-            smtp_config.get('port'),
-            smtp_config.get('email'),
-            smtp_config.get('password')
-        ]):
+        if not _smtp_config_complete(smtp_config):
             current_app.logger.debug(f"SMTP config incomplete for user {username or 'global'}")
             return False
 
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = smtp_config.get('email')
-        msg['To'] = recipient
-
-        if html:
-            msg.attach(MIMEText(body, 'html'))
-        else:
-            msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP(smtp_config.get('host'),
-                         int(smtp_config.get('port'))) as server:
-            server.starttls()
-            server.login(smtp_config.get('email'), smtp_config.get('password'))
-            server.send_message(msg)
+        msg = build_email_message(smtp_config, recipient, subject, body, html)
+        # Sent in the caller's thread over a pooled, already authenticated connection
+        get_delivery_pool().smtp.send(smtp_config, msg)
 
         current_app.logger.info(f"Email sent to {recipient} using user {username or 'global'} SMTP config")
         return True
@@ -139,33 +140,123 @@ def send_email(recipient, subject, body, html=False, username=None):
         return False
 
 
-def send_admin_notification(subject, message_text, html_body=None):
+def queue_email(recipient, subject, body, html=False, username=None):
+    """
+    Queue an email on the delivery pool - user-specific config ONLY
+
+    Same credentials rules as send_email(), but returns as soon as the
+    message is queued.
+
+    Returns:
+        bool: True if the message was queued
+    """
+    smtp_config = load_smtp_config(username=username)
+    if not _smtp_config_complete(smtp_config):
+        current_app.logger.debug(f"SMTP config incomplete for user {username or 'global'}")
+        return False
+    msg = build_email_message(smtp_config, recipient, subject, body, html)
+    return get_delivery_pool().submit_email(smtp_config, msg, label=f'email:{username or "global"}')
+
+
+def _titled(items, single, digest):
+    """Title line: the subject of a single item, or the digest title"""
+    return single.format(subject=items[0][0]) if len(items) == 1 else digest.format(count=len(items))
+
+
+def _entries(items, bold='<b>{}</b>'):
+    """Body of each (subject, message_text) item; subjects only head digest entries"""
+    if len(items) == 1:
+        return [items[0][1]]
+    return [f"{bold.format(subject)}\n{text}" for subject, text in items]
+
+
+def admin_telegram_text(items):
+    """Admin Telegram message for one or more (subject, message_text) items"""
+    title = _titled(items, '📌 <b>{subject}</b>', '📌 <b>{count} notifications</b>')
+    return merge_entries(f"🛡️ <b>[Academy Admin System]</b>\n{title}\n\n", _entries(items))
+
+
+def user_telegram_text(items):
+    """User Telegram message for one or more (subject, message_text) items"""
+    title = _titled(items, '🔔 <b>{subject}</b>', '🔔 <b>{count} notifications</b>')
+    return merge_entries(f"💼 <b>[Your Professional Portfolio]</b>\n{title}\n\n", _entries(items))
+
+
+def admin_email_message(smtp_cfg, items):
+    """Admin email for one or more (subject, message_text, html_body) items"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"🛡️ [Academy Admin] {_titled(items, '{subject}', '{count} notifications')}"
+    msg['From'] = smtp_cfg['email']
+    msg['To'] = os.environ.get('ADMIN_RECIPIENT_EMAIL', smtp_cfg['email'])
+    
+    if len(items) == 1 and items[0][2]:
+        content = items[0][2]
+    else:
+        content = "<h3>🛡️ Administrative Notification</h3>" + ''.join(
+            f"<p>{text}</p>" if len(items) == 1 else f"<h4>{subject}</h4><p>{text}</p>"
+            for subject, text, _ in items
+        )
+    msg.attach(MIMEText(content, 'html'))
+    return msg
+
+
+def _workspace_id(username):
+    return db.session.query(Workspace.id).filter_by(slug=username).scalar()
+
+
+def queue_outbox_notification(workspace_id, channel, event, subject, message_text, html_body=None):
+    """
+    Store a notification as an outbox row (workspace_id None: the admin)
+
+    The dispatcher sends it and merges rows arriving within the channel's
+    coalescing window into one digest (see utils/outbox.py).
+
+    Returns:
+        bool: True if the row was stored
+    """
+    from .outbox import add_outbox_entry, wake_outbox  # The outbox imports this module
+    try:
+        add_outbox_entry(workspace_id, event, message_text, channel=channel, subject=subject, html=html_body)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Could not store {channel} notification in the outbox: {str(e)}")
+        return False
+    wake_outbox()
+    return True
+
+
+def send_admin_notification(subject, message_text, html_body=None, coalesce=True):
     """
     Send notification to admin via Telegram and SMTP
     
     IMPORTANT: This function ONLY uses admin credentials from environment variables.
     It NEVER uses user credentials, even if admin config is missing.
     
+    With a coalescing window configured for a channel, the notification
+    is stored in the outbox and merged with others arriving within the
+    window (see utils/outbox.py); otherwise it is sent right away.
+    
     Args:
         subject (str): Notification subject
         message_text (str): Notification message
         html_body (str, optional): HTML version of the message
+        coalesce (bool): Set to False to always send right away (e.g. tests)
     """
     config = get_admin_notifications_config()
+    pool = get_delivery_pool()
     
     # 1. Telegram Admin Notification (admin credentials only)
     tg_token = config['telegram']['bot_token']
     tg_chat = config['telegram']['chat_id']
     if tg_token and tg_chat:
         try:
-            url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
-            payload = {
-                'chat_id': tg_chat,
-                'text': f"🛡️ <b>[Academy Admin System]</b>\n📌 <b>{subject}</b>\n\n{message_text}",
-                'parse_mode': 'HTML'
-            }
-            threading.Thread(target=lambda: requests.post(url, json=payload, timeout=10)).start()
-            current_app.logger.info("Admin Telegram notification sent")
+            if coalesce and coalesce_window('telegram'):
+                if queue_outbox_notification(None, 'telegram', 'admin_notification', subject, message_text):
+                    current_app.logger.info("Admin Telegram notification stored in the outbox")
+            else:
+                pool.submit_telegram(tg_token, tg_chat, admin_telegram_text([(subject, message_text)]), label='telegram:admin')
+                current_app.logger.info("Admin Telegram notification queued")
         except Exception as e:
             current_app.logger.error(f"Admin Telegram Error: {str(e)}")
     else:
@@ -175,61 +266,60 @@ def send_admin_notification(subject, message_text, html_body=None):
     smtp_cfg = config['smtp']
     if all([smtp_cfg.get('host'), smtp_cfg.get('email'), smtp_cfg.get('password')]):
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"🛡️ [Academy Admin] {subject}"
-            msg['From'] = smtp_cfg['email']
-            msg['To'] = os.environ.get('ADMIN_RECIPIENT_EMAIL', smtp_cfg['email'])
-            
-            content = html_body if html_body else f"<h3>🛡️ Administrative Notification</h3><p>{message_text}</p>"
-            msg.attach(MIMEText(content, 'html'))
-            
-            def _send():
-                try:
-                    with smtplib.SMTP(smtp_cfg['host'], int(smtp_cfg.get('port', 587))) as server:
-                        server.starttls()
-                        server.login(smtp_cfg['email'], smtp_cfg['password'])
-                        server.send_message(msg)
-                    current_app.logger.info("Admin SMTP notification sent")
-                except Exception as e:
-                    current_app.logger.error(f"Admin SMTP send error: {str(e)}")
-            
-            threading.Thread(target=_send).start()
+            if coalesce and coalesce_window('email'):
+                if queue_outbox_notification(None, 'email', 'admin_notification', subject, message_text, html_body):
+                    current_app.logger.info("Admin SMTP notification stored in the outbox")
+            else:
+                pool.submit_email(smtp_cfg, admin_email_message(smtp_cfg, [(subject, message_text, html_body)]), label='email:admin')
+                current_app.logger.info("Admin SMTP notification queued")
         except Exception as e:
             current_app.logger.error(f"Admin SMTP Error: {str(e)}")
     else:
         current_app.logger.debug("Admin SMTP credentials not configured")
 
 
-def send_user_notification(username, subject, message_text, html_body=None):
+def send_user_notification(username, subject, message_text, html_body=None, category=None, coalesce=True):
     """
     Send notification to specific user via their Telegram and SMTP settings
     
     IMPORTANT: This function ONLY uses user-specific credentials.
     It NEVER uses admin credentials, even if user config is missing.
     
+    With a coalescing window configured for a channel, the notification
+    is stored in the outbox and merged with others arriving within the
+    window. Email for categories in NOTIFY_DIGEST_CATEGORIES waits for
+    the daily digest instead.
+    
     Args:
         username (str): Username of the recipient user
         subject (str): Notification subject
         message_text (str): Notification message
         html_body (str, optional): HTML version of the message
+        category (str, optional): e.g. 'message' or 'account'
+        coalesce (bool): Set to False to always send right away
     """
     if not username:
         current_app.logger.error("send_user_notification called without username")
         return
+    event = category or 'notification'
+    # Outbox rows are addressed to the user's workspace
+    workspace_id = None
+    if coalesce and (coalesce_window('telegram') or coalesce_window('email')):
+        workspace_id = _workspace_id(username)
     
     # 1. Telegram User Notification (user-specific only)
     tg_token, tg_chat = get_telegram_credentials(username=username)
     
     if tg_token and tg_chat:
         try:
-            url = f"https://api.telegram.org/bot{tg_token}/sendMessage"
-            payload = {
-                'chat_id': tg_chat,
-                'text': f"💼 <b>[Your Professional Portfolio]</b>\n🔔 <b>{subject}</b>\n\n{message_text}",
-                'parse_mode': 'HTML'
-            }
-            threading.Thread(target=lambda: requests.post(url, json=payload, timeout=10)).start()
-            current_app.logger.info(f"User Telegram notification sent to {username}")
+            if workspace_id and coalesce_window('telegram'):
+                if queue_outbox_notification(workspace_id, 'telegram', event, subject, message_text):
+                    current_app.logger.info(f"User Telegram notification for {username} stored in the outbox")
+            else:
+                get_delivery_pool().submit_telegram(
+                    tg_token, tg_chat, user_telegram_text([(subject, message_text)]), label=f'telegram:{username}'
+                )
+                current_app.logger.info(f"User Telegram notification queued for {username}")
         except Exception as e:
             current_app.logger.error(f"User Telegram Error ({username}): {str(e)}")
     else:
@@ -237,24 +327,55 @@ def send_user_notification(username, subject, message_text, html_body=None):
 
     # 2. SMTP User Notification (user-specific only)
     smtp_cfg = load_smtp_config(username=username)
-    user_email = smtp_cfg.get('email') or load_data(username=username).get('contact', {}).get('email')
+    user_email = smtp_cfg.get('email') or get_notification_credentials(username).contact_email
     
     if user_email and smtp_cfg.get('host'):
         try:
-            send_email(
-                recipient=user_email,
-                subject=f"💼 [Portfolio Notification] {subject}",
-                body=message_text,
-                html=bool(html_body),
-                username=username
-            )
-            current_app.logger.info(f"User SMTP notification sent to {username} at {user_email}")
+            if digest_category(category):
+                if queue_digest_email(username, category, subject, message_text):
+                    current_app.logger.info(f"User SMTP notification for {username} held for the daily digest")
+                return
+            
+            if workspace_id and coalesce_window('email'):
+                if queue_outbox_notification(workspace_id, 'email', event, subject, message_text):
+                    current_app.logger.info(f"User SMTP notification for {username} stored in the outbox")
+            else:
+                queue_email(
+                    recipient=user_email,
+                    subject=f"💼 [Portfolio Notification] {subject}",
+                    body=message_text,
+                    html=bool(html_body),
+                    username=username
+                )
+                current_app.logger.info(f"User SMTP notification queued for {username} at {user_email}")
         except Exception as e:
             current_app.logger.error(f"User SMTP Error ({username}): {str(e)}")
     else:
         current_app.logger.debug(f"No SMTP configuration for user {username}")
 
 
+def queue_digest_email(username, category, subject, message_text):
+    """
+    Hold a user email for the next daily digest (an outbox row due at NOTIFY_DIGEST_HOUR)
+
+    Returns:
+        bool: True if the row was stored
+    """
+    from .outbox import add_outbox_entry  # The outbox imports this module
+    try:
+        workspace_id = _workspace_id(username)
+        if workspace_id is None:
+            return False
+        add_outbox_entry(workspace_id, category, message_text, channel='email',
+                         subject=subject, due=next_digest_time())
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Could not store digest email for {username}: {str(e)}")
+        return False
+
+
 def get_telegram_credentials(username=None):
     """
     Get Telegram credentials - user-specific ONLY (never admin config)
@@ -269,24 +390,21 @@ def get_telegram_credentials(username=None):
         tuple: (bot_token, chat_id) or (None, None) if not found
     """
     if username:
-        # Get user-specific credentials from their data
+        # Get user-specific credentials from their notification settings
         try:
-            user_data = load_data(username=username)
+            credentials = get_notification_credentials(username)
+            bot_token = credentials.bot_token
+            chat_id = credentials.chat_id
             
-            if 'notifications' in user_data and 'telegram' in user_data['notifications']:
-                telegram_cfg = user_data['notifications']['telegram']
-                bot_token = telegram_cfg.get('bot_token', '')
-                chat_id = telegram_cfg.get('chat_id', '')
-                
-                if bot_token and chat_id:
-                    # Verify this is NOT admin config
-                    admin_config = get_admin_notifications_config()['telegram']
-                    if (bot_token == admin_config.get('bot_token') and 
-                        chat_id == admin_config.get('chat_id')):
-                        current_app.logger.warning(f"User {username} Telegram config matches admin config - ignoring to prevent mix-up")
-                        return None, None
-                    current_app.logger.debug(f"Loaded user-specific Telegram credentials for {username}")
-                    return bot_token, chat_id
+            if bot_token and chat_id:
+                # Verify this is NOT admin config
+                admin_config = get_admin_notifications_config()['telegram']
+                if (bot_token == admin_config.get('bot_token') and 
+                    chat_id == admin_config.get('chat_id')):
+                    current_app.logger.warning(f"User {username} Telegram config matches admin config - ignoring to prevent mix-up")
+                    return None, None
+                current_app.logger.debug(f"Loaded user-specific Telegram credentials for {username}")
+                return bot_token, chat_id
         except Exception as e:
             current_app.logger.debug(f"Could not load Telegram credentials for {username}: {str(e)}")
 
@@ -319,35 +437,38 @@ def send_telegram_notification(message_text, username=None):
         return False
     
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        payload = {
-            'chat_id': chat_id,
-            'text': message_text,
-            'parse_mode': 'HTML'
-        }
-        response = requests.post(url, json=payload, timeout=10)
-        if response.status_code == 200:
+        # Synchronous, over the bot's keep-alive session
+        if get_delivery_pool().telegram.send(bot_token, chat_id, message_text):
             current_app.logger.info(f"Telegram notification sent to user {username}")
             return True
         else:
-            current_app.logger.error(f"Telegram API error for user {username}: {response.status_code}")
+            current_app.logger.error(f"Telegram API rejected the message for user {username}")
             return False
+    except RetryLater as e:
+        current_app.logger.error(f"Telegram notification not sent for user {username}: {str(e)}")
+        return False
     except Exception as e:
         current_app.logger.error(f"Telegram notification error for user {username}: {str(e)}")
         return False
 
 
-def send_telegram_event_notification(event_type, details=None, username=None):
-    """Send event notification via Telegram"""
+def _event_message(event_type, details=None):
     if not details:
         details = f"Event: {event_type}"
-    
-    message = f"🔔 <b>Event Notification</b>\n\n<b>Type:</b> {event_type}\n<b>Details:</b> {details}"
-    send_telegram_notification(message, username=username)
+    return f"🔔 <b>Event Notification</b>\n\n<b>Type:</b> {event_type}\n<b>Details:</b> {details}"
+
+
+def send_telegram_event_notification(event_type, details=None, username=None):
+    """Send event notification via Telegram"""
+    send_telegram_notification(_event_message(event_type, details), username=username)
 
 
 def send_event_notification_async(event_type, details=None, username=None):
-    """Send event notification asynchronously - per-user"""
-    thread = threading.Thread(target=send_telegram_event_notification, args=(event_type, details, username))
-    thread.daemon = True
-    thread.start()
\ No newline at end of file
+    """Queue event notification on the delivery pool - per-user"""
+    bot_token, chat_id = get_telegram_credentials(username=username) if username else (None, None)
+    if not (bot_token and chat_id):
+        current_app.logger.debug(f"No Telegram credentials found for user {username}")
+        return False
+    return get_delivery_pool().submit_telegram(
+        bot_token, chat_id, _event_message(event_type, details), label=f'telegram:{username}'
+    )
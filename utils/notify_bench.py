@@ -0,0 +1,390 @@
+"""
+Notify Bench Module - Local Telegram/SMTP stand-ins and a throughput benchmark
+
+FakeTelegramServer answers the Bot API calls the app makes (sendMessage,
+getMe) and SMTPSink accepts mail over plain SMTP with any credentials.
+Both take a per-request latency and error rate, so slow or flaky
+providers can be reproduced locally. Point the app at them with
+TELEGRAM_API_URL, ADMIN_SMTP_HOST/PORT and NOTIFY_SMTP_STARTTLS=false
+(`flask notify-fakes` prints the settings).
+
+run_notification_benchmark() pushes admin and user notifications through
+the real send_*_notification() path into the stand-ins and reports
+throughput, enqueue latency, threads and connections
+(`flask bench-notifications`).
+"""
+
+import json
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import current_app
+
+
+class FakeTelegramServer:
+    """
+    Minimal Telegram Bot API over HTTP
+
+    error_rate is the share of sendMessage calls answered with a 500;
+    rate_limit_rate the share answered with a 429 carrying retry_after.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.messages = []
+        self.errors = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.endswith('/getMe'):
+                    self._reply(200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'username': 'fake_bot'}})
+                else:
+                    self._reply(404, {'ok': False, 'description': 'Not Found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length)
+                with fake._lock:
+                    fake.connections.add(self.client_address)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if not self.path.endswith('/sendMessage'):
+                    self._reply(404, {'ok': False, 'description': 'Not Found'})
+                    return
+                roll = random.random()
+                if roll < fake.rate_limit_rate:
+                    with fake._lock:
+                        fake.errors += 1
+                    self._reply(429, {'ok': False, 'error_code': 429,
+                                      'parameters': {'retry_after': fake.retry_after}})
+                    return
+                if roll < fake.rate_limit_rate + fake.error_rate:
+                    with fake._lock:
+                        fake.errors += 1
+                    self._reply(500, {'ok': False, 'error_code': 500})
+                    return
+                try:
+                    payload = json.loads(raw or b'{}')
+                except ValueError:
+                    payload = {}
+                with fake._lock:
+                    fake.messages.append(payload)
+                self._reply(200, {'ok': True, 'result': {'message_id': len(fake.messages)}})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        return {'messages': len(self.messages), 'errors': self.errors, 'connections': len(self.connections)}
+
+
+class SMTPSink:
+    """
+    Plain SMTP server that accepts any login and keeps every message
+
+    error_rate is the share of messages rejected with a 451 after DATA.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.messages = []
+        self.errors = 0
+        self.sessions = 0
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _handler(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def _send(self, line):
+                self.wfile.write(line.encode('utf-8') + b'\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.sessions += 1
+                self._send('220 smtp-sink ready')
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip().split(' ')[0].upper()
+                    if command in ('EHLO', 'HELO'):
+                        self._send('250-smtp-sink')
+                        self._send('250 AUTH PLAIN LOGIN')
+                    elif command == 'AUTH':
+                        self._send('235 2.7.0 Authentication successful')
+                    elif command == 'DATA':
+                        self._send('354 End data with <CR><LF>.<CR><LF>')
+                        self._data()
+                    elif command == 'QUIT':
+                        self._send('221 Bye')
+                        return
+                    else:  # MAIL, RCPT, RSET, NOOP
+                        self._send('250 OK')
+
+            def _data(self):
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line == b'.\r\n':
+                        break
+                    lines.append(line)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                if random.random() < sink.error_rate:
+                    with sink._lock:
+                        sink.errors += 1
+                    self._send('451 4.3.0 Temporary failure')
+                    return
+                with sink._lock:
+                    sink.messages.append(b''.join(lines))
+                self._send('250 OK queued')
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        return {'messages': len(self.messages), 'errors': self.errors, 'connections': self.sessions}
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_notification_benchmark(count=2000, users=50, latency=0.0, error_rate=0.0,
+                               admin_share=0.2, coalesce=False, rate_limits=False, timeout=120):
+    """
+    Send count notifications through the stand-ins and measure them
+
+    Benchmark users get credentials primed into the credentials cache, so
+    the numbers cover formatting, queueing and delivery only. Nothing is
+    written to the database unless coalesce is set: coalesced
+    notifications are outbox rows, so the run then creates a workspace per
+    benchmark user and deletes them and their rows afterwards. Must run
+    before this app created its delivery pool, e.g. from
+    `flask bench-notifications`.
+
+    Args:
+        count (int): Notifications to send
+        users (int): Distinct recipient users
+        latency (float): Seconds each fake request takes
+        error_rate (float): Share of requests the stand-ins fail
+        admin_share (float): Share of notifications sent to the admin
+        coalesce (bool): Keep the configured coalescing windows
+        rate_limits (bool): Keep the configured per-destination rate limits
+        timeout (float): Seconds to wait for the pool (and the outbox) to drain
+
+    Returns:
+        dict: Benchmark report
+    """
+    from extensions import db
+    from models import NotificationOutbox, Workspace
+    from .credentials import NotificationCredentials, get_credentials_cache
+    from .delivery import get_delivery_pool
+    from .notifications import send_admin_notification, send_user_notification
+    from .outbox import PENDING, STATUSES, dispatch_due, get_outbox_dispatcher
+
+    app = current_app
+    if 'delivery_pool' in app.extensions:
+        raise RuntimeError('The delivery pool already exists; run the benchmark in a fresh process')
+
+    telegram = FakeTelegramServer(latency=latency, error_rate=error_rate).start()
+    smtp = SMTPSink(latency=latency, error_rate=error_rate).start()
+    smtp_config = {'host': smtp.host, 'port': smtp.port, 'email': 'bench@example.com', 'password': 'bench'}
+    app.config.update(
+        TELEGRAM_API_URL=telegram.url,
+        NOTIFY_SMTP_STARTTLS=False,
+        NOTIFY_QUEUE_SIZE=max(app.config.get('NOTIFY_QUEUE_SIZE', 1000), count * 2),
+        NOTIFY_CREDENTIALS_TTL=max(app.config.get('NOTIFY_CREDENTIALS_TTL', 60), timeout * 2),
+        ADMIN_TELEGRAM_BOT_TOKEN='bench-admin-token',
+        ADMIN_TELEGRAM_CHAT_ID='1000',
+        ADMIN_SMTP_HOST=smtp.host,
+        ADMIN_SMTP_PORT=str(smtp.port),
+        ADMIN_SMTP_EMAIL='admin@example.com',
+        ADMIN_SMTP_PASSWORD='bench'
+    )
+    if not coalesce:
+        app.config['NOTIFY_COALESCE_WINDOWS'] = {'telegram': 0, 'email': 0}
+    if not rate_limits:
+        unlimited = (1000000, 1)
+        app.config['NOTIFY_RATE_LIMITS'] = {
+            'telegram_chat': unlimited, 'telegram_group': unlimited,
+            'telegram_bot': unlimited, 'smtp': unlimited
+        }
+
+    cache = get_credentials_cache()
+    usernames = [f'bench-user-{index}' for index in range(users)]
+    for index, username in enumerate(usernames):
+        cache.set(username, NotificationCredentials(
+            f'bench-token-{index % 5}', str(2000 + index), dict(smtp_config), f'{username}@example.com'
+        ))
+    pool = get_delivery_pool()
+
+    created = []
+    if coalesce:
+        existing = {slug for slug, in db.session.query(Workspace.slug).filter(Workspace.slug.in_(usernames))}
+        created = [Workspace(name=username, slug=username) for username in usernames if username not in existing]
+        db.session.add_all(created)
+        db.session.commit()
+    workspace_ids = [row.id for row in Workspace.query.filter(Workspace.slug.in_(usernames))] if coalesce else []
+    since = datetime.utcnow()
+    # This run's rows: its users' workspaces, plus admin rows stored since it started
+    bench_rows = db.or_(
+        NotificationOutbox.workspace_id.in_(workspace_ids),
+        db.and_(NotificationOutbox.workspace_id.is_(None), NotificationOutbox.created_at >= since)
+    )
+
+    def outbox_pending():
+        if not coalesce:
+            return 0
+        if get_outbox_dispatcher() is None:
+            dispatch_due()  # No dispatcher thread in this process
+        total = NotificationOutbox.query.filter(bench_rows, NotificationOutbox.status == PENDING).count()
+        db.session.commit()  # See the dispatcher's writes on the next check
+        return total
+
+    peak_threads = threading.active_count()
+    sampling = threading.Event()
+
+    def sample_threads():
+        nonlocal peak_threads
+        while not sampling.wait(0.05):
+            peak_threads = max(peak_threads, threading.active_count())
+
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+
+    latencies = []
+    started = time.perf_counter()
+    for index in range(count):
+        begin = time.perf_counter()
+        if random.random() < admin_share:
+            send_admin_notification('Benchmark', f'Admin notification {index}')
+        else:
+            send_user_notification(usernames[index % users], 'Benchmark', f'User notification {index}', category='message')
+        latencies.append(time.perf_counter() - begin)
+    enqueued = time.perf_counter() - started
+
+    # Held outbox rows go out when the coalescing windows close; the pool's
+    # pending() does not see them
+    deadline = time.monotonic() + timeout
+    while (outbox_pending() or pool.pending()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if outbox_pending():
+        # Windows longer than the timeout: send what is held now instead of leaving it
+        app.config['NOTIFY_COALESCE_WINDOWS'] = {'telegram': 0, 'email': 0}
+        NotificationOutbox.query.filter(bench_rows, NotificationOutbox.status == PENDING).update(
+            {NotificationOutbox.next_attempt_at: datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        while (outbox_pending() or pool.pending()) and time.monotonic() < deadline + timeout:
+            time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    sampling.set()
+    sampler.join()
+
+    outbox = dict.fromkeys(STATUSES, 0)
+    if coalesce:
+        for status, total in db.session.query(
+            NotificationOutbox.status, db.func.count(NotificationOutbox.id)
+        ).filter(bench_rows).group_by(NotificationOutbox.status):
+            outbox[status] = total
+        NotificationOutbox.query.filter(bench_rows).delete(synchronize_session=False)
+        for workspace in created:
+            db.session.delete(workspace)
+        db.session.commit()
+
+    stats = pool.stats()
+    delivered = telegram.stats()['messages'] + smtp.stats()['messages']  # Through the pool or the outbox
+    report = {
+        'notifications': count,
+        'messages_delivered': delivered,
+        'failed': stats['failed'],
+        'retried': stats['retried'],
+        'dropped': stats['dropped'],
+        'pending': stats['pending'],
+        'elapsed_seconds': round(elapsed, 3),
+        'sends_per_second': round(delivered / elapsed, 1) if elapsed else 0.0,
+        'enqueue_seconds': round(enqueued, 3),
+        'enqueue_p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+        'enqueue_p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'peak_threads': peak_threads,
+        'workers': stats['workers'],
+        'outbox': outbox,
+        'telegram': telegram.stats(),
+        'smtp': smtp.stats()
+    }
+    pool.shutdown(0)
+    telegram.stop()
+    smtp.stop()
+    return report
+
+
+__all__ = [
+    'FakeTelegramServer',
+    'SMTPSink',
+    'run_notification_benchmark'
+]
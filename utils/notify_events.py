@@ -0,0 +1,171 @@
+"""
+Notify Events Module - Change signals for the live notification stream
+
+The notification dropdown shows unread top-level messages. Committing a
+new top-level message, flipping its read flag or deleting it bumps a
+version for each audience that can see it ('admin', 'workspace:<id>',
+'user:<id>'), and /dashboard/notifications/stream wakes the streams of
+that audience instead of re-querying on a timer.
+
+Versions live in this worker only. A stream also rechecks the database
+every NOTIFY_STREAM_CHECK_INTERVAL seconds, which picks up changes
+committed by other workers.
+"""
+
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from extensions import db
+from models import Message
+from .worker_state import ProcessLocal, app_singleton
+
+
+def message_audiences(message):
+    """Audience keys whose notification dropdown can show a message"""
+    if message.parent_id:
+        return set()  # Replies never appear in the dropdown
+    keys = set()
+    if message.workspace_id is None or message.receiver_id == 'admin' or message.category == 'platform':
+        keys.add('admin')
+    if message.workspace_id:
+        keys.add(f'workspace:{message.workspace_id}')
+    if message.receiver_id and message.receiver_id != 'admin':
+        keys.add(f'user:{message.receiver_id}')
+    return keys
+
+
+def viewer_audiences(user=None, is_admin=False):
+    """Audience keys a dashboard viewer listens on"""
+    if is_admin:
+        return ('admin',)
+    return (f'workspace:{user.workspace_id}', f'user:{user.id}')
+
+
+class NotificationSignal(ProcessLocal):
+    """Per-worker audience versions that streams can wait on"""
+
+    def __init__(self, max_streams=8):
+        self.max_streams = max_streams
+        self.bumps = 0
+        self.refused = 0
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._versions = {}
+        self._condition = threading.Condition()
+        self._streams = 0
+
+    def bump(self, keys):
+        """Advance the version of each key and wake its streams"""
+        if not keys:
+            return
+        self._check_pid()
+        with self._condition:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self.bumps += 1
+            self._condition.notify_all()
+
+    def snapshot(self, keys):
+        self._check_pid()
+        with self._condition:
+            return tuple(self._versions.get(key, 0) for key in keys)
+
+    def wait(self, keys, snapshot, timeout):
+        """
+        Block until one of keys moves past snapshot or timeout passes
+
+        Returns:
+            bool: True when a version changed
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: tuple(self._versions.get(key, 0) for key in keys) != snapshot,
+                timeout
+            )
+
+    def open_stream(self):
+        """Reserve a stream slot; False when this worker is at max_streams"""
+        self._check_pid()
+        with self._condition:
+            if self._streams >= self.max_streams:
+                self.refused += 1
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self._streams = max(0, self._streams - 1)
+
+    def stats(self):
+        return {
+            'streams': self._streams,
+            'max_streams': self.max_streams,
+            'refused': self.refused,
+            'bumps': self.bumps,
+            'audiences': len(self._versions)
+        }
+
+
+def get_notification_signal():
+    """Get this worker's notification signal for the current app"""
+    return app_singleton(
+        'notification_signal',
+        lambda app: NotificationSignal(app.config.get('NOTIFY_STREAM_MAX_PER_WORKER', 8))
+    )
+
+
+def stream_available(environ):
+    """
+    Whether this server can hold a stream open
+
+    NOTIFY_STREAM_MODE 'auto' only streams on threaded servers; a sync
+    worker held by one stream could serve nothing else.
+    """
+    mode = current_app.config.get('NOTIFY_STREAM_MODE', 'auto')
+    if mode == 'auto':
+        return bool(environ.get('wsgi.multithread'))
+    return mode == 'on'
+
+
+def _collect_changes(session, flush_context):
+    keys = session.info.setdefault('notification_audiences', set())
+    for message in session.new:
+        if isinstance(message, Message):
+            keys |= message_audiences(message)
+    for message in session.dirty:
+        if isinstance(message, Message) and inspect(message).attrs.is_read.history.has_changes():
+            keys |= message_audiences(message)
+    for message in session.deleted:
+        if isinstance(message, Message):
+            keys |= message_audiences(message)
+
+
+def _publish_changes(session):
+    keys = session.info.pop('notification_audiences', None)
+    if keys and has_app_context():
+        get_notification_signal().bump(keys)
+
+
+def _discard_changes(session):
+    session.info.pop('notification_audiences', None)
+
+
+def register_notification_events():
+    """Hook the message change listeners into the app's session (idempotent)"""
+    if not event.contains(db.session, 'after_flush', _collect_changes):
+        event.listen(db.session, 'after_flush', _collect_changes)
+        event.listen(db.session, 'after_commit', _publish_changes)
+        event.listen(db.session, 'after_rollback', _discard_changes)
+
+
+__all__ = [
+    'message_audiences',
+    'viewer_audiences',
+    'NotificationSignal',
+    'get_notification_signal',
+    'stream_available',
+    'register_notification_events'
+]
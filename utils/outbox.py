@@ -0,0 +1,430 @@
+"""
+Outbox Module - Durable notification outbox
+
+Request handlers add a NotificationOutbox row in the same transaction as
+the Message or Client it announces, so the request only pays for one more
+INSERT, and a notification is neither lost nor sent for a rolled-back row.
+A dispatcher thread in each worker delivers due rows through the delivery
+pool's transports, retrying with exponential backoff and moving a row to
+'dead' once OUTBOX_MAX_ATTEMPTS deliveries have failed. Rows for the same
+workspace and channel are coalesced into digests (see utils/digest.py),
+which is also how the daily email digest is delivered.
+
+send_user_notification() and send_admin_notification() store their
+notifications here when a coalescing window is configured; rows without
+a workspace are addressed to the platform admin and go out with the
+admin credentials.
+
+Rows are claimed with a conditional UPDATE that pushes next_attempt_at a
+lease ahead, so every worker can run a dispatcher against the same table;
+a row whose worker died mid-delivery is picked up again once the lease
+runs out.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from models import NotificationOutbox, Workspace
+from .credentials import get_notification_credentials
+from .delivery import RetryLater, get_delivery_pool
+from .digest import coalesce_window, merge_entries
+from .notifications import (
+    admin_email_message, admin_telegram_text, build_email_message, get_admin_notifications_config,
+    get_telegram_credentials, load_smtp_config, user_telegram_text
+)
+from .worker_state import ProcessLocal, app_singleton
+
+
+PENDING = 'pending'
+SENT = 'sent'
+SKIPPED = 'skipped'  # Channel not configured for the workspace
+DEAD = 'dead'
+STATUSES = (PENDING, SENT, SKIPPED, DEAD)
+
+
+def new_outbox_entry(event, text, workspace_id=None, channel='telegram', subject=None, due=None, html=None):
+    """
+    Build an unsaved outbox row carrying a notification
+
+    Args:
+        event (str): What happened, e.g. 'portfolio_message'
+        text (str): Message text (Telegram HTML, or the email body)
+        workspace_id (str, optional): Recipient workspace (None: the platform admin)
+        channel (str): 'telegram' or 'email'
+        subject (str, optional): Notification subject
+        due (datetime, optional): Earliest delivery time (default: now)
+        html (str, optional): HTML version of an admin email
+    """
+    payload = {'text': text}
+    if subject:
+        payload['subject'] = subject
+    if html:
+        payload['html'] = html
+    return NotificationOutbox(
+        workspace_id=workspace_id,
+        channel=channel,
+        event=event,
+        payload=payload,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=due or datetime.utcnow()
+    )
+
+
+def add_outbox_entry(workspace_id, event, text, channel='telegram', subject=None, due=None, html=None):
+    """Add an outbox row to the current transaction; the caller commits"""
+    entry = new_outbox_entry(event, text, workspace_id, channel, subject, due, html)
+    db.session.add(entry)
+    return entry
+
+
+def backoff_delay(attempts):
+    """Seconds before retry number attempts + 1"""
+    config = current_app.config
+    base = config.get('OUTBOX_BACKOFF_BASE', 30)
+    return min(config.get('OUTBOX_BACKOFF_MAX', 3600), base * 2 ** max(0, attempts - 1))
+
+
+def _telegram_text(payloads):
+    items = [(payload.get('subject'), payload.get('text', '')) for payload in payloads]
+    if all(subject for subject, _ in items):
+        # Rows from send_user_notification()
+        return user_telegram_text(items)
+    texts = [f"<b>{subject}</b>\n{text}" if subject else text for subject, text in items]
+    if len(texts) == 1:
+        return texts[0]
+    return merge_entries(f"💼 <b>[Your Professional Portfolio]</b>\n🔔 <b>{len(texts)} notifications</b>\n\n", texts)
+
+
+def _email_message(payloads, smtp_config, recipient):
+    if len(payloads) == 1:
+        subject = f"💼 [Portfolio Notification] {payloads[0].get('subject') or 'Notification'}"
+        body = payloads[0].get('text', '')
+    else:
+        subject = f"💼 [Portfolio Digest] {len(payloads)} notifications"
+        body = '\n\n'.join(
+            f"{payload.get('subject') or 'Notification'}\n{payload.get('text', '')}" for payload in payloads
+        )
+    return build_email_message(smtp_config, recipient, subject, body)
+
+
+def _admin_job(channel, payloads):
+    """Delivery job for admin rows, or None when the admin has not configured the channel"""
+    config = get_admin_notifications_config()
+    items = [(payload.get('subject') or 'Notification', payload.get('text', ''), payload.get('html')) for payload in payloads]
+    if channel == 'telegram':
+        bot_token, chat_id = config['telegram']['bot_token'], config['telegram']['chat_id']
+        if not (bot_token and chat_id):
+            return None
+        text = admin_telegram_text([(subject, text) for subject, text, _ in items])
+        return {'channel': 'telegram', 'token': bot_token, 'chat_id': str(chat_id), 'text': text}
+    smtp_config = config['smtp']
+    if not (smtp_config.get('host') and smtp_config.get('email') and smtp_config.get('password')):
+        return None
+    return {'channel': 'email', 'smtp': dict(smtp_config), 'message': admin_email_message(smtp_config, items)}
+
+
+def _deliver(channel, payloads, username, pool):
+    """
+    Deliver the payloads of one recipient and channel as one message
+
+    username is the workspace slug, or None for the platform admin.
+
+    Returns:
+        tuple: (status, error, throttle) - throttle is the seconds to wait when a
+        rate limit was hit and nothing was sent
+    """
+    if channel not in ('telegram', 'email'):
+        return DEAD, f"Unsupported channel '{channel}'", 0
+    job = None
+    if username is None:
+        job = _admin_job(channel, payloads)
+    elif channel == 'telegram':
+        bot_token, chat_id = get_telegram_credentials(username=username)
+        if bot_token and chat_id:
+            job = {'channel': 'telegram', 'token': bot_token, 'chat_id': str(chat_id), 'text': _telegram_text(payloads)}
+    else:
+        smtp_config = load_smtp_config(username=username)
+        recipient = smtp_config.get('email') or get_notification_credentials(username).contact_email
+        if smtp_config.get('host') and smtp_config.get('password') and recipient:
+            job = {'channel': 'email', 'smtp': smtp_config, 'message': _email_message(payloads, smtp_config, recipient)}
+    if job is None:
+        return SKIPPED, 'Telegram not configured' if channel == 'telegram' else 'SMTP not configured', 0
+    wait = pool.limiter.reserve(pool.limits(job))
+    if wait > 0:
+        return PENDING, None, wait
+    pool.deliver(job)
+    return SENT, None, 0
+
+
+def _last_sent(keys, since):
+    """{(workspace_id, channel): newest sent_at} for the given keys, looking back to since"""
+    workspace_ids = {workspace_id for workspace_id, _ in keys}
+    recipients = NotificationOutbox.workspace_id.in_(workspace_ids - {None})
+    if None in workspace_ids:
+        recipients = db.or_(recipients, NotificationOutbox.workspace_id.is_(None))
+    rows = db.session.query(
+        NotificationOutbox.workspace_id,
+        NotificationOutbox.channel,
+        func.max(NotificationOutbox.sent_at)
+    ).filter(
+        recipients,
+        NotificationOutbox.status == SENT,
+        NotificationOutbox.sent_at >= since
+    ).group_by(NotificationOutbox.workspace_id, NotificationOutbox.channel)
+    return {(workspace_id, channel): sent_at for workspace_id, channel, sent_at in rows}
+
+
+def _move(row, values):
+    """Conditional UPDATE of a row still pending at the due time it was read with"""
+    return NotificationOutbox.query.filter(
+        NotificationOutbox.id == row.id,
+        NotificationOutbox.status == PENDING,
+        NotificationOutbox.next_attempt_at == row.next_attempt_at
+    ).update(values, synchronize_session=False)
+
+
+def dispatch_due(limit=50):
+    """
+    Claim and deliver up to limit due rows
+
+    Due rows of the same workspace (or the admin) and channel go out as one
+    digest message. If that recipient and channel were sent to less than the
+    channel's coalescing window ago, the rows are held until the window
+    closes, so a burst collapses into one leading message and one digest.
+
+    Returns:
+        int: Number of rows claimed
+    """
+    config = current_app.config
+    max_attempts = config.get('OUTBOX_MAX_ATTEMPTS', 8)
+    now = datetime.utcnow()
+    rows = db.session.query(
+        NotificationOutbox.id,
+        NotificationOutbox.workspace_id,
+        NotificationOutbox.channel,
+        NotificationOutbox.payload,
+        NotificationOutbox.attempts,
+        NotificationOutbox.next_attempt_at,
+        Workspace.slug
+    ).outerjoin(Workspace, Workspace.id == NotificationOutbox.workspace_id).filter(
+        NotificationOutbox.status == PENDING,
+        NotificationOutbox.next_attempt_at <= now,
+        # Admin rows, or rows of a workspace that still exists
+        db.or_(NotificationOutbox.workspace_id.is_(None), Workspace.id.isnot(None))
+    ).order_by(NotificationOutbox.next_attempt_at).limit(limit).all()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.workspace_id, row.channel), []).append(row)
+    windows = {channel: coalesce_window(channel) for _, channel in groups}
+    coalesced = [key for key in groups if windows[key[1]]]
+    recent = _last_sent(coalesced, now - timedelta(seconds=max(windows.values()))) if coalesced else {}
+    db.session.commit()  # End the read transaction before the network calls
+
+    pool = get_delivery_pool()
+    lease = timedelta(seconds=config.get('OUTBOX_LEASE', 120))
+    claimed = 0
+    for (workspace_id, channel), group in groups.items():
+        last_sent = recent.get((workspace_id, channel))
+        if last_sent is not None and last_sent + timedelta(seconds=windows[channel]) > now:
+            hold_until = last_sent + timedelta(seconds=windows[channel])
+            for row in group:
+                _move(row, {NotificationOutbox.next_attempt_at: hold_until})
+            db.session.commit()
+            continue
+
+        # Only one dispatcher wins a row: the UPDATE matches the due time it read
+        won = [row for row in group if _move(row, {
+            NotificationOutbox.next_attempt_at: datetime.utcnow() + lease,
+            NotificationOutbox.attempts: NotificationOutbox.attempts + 1
+        })]
+        db.session.commit()
+        if not won:
+            continue
+        claimed += len(won)
+        ids = [row.id for row in won]
+        attempts = max(row.attempts for row in won) + 1
+
+        retry_in = 0
+        try:
+            status, error, throttle = _deliver(channel, [row.payload or {} for row in won], won[0].slug, pool)
+        except RetryLater as e:
+            status, error, throttle = None, str(e), 0
+            retry_in = max(e.delay, backoff_delay(attempts))
+        except Exception as e:
+            status, error, throttle = None, str(e), 0
+            retry_in = backoff_delay(attempts)
+
+        finished = datetime.utcnow()
+        scoped = NotificationOutbox.query.filter(NotificationOutbox.id.in_(ids))
+        if status == PENDING:
+            # Rate limited before sending; this was not a delivery attempt
+            scoped.update({
+                NotificationOutbox.next_attempt_at: finished + timedelta(seconds=throttle),
+                NotificationOutbox.attempts: NotificationOutbox.attempts - 1
+            }, synchronize_session=False)
+        elif status in (SENT, SKIPPED):
+            scoped.update({
+                NotificationOutbox.status: status,
+                NotificationOutbox.sent_at: finished if status == SENT else None,
+                NotificationOutbox.last_error: error
+            }, synchronize_session=False)
+        else:
+            error = (error or '')[:500]
+            if status == DEAD:
+                dead = ids
+            else:
+                dead = [row.id for row in won if row.attempts + 1 >= max_attempts]
+            if dead:
+                NotificationOutbox.query.filter(NotificationOutbox.id.in_(dead)).update({
+                    NotificationOutbox.status: DEAD,
+                    NotificationOutbox.last_error: error
+                }, synchronize_session=False)
+                current_app.logger.error(f"Outbox entries {dead} dead-lettered after {attempts} attempts: {error}")
+            retrying = [entry_id for entry_id in ids if entry_id not in dead]
+            if retrying:
+                NotificationOutbox.query.filter(NotificationOutbox.id.in_(retrying)).update({
+                    NotificationOutbox.next_attempt_at: finished + timedelta(seconds=retry_in),
+                    NotificationOutbox.last_error: error
+                }, synchronize_session=False)
+                current_app.logger.warning(f"Outbox entries {retrying} failed (attempt {attempts}), retrying in {retry_in:.0f}s: {error}")
+        db.session.commit()
+    return claimed
+
+
+def get_outbox_counts(workspace_id=None):
+    """{status: rows} for a workspace's notifications, or the whole outbox"""
+    counts = dict.fromkeys(STATUSES, 0)
+    query = db.session.query(NotificationOutbox.status, func.count(NotificationOutbox.id))
+    if workspace_id is not None:
+        query = query.filter(NotificationOutbox.workspace_id == workspace_id)
+    for status, total in query.group_by(NotificationOutbox.status):
+        counts[status] = total
+    return counts
+
+
+def get_outbox_summary(workspace_id, recent=10):
+    """
+    Delivery status of a workspace's notifications
+
+    Returns:
+        dict: {'counts': {status: n}, 'recent': [latest rows as dicts]}
+    """
+    counts = get_outbox_counts(workspace_id)
+    rows = NotificationOutbox.query.filter_by(workspace_id=workspace_id).order_by(
+        NotificationOutbox.created_at.desc()
+    ).limit(recent).all()
+    return {
+        'counts': counts,
+        'recent': [{
+            'id': row.id,
+            'event': row.event,
+            'channel': row.channel,
+            'status': row.status,
+            'attempts': row.attempts,
+            'last_error': row.last_error,
+            'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else '',
+            'sent_at': row.sent_at.strftime('%Y-%m-%d %H:%M:%S') if row.sent_at else '',
+            'next_attempt_at': row.next_attempt_at.strftime('%Y-%m-%d %H:%M:%S') if row.status == PENDING else ''
+        } for row in rows]
+    }
+
+
+def retry_dead_entries(workspace_id):
+    """Move a workspace's dead-lettered rows back to pending; the caller commits"""
+    return NotificationOutbox.query.filter_by(workspace_id=workspace_id, status=DEAD).update({
+        NotificationOutbox.status: PENDING,
+        NotificationOutbox.attempts: 0,
+        NotificationOutbox.next_attempt_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+
+class OutboxDispatcher(ProcessLocal):
+    """Background thread delivering due outbox rows every poll_interval seconds (or when woken)"""
+
+    def __init__(self, app, poll_interval=5, batch_size=50):
+        self.app = app
+        self.poll_interval = float(poll_interval)
+        self.batch_size = max(1, int(batch_size))
+        self.dispatched = 0
+        self.errors = 0
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_running(self):
+        self._check_pid()
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+                    self._thread.start()
+
+    def wake(self):
+        """Deliver now instead of at the next poll"""
+        self.ensure_running()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    while True:
+                        claimed = dispatch_due(self.batch_size)
+                        self.dispatched += claimed
+                        if claimed < self.batch_size:
+                            break
+                except Exception as e:
+                    self.errors += 1
+                    db.session.rollback()
+                    self.app.logger.error(f"Outbox dispatch error: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+def _create_outbox_dispatcher(app):
+    config = app.config
+    if not config.get('OUTBOX_DISPATCHER_ENABLED', True):
+        return None
+    return OutboxDispatcher(app, config.get('OUTBOX_POLL_INTERVAL', 5), config.get('OUTBOX_BATCH_SIZE', 50))
+
+
+def get_outbox_dispatcher():
+    """
+    Get this worker's outbox dispatcher for the current app
+
+    Returns:
+        OutboxDispatcher | None: None when OUTBOX_DISPATCHER_ENABLED is off
+        (e.g. when `flask dispatch-outbox --loop` runs as its own process)
+    """
+    return app_singleton('outbox_dispatcher', _create_outbox_dispatcher)
+
+
+def wake_outbox():
+    """Ask the dispatcher to deliver right away; call after committing outbox rows"""
+    dispatcher = get_outbox_dispatcher()
+    if dispatcher is not None:
+        dispatcher.wake()
+
+
+__all__ = [
+    'STATUSES',
+    'new_outbox_entry',
+    'add_outbox_entry',
+    'dispatch_due',
+    'get_outbox_counts',
+    'get_outbox_summary',
+    'retry_dead_entries',
+    'OutboxDispatcher',
+    'get_outbox_dispatcher',
+    'wake_outbox'
+]
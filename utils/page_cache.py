@@ -0,0 +1,134 @@
+"""
+Page Cache Module - Full-page cache for anonymous views of public pages
+
+Public portfolio, project and service pages render the same HTML for every
+anonymous visitor until the owner saves something. cached_page stores the
+gzip-compressed page under its path, tagged with the workspace version and
+the owner's verification flag (one indexed read per request). Any save
+bumps Workspace.version, so the entry is invalidated in every worker
+without messaging, like the portfolio cache (utils/cache.py).
+
+Entries live in a per-worker LRU and, with PAGE_CACHE_BACKEND=sqlite, in
+a file shared by the workers on the host. Hits are served as stored
+(Content-Encoding: gzip) and still run the view's side effects that must
+happen per visit, such as visitor tracking.
+"""
+
+import base64
+import gzip
+from functools import wraps
+from flask import current_app, make_response, request, session
+from extensions import db
+from models import Workspace, User
+from .cache import VersionedCache, create_backend
+from .worker_state import app_singleton
+
+
+def _create_page_cache(app):
+    config = app.config
+    if not config.get('PAGE_CACHE_ENABLED', True):
+        return None
+    backend = None
+    try:
+        backend = create_backend(
+            config.get('PAGE_CACHE_BACKEND'),
+            config.get('PAGE_CACHE_PATH', 'cache/pages.sqlite3'),
+            config.get('PAGE_CACHE_SHARED_MAX_ENTRIES', 2048)
+        )
+    except Exception as e:
+        app.logger.error(f"Could not open shared page cache: {str(e)}")
+    return VersionedCache(config.get('PAGE_CACHE_MAX_ENTRIES', 512), backend)
+
+
+def get_page_cache():
+    """
+    Get the page cache for the current app
+
+    Returns:
+        VersionedCache | None: None when PAGE_CACHE_ENABLED is off
+    """
+    return app_singleton('page_cache', _create_page_cache)
+
+
+def page_version(username):
+    """
+    Version a workspace's public pages were rendered from
+
+    Returns:
+        str | None: None when there is no such workspace
+    """
+    row = db.session.query(Workspace.version, User.is_verified).select_from(Workspace).outerjoin(
+        User, User.username == Workspace.slug
+    ).filter(Workspace.slug == username).first()
+    if row is None:
+        return None
+    version, is_verified = row
+    return f"{version}:{int(bool(is_verified))}"
+
+
+def _cacheable_request():
+    """Anonymous GETs with nothing session-specific to show"""
+    return (
+        request.method == 'GET'
+        and not session.get('username')
+        and not session.get('_flashes')
+    )
+
+
+def _page_response(entry, state):
+    body = base64.b64decode(entry['body'])
+    if 'gzip' in request.accept_encodings:
+        response = current_app.response_class(body, status=entry['status'], mimetype=entry['mimetype'])
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(gzip.decompress(body), status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Page-Cache'] = state
+    return response
+
+
+def cached_page(on_hit=None):
+    """
+    Cache a public view's page per workspace (the view's username argument)
+
+    Args:
+        on_hit (callable, optional): Called with the view's arguments when
+            the page is served from the cache (per-visit side effects)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(username, *args, **kwargs):
+            cache = get_page_cache()
+            if cache is None or not _cacheable_request():
+                return f(username, *args, **kwargs)
+            version = page_version(username)
+            if version is None:
+                return f(username, *args, **kwargs)
+
+            key = f"page:{request.full_path}"
+            entry = cache.get(key, version)
+            if entry is not None:
+                if on_hit is not None:
+                    on_hit(username, *args, **kwargs)
+                return _page_response(entry, 'HIT')
+
+            response = make_response(f(username, *args, **kwargs))
+            if (response.status_code != 200 or response.direct_passthrough
+                    or response.mimetype != 'text/html' or session.modified):
+                return response
+            entry = {
+                'status': response.status_code,
+                'mimetype': response.mimetype,
+                'body': base64.b64encode(gzip.compress(response.get_data(), 6)).decode('ascii')
+            }
+            cache.set(key, version, entry)
+            return _page_response(entry, 'MISS')
+        return decorated_function
+    return decorator
+
+
+__all__ = [
+    'get_page_cache',
+    'page_version',
+    'cached_page'
+]
@@ -0,0 +1,205 @@
+"""
+Query Plans Module - EXPLAIN regression harness for Message access patterns
+
+Seeds a synthetic messages dataset inside a transaction that is always
+rolled back, EXPLAINs every builder in utils.message_queries and reports
+the ones whose plan reads the messages table in any way other than a
+range on one of the indexes the case expects: a full scan (even one that
+walks a whole index), or a search on some other index, such as
+idx_messages_parent_created with parent_id IS NULL, which holds almost
+every row. Runs on SQLite (an in-memory database by default) and on
+Postgres when given a postgresql:// URL, where sequential scans are
+disabled for the session so a Seq Scan in the plan means no index can
+serve the query.
+
+Usage:
+    flask check-query-plans [--database-url URL] [--rows N]
+"""
+
+import random
+import re
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from extensions import db
+from models import Message, Workspace
+from .message_queries import (
+    inbox_query, internal_threads_query, replies_query,
+    unread_count_query, unread_notifications_query, notifications_version_query
+)
+
+
+class _SampleUser:
+    """Stand-in for a User row; the builders only read these attributes"""
+
+    def __init__(self, user_id, username, workspace_id):
+        self.id = user_id
+        self.username = username
+        self.workspace_id = workspace_id
+
+
+WORKSPACE_INBOX = 'idx_messages_workspace_parent_created'
+CATEGORY_INBOX = 'idx_messages_category_parent_created'
+THREAD_REPLIES = 'idx_messages_parent_created'
+RECEIVER = 'idx_messages_receiver_read'
+UNREAD_WORKSPACE = 'idx_messages_unread_workspace'
+UNREAD_RECEIVER = 'idx_messages_unread_receiver'
+UNREAD_CATEGORY = 'idx_messages_unread_category'
+
+
+def message_query_cases(user, thread_id):
+    """(name, query, expected indexes) triples covering every Message access pattern"""
+    admin_unread = {UNREAD_RECEIVER, UNREAD_WORKSPACE, UNREAD_CATEGORY}
+    return [
+        ('inbox_admin', inbox_query(is_admin=True), {WORKSPACE_INBOX, CATEGORY_INBOX}),
+        ('inbox_admin_platform', inbox_query(is_admin=True, category='platform'), {WORKSPACE_INBOX, CATEGORY_INBOX}),
+        ('inbox_user', inbox_query(workspace_id=user.workspace_id), {WORKSPACE_INBOX}),
+        ('inbox_user_portfolio', inbox_query(workspace_id=user.workspace_id, category='portfolio'), {WORKSPACE_INBOX}),
+        ('internal_threads_admin', internal_threads_query(is_admin=True), {CATEGORY_INBOX}),
+        ('internal_threads_user', internal_threads_query(user), {CATEGORY_INBOX}),
+        ('replies', replies_query(thread_id), {THREAD_REPLIES}),
+        ('unread_count_admin', unread_count_query(is_admin=True), admin_unread | {RECEIVER}),
+        ('unread_count_user', unread_count_query(workspace_id=user.workspace_id), {UNREAD_WORKSPACE}),
+        ('notifications_admin', unread_notifications_query(is_admin=True).limit(10), admin_unread),
+        ('notifications_user', unread_notifications_query(user).limit(10), {UNREAD_WORKSPACE, UNREAD_RECEIVER}),
+        ('notifications_version_admin', notifications_version_query(is_admin=True), admin_unread),
+        ('notifications_version_user', notifications_version_query(user), {UNREAD_WORKSPACE, UNREAD_RECEIVER}),
+    ]
+
+
+def seed_messages(session, rows, workspaces=50):
+    """Insert a skewed mix of portfolio, platform and internal messages; returns (user, thread_id)"""
+    rng = random.Random(1337)
+    workspace_ids = [str(uuid.uuid4()) for _ in range(workspaces)]
+    user_ids = [str(uuid.uuid4()) for _ in range(workspaces)]
+    now = datetime.utcnow()
+    session.execute(Workspace.__table__.insert(), [
+        {'id': workspace_id, 'name': 'Query plan seed', 'slug': f'qp-{workspace_id}', 'version': 1}
+        for workspace_id in workspace_ids
+    ])
+    parents = []
+    batch = []
+    for index in range(rows):
+        owner = rng.randrange(workspaces)
+        kind = rng.random()
+        values = {
+            'id': str(uuid.uuid4()),
+            'name': f'user{owner}',
+            'email': f'user{owner}@example.com',
+            'message': 'seed',
+            'is_read': rng.random() < 0.8,
+            'created_at': now - timedelta(minutes=index),
+            'sender_role': 'visitor',
+            'category': 'portfolio',
+            'workspace_id': workspace_ids[owner]
+        }
+        if kind < 0.1:
+            values.update(category='platform', workspace_id=None, receiver_id='admin')
+        elif kind < 0.3:
+            admin_sent = rng.random() < 0.5
+            values.update(
+                category='internal',
+                sender_id='admin' if admin_sent else user_ids[owner],
+                receiver_id=user_ids[owner] if admin_sent else 'admin',
+                sender_role='admin' if admin_sent else 'user'
+            )
+        if parents and rng.random() < 0.3:
+            values['parent_id'] = rng.choice(parents)
+        else:
+            parents.append(values['id'])
+        batch.append(values)
+    session.execute(Message.__table__.insert(), batch)
+    user = _SampleUser(user_ids[0], 'user0', workspace_ids[0])
+    return user, parents[0]
+
+
+def explain(session, query):
+    """Return the plan of a query as a list of text lines"""
+    statement = query.statement.compile(
+        dialect=session.bind.dialect, compile_kwargs={'literal_binds': True}
+    )
+    if session.bind.dialect.name == 'postgresql':
+        rows = session.execute(text(f'EXPLAIN {statement}')).all()
+        return [row[0] for row in rows]
+    rows = session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+    return [row[-1] for row in rows]
+
+
+SQLITE_ACCESS = re.compile(r'^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?')
+POSTGRES_INDEX = re.compile(r'(?:Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on) (\w+)')
+
+
+def plan_regressions(plan, dialect_name, expected, table=Message.__table__):
+    """
+    Plan lines that read the table other than through a range on an expected index
+
+    Any scan of the table fails, including one that walks a whole index,
+    as does a search on an index the case does not expect.
+    """
+    regressions = []
+    for line in plan:
+        if dialect_name == 'postgresql':
+            if f'Seq Scan on {table.name}' in line:
+                regressions.append(line)
+                continue
+            match = POSTGRES_INDEX.search(line)
+            if match and match.group(1) in {index.name for index in table.indexes} and match.group(1) not in expected:
+                regressions.append(line)
+            continue
+        match = SQLITE_ACCESS.match(line.strip())
+        if not match or match.group(2) != table.name:
+            continue
+        access, _, index = match.groups()
+        if access == 'SCAN' or index not in expected:
+            regressions.append(line)
+    return regressions
+
+
+def check_message_query_plans(database_url=None, rows=5000):
+    """
+    EXPLAIN every Message access pattern against a seeded dataset
+
+    Args:
+        database_url (str, optional): Database to check; an in-memory
+            SQLite database when omitted. Seeded rows are rolled back.
+        rows (int): Number of messages to seed
+
+    Returns:
+        dict: {'dialect': name, 'plans': {case: lines}, 'expected': {case: index names},
+        'regressions': {case: lines}}
+    """
+    engine = create_engine(database_url or 'sqlite://')
+    report = {'dialect': engine.dialect.name, 'plans': {}, 'expected': {}, 'regressions': {}}
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            db.metadata.create_all(connection)
+            session = Session(bind=connection)
+            user, thread_id = seed_messages(session, rows)
+            if engine.dialect.name == 'postgresql':
+                session.execute(text('ANALYZE messages'))
+                session.execute(text('SET LOCAL enable_seqscan = off'))
+            else:
+                session.execute(text('ANALYZE'))
+            for name, query, expected in message_query_cases(user, thread_id):
+                query = query.with_session(session)
+                plan = explain(session, query)
+                report['plans'][name] = plan
+                report['expected'][name] = sorted(expected)
+                regressions = plan_regressions(plan, engine.dialect.name, expected)
+                if regressions:
+                    report['regressions'][name] = regressions
+        finally:
+            transaction.rollback()
+    engine.dispose()
+    return report
+
+
+__all__ = [
+    'message_query_cases',
+    'seed_messages',
+    'explain',
+    'plan_regressions',
+    'check_message_query_plans'
+]
@@ -0,0 +1,389 @@
+"""
+Rate Limit Module - Sliding-window rate limiter with pluggable backends
+
+Each (endpoint, client) key keeps a sliding-window counter: the hit count
+of the current fixed window plus the count of the previous one, weighted
+by how much of it still overlaps the sliding window. A check is O(1) and
+a key costs three numbers regardless of its request rate.
+
+Backends:
+    memory  - per-worker OrderedDict, bounded by max_keys with LRU eviction
+    sqlite  - a file shared by every worker on one host
+    redis   - any Redis-protocol store, shared across hosts (needs `redis`)
+
+Policies are (requests, seconds) pairs from RATE_LIMIT_POLICIES, keyed on
+the endpoint name passed to check_rate_limit(). peek() checks a key
+without counting, for endpoints that only charge some outcomes (e.g.
+failed logins).
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app
+from .worker_state import app_singleton
+
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'retry_after'])
+
+DEFAULT_POLICY = (10, 60)
+
+
+def sliding_window(state, now, limit, window):
+    """
+    Apply one hit to a sliding-window counter
+
+    Args:
+        state (tuple | None): (window_start, current, previous) or None for a new key
+        now (float): Current time in seconds
+        limit (int): Requests allowed per window
+        window (int): Window length in seconds
+
+    Returns:
+        tuple: (allowed, new_state, estimate) - a denied hit leaves the counter unchanged
+    """
+    window_start = math.floor(now / window) * window
+    if state is None:
+        current = previous = 0
+    else:
+        start, current, previous = state
+        if start != window_start:
+            # One window later the current count becomes the previous one;
+            # after a longer gap both are empty
+            previous = current if window_start - start == window else 0
+            current = 0
+    overlap = 1 - (now - window_start) / window
+    estimate = previous * overlap + current
+    if estimate + 1 > limit:
+        return False, (window_start, current, previous), estimate
+    return True, (window_start, current + 1, previous), estimate + 1
+
+
+def retry_after(now, window):
+    """Seconds until the current fixed window rolls over"""
+    return max(1, int(math.ceil(window - (now % window))))
+
+
+class MemoryRateLimitBackend:
+    """
+    Process-local counters bounded by key count
+
+    Keys are kept in recency order; once max_keys is exceeded the least
+    recently seen keys are evicted. An evicted key starts from zero, which
+    only ever errs on the side of letting an idle client through.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max(1, int(max_keys))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key, limit, window, now):
+        with self._lock:
+            allowed, state, estimate = sliding_window(self._data.get(key), now, limit, window)
+            self._data[key] = state
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return allowed, estimate
+
+    def peek(self, key, limit, window, now):
+        with self._lock:
+            allowed, _, estimate = sliding_window(self._data.get(key), now, limit, window)
+        return allowed, estimate
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteRateLimitBackend:
+    """
+    Counters in a local SQLite file shared by every worker on the host
+
+    Each hit runs in a BEGIN IMMEDIATE transaction, so concurrent workers
+    serialize on the row instead of each enforcing its own limit. Idle
+    and least recently used keys are pruned every prune_every writes.
+    """
+
+    def __init__(self, path, max_keys=10000, prune_every=500):
+        self.path = path
+        self.max_keys = max(1, int(max_keys))
+        self.prune_every = max(1, int(prune_every))
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'key TEXT PRIMARY KEY, window_start REAL NOT NULL, '
+            'current INTEGER NOT NULL, previous INTEGER NOT NULL, '
+            'window INTEGER NOT NULL, touched REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_touched ON rate_limits (touched)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit, window, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_start, current, previous FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            allowed, state, estimate = sliding_window(row, now, limit, window)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits '
+                '(key, window_start, current, previous, window, touched) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, state[0], state[1], state[2], window, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune(now)
+        return allowed, estimate
+
+    def peek(self, key, limit, window, now):
+        row = self._connection().execute(
+            'SELECT window_start, current, previous FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        allowed, _, estimate = sliding_window(row, now, limit, window)
+        return allowed, estimate
+
+    def prune(self, now=None):
+        """Drop keys idle for two windows, then the least recently used beyond max_keys"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        expired = conn.execute('DELETE FROM rate_limits WHERE touched < ? - 2 * window', (now,)).rowcount
+        trimmed = conn.execute(
+            'DELETE FROM rate_limits WHERE key IN ('
+            'SELECT key FROM rate_limits ORDER BY touched DESC LIMIT -1 OFFSET ?)',
+            (self.max_keys,)
+        ).rowcount
+        self.evictions += max(0, expired) + max(0, trimmed)
+
+    def reset(self, key=None):
+        if key is None:
+            self._connection().execute('DELETE FROM rate_limits')
+        else:
+            self._connection().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+
+class RedisRateLimitBackend:
+    """
+    Counters in a Redis-protocol store (Redis, Valkey, KeyDB, ...)
+
+    Each fixed window is its own key expiring after two windows, so the
+    store bounds memory by itself. The check-and-increment runs as one Lua
+    script, atomic across every worker and host.
+    """
+
+    SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimate = previous * tonumber(ARGV[1]) + current
+if estimate + 1 > tonumber(ARGV[2]) then
+    return {0, tostring(estimate)}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, tostring(estimate + 1)}
+"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis  # Optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+        self.evictions = 0
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        overlap = 1 - (now - index * window) / window
+        allowed, estimate = self._script(
+            keys=[f'{self.prefix}{key}:{index}', f'{self.prefix}{key}:{index - 1}'],
+            args=[overlap, limit, window * 2]
+        )
+        return bool(int(allowed)), float(estimate)
+
+    def peek(self, key, limit, window, now):
+        index = int(now // window)
+        overlap = 1 - (now - index * window) / window
+        current, previous = self.client.mget(f'{self.prefix}{key}:{index}', f'{self.prefix}{key}:{index - 1}')
+        estimate = int(previous or 0) * overlap + int(current or 0)
+        if estimate + 1 > limit:
+            return False, estimate
+        return True, estimate + 1
+
+    def reset(self, key=None):
+        pattern = f'{self.prefix}{key}:*' if key is not None else f'{self.prefix}*'
+        for name in self.client.scan_iter(match=pattern):
+            self.client.delete(name)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=f'{self.prefix}*'))
+
+
+class RateLimiter:
+    """
+    Per-endpoint rate limiter
+
+    Checks go to the configured backend; if a shared backend fails the
+    check falls back to process-local counters so limits keep applying
+    (per worker) while the store is unavailable.
+    """
+
+    def __init__(self, policies=None, default_policy=DEFAULT_POLICY, backend=None, max_keys=10000):
+        self.policies = dict(policies or {})
+        self.default_policy = tuple(default_policy)
+        self.local = MemoryRateLimitBackend(max_keys)
+        self.backend = backend if backend is not None else self.local  # An empty store is falsy (__len__)
+        self.allowed = 0
+        self.denied = 0
+        self.backend_errors = 0
+
+    def policy(self, endpoint):
+        """(requests, seconds) for an endpoint"""
+        limit, window = self.policies.get(endpoint, self.default_policy)
+        return int(limit), int(window)
+
+    def hit(self, endpoint, identity, now=None):
+        """
+        Count one request from identity against the endpoint's policy
+
+        Returns:
+            RateLimitResult: allowed flag, limit, remaining requests and
+            retry_after seconds (0 when allowed)
+        """
+        result = self._apply('hit', endpoint, identity, now)
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.denied += 1
+        return result
+
+    def peek(self, endpoint, identity, now=None):
+        """Like hit(), but only checks whether a request would be allowed"""
+        result = self._apply('peek', endpoint, identity, now)
+        if not result.allowed:
+            self.denied += 1
+        return result
+
+    def _apply(self, operation, endpoint, identity, now):
+        limit, window = self.policy(endpoint)
+        now = time.time() if now is None else now
+        key = f'{endpoint}:{identity}'
+        try:
+            allowed, estimate = getattr(self.backend, operation)(key, limit, window, now)
+        except Exception as e:
+            self.backend_errors += 1
+            current_app.logger.warning(f"Rate limit backend failed, using local counters: {str(e)}")
+            allowed, estimate = getattr(self.local, operation)(key, limit, window, now)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, int(limit - estimate)),
+            retry_after=0 if allowed else retry_after(now, window)
+        )
+
+    def reset(self, endpoint=None, identity=None):
+        key = f'{endpoint}:{identity}' if endpoint and identity else None
+        self.local.reset(key)
+        if self.backend is not self.local:
+            self.backend.reset(key)
+
+    def stats(self):
+        backend = self.backend
+        return {
+            'allowed': self.allowed,
+            'denied': self.denied,
+            'backend_errors': self.backend_errors,
+            'evictions': backend.evictions,
+            'local_keys': len(self.local),
+            'max_keys': self.local.max_keys,
+            'backend': type(backend).__name__,
+            'policies': {name: list(self.policy(name)) for name in self.policies}
+        }
+
+
+def create_rate_limit_backend(kind, path=None, redis_url=None, max_keys=10000):
+    """Build a backend from config ('memory', 'sqlite' or 'redis')"""
+    if kind == 'sqlite':
+        return SQLiteRateLimitBackend(path or 'cache/ratelimit.sqlite3', max_keys=max_keys)
+    if kind == 'redis':
+        if not redis_url:
+            raise ValueError('RATE_LIMIT_REDIS_URL is not set')
+        return RedisRateLimitBackend(redis_url)
+    return MemoryRateLimitBackend(max_keys)
+
+
+def _create_rate_limiter(app):
+    config = app.config
+    if not config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    max_keys = config.get('RATE_LIMIT_MAX_KEYS', 10000)
+    backend = None
+    try:
+        backend = create_rate_limit_backend(
+            config.get('RATE_LIMIT_BACKEND', 'memory'),
+            config.get('RATE_LIMIT_PATH'),
+            config.get('RATE_LIMIT_REDIS_URL'),
+            max_keys
+        )
+    except Exception as e:
+        app.logger.error(f"Could not open rate limit backend, using local counters: {str(e)}")
+    return RateLimiter(
+        config.get('RATE_LIMIT_POLICIES'),
+        config.get('RATE_LIMIT_DEFAULT', DEFAULT_POLICY),
+        backend if not isinstance(backend, MemoryRateLimitBackend) else None,
+        max_keys
+    )
+
+
+def get_rate_limiter():
+    """
+    Get the rate limiter for the current app
+
+    Returns:
+        RateLimiter | None: None when RATE_LIMIT_ENABLED is off
+    """
+    return app_singleton('rate_limiter', _create_rate_limiter)
+
+
+__all__ = [
+    'RateLimitResult',
+    'sliding_window',
+    'MemoryRateLimitBackend',
+    'SQLiteRateLimitBackend',
+    'RedisRateLimitBackend',
+    'RateLimiter',
+    'create_rate_limit_backend',
+    'get_rate_limiter'
+]
@@ -0,0 +1,209 @@
+"""
+Repositories Module - Single-row writes for portfolio entities
+
+save_data() reconciles whole sections and is meant for bulk edits. The
+dashboard's add/edit/delete actions touch one project, service or client,
+so these repositories read and write that row by primary key (scoped to
+the owner's workspace), bump Workspace.version with one UPDATE and commit.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from flask import current_app
+from extensions import db
+from models import Workspace, Project, Service, Client
+from .stats import adjust_workspace_stats
+from .data import (
+    project_values, service_values, client_values,
+    project_to_dict, service_to_dict, client_to_dict,
+    apply_values, parse_amount, parse_currency, invalidate_request_cache,
+    DEFAULT_CURRENCY
+)
+
+
+class EntityRepository(ABC):
+    """
+    Base repository bound to one workspace slug
+
+    Subclasses set model, counter (the WorkspaceStats field tracking the
+    row count) and must provide values (dict -> column values, as used by
+    save_data) and serialize (row -> dict, as returned by load_data).
+    """
+
+    model = None
+    counter = None
+
+    def __init__(self, username):
+        self.username = username
+        self._workspace_id = None
+
+    @staticmethod
+    @abstractmethod
+    def values(data):
+        """Portfolio-style dict -> column values"""
+
+    @staticmethod
+    @abstractmethod
+    def serialize(row):
+        """Row -> portfolio-style dict"""
+
+    @property
+    def workspace_id(self):
+        if self._workspace_id is None:
+            self._workspace_id = db.session.query(Workspace.id).filter_by(slug=self.username).scalar()
+        return self._workspace_id
+
+    def _scoped(self, entity_id):
+        return self.model.query.filter(
+            self.model.id == str(entity_id),
+            self.model.workspace_id == self.workspace_id
+        )
+
+    def _commit(self, before=None):
+        """
+        Bump the workspace version and commit, rolling back on failure
+
+        Args:
+            before (callable, optional): Runs first inside the same guard,
+                e.g. the flush and counter update of an insert
+        """
+        try:
+            if before is not None:
+                before()
+            db.session.query(Workspace).filter_by(id=self.workspace_id).update(
+                {Workspace.version: Workspace.version + 1}, synchronize_session=False
+            )
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error saving {self.model.__tablename__} for {self.username}: {str(e)}")
+            return False
+        finally:
+            invalidate_request_cache(self.username)
+
+    def get(self, entity_id):
+        """Get one row as a dict, or None when it does not belong to this workspace"""
+        if self.workspace_id is None:
+            return None
+        row = self._scoped(entity_id).first()
+        return self.serialize(row) if row is not None else None
+
+    def _add_extra_rows(self, extra_rows):
+        """Add rows that belong to the same transaction (e.g. outbox entries) to the session"""
+        for extra in extra_rows:
+            if extra.workspace_id is None:
+                extra.workspace_id = self.workspace_id
+            db.session.add(extra)
+
+    def add(self, data, extra_rows=()):
+        """
+        Insert a row from a portfolio-style dict
+
+        Args:
+            data (dict): Portfolio-style fields
+            extra_rows (iterable): Rows committed in the same transaction, e.g.
+                outbox entries; their workspace_id defaults to this workspace
+
+        Returns:
+            dict | None: The stored row, None when the workspace is missing or the insert failed
+        """
+        if self.workspace_id is None:
+            return None
+        values = self.values(data)
+        self.prepare_values(values)
+        row = self.model(workspace_id=self.workspace_id, **values)
+        if data.get('id'):
+            row.id = str(data['id'])
+        db.session.add(row)
+        self._add_extra_rows(extra_rows)
+
+        def count_row():
+            # Flushes first, so a failed insert (e.g. a duplicate id) is rolled back
+            db.session.flush()
+            adjust_workspace_stats(self.workspace_id, **{self.counter: 1})
+
+        if not self._commit(count_row):
+            return None
+        return self.serialize(row)
+
+    def update(self, entity_id, changes, replace=False, extra_rows=()):
+        """
+        Update one row
+
+        Args:
+            entity_id: Primary key of the row
+            changes (dict): Portfolio-style fields to change; only keys present
+                are written unless replace is set
+            replace (bool): Treat changes as the complete entity, resetting
+                missing fields to their defaults like save_data() does
+            extra_rows (iterable): Rows committed in the same transaction
+
+        Returns:
+            dict | None: The stored row, None when not found or the update failed
+        """
+        if self.workspace_id is None:
+            return None
+        row = self._scoped(entity_id).first()
+        if row is None:
+            return None
+        values = self.values(changes)
+        if not replace:
+            values = {column: value for column, value in values.items() if column in changes}
+        self.prepare_values(values, row)
+        changed = apply_values(row, values)
+        self._add_extra_rows(extra_rows)
+        if (changed or extra_rows) and not self._commit():
+            return None
+        return self.serialize(row)
+
+    def prepare_values(self, values, row=None):
+        """Hook to derive extra column values before an insert (row is None) or update"""
+
+    def delete(self, entity_id):
+        """Delete one row; returns True when a row was removed"""
+        if self.workspace_id is None:
+            return False
+        if not self._scoped(entity_id).delete(synchronize_session=False):
+            db.session.rollback()
+            return False
+        return self._commit(lambda: adjust_workspace_stats(self.workspace_id, **{self.counter: -1}))
+
+
+class ProjectRepository(EntityRepository):
+    model = Project
+    counter = 'projects'
+    values = staticmethod(project_values)
+    serialize = staticmethod(project_to_dict)
+
+
+class ServiceRepository(EntityRepository):
+    model = Service
+    counter = 'services'
+    values = staticmethod(service_values)
+    serialize = staticmethod(service_to_dict)
+
+
+class ClientRepository(EntityRepository):
+    model = Client
+    counter = 'clients'
+    values = staticmethod(client_values)
+    serialize = staticmethod(client_to_dict)
+
+    def prepare_values(self, values, row=None):
+        # amount and currency are derived from the free-form price; a given
+        # (or the stored) currency only applies when the price names none
+        if 'price' in values:
+            fallback = values.get('currency') or (row.currency if row is not None else None)
+            values['amount'] = parse_amount(values['price'])
+            values['currency'] = parse_currency(values['price'], fallback or DEFAULT_CURRENCY)
+        if 'status' in values and (row is None or values['status'] != row.status):
+            values['status_updated_at'] = datetime.utcnow()
+
+
+__all__ = [
+    'EntityRepository',
+    'ProjectRepository',
+    'ServiceRepository',
+    'ClientRepository'
+]
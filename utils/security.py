@@ -3,43 +3,30 @@ Security Module - Security utilities including IP tracking, rate limiting, and c
 """
 
 import os
-import json
-import time
+from collections.abc import Mapping
 from datetime import datetime
-from flask import request, current_app
+from functools import lru_cache
+from flask import request, current_app, has_app_context
 from werkzeug.security import generate_password_hash, check_password_hash
+from .ratelimit import get_rate_limiter
+from .logstore import get_log_writer, read_log_page, TIMESTAMP_FORMAT
 
 
-# Rate Limiting
-RATE_LIMIT_REQUESTS = {}  # {ip: [(timestamp, endpoint), ...]}
-RATE_LIMIT_MAX_REQUESTS = 10  # Max 10 requests
-RATE_LIMIT_WINDOW = 60  # Per 60 seconds
-IP_LOG_FILE = 'security/ip_log.json'
-AUDIT_LOG_FILE = 'security/audit_log.json'
+# Append-only JSONL logs; the .json files hold entries written before the switch
+IP_LOG_FILE = 'security/ip_log.jsonl'
+AUDIT_LOG_FILE = 'security/audit_log.jsonl'
+SECURITY_LOGS = {'ip': IP_LOG_FILE, 'audit': AUDIT_LOG_FILE}
 
 
 def log_audit_event(event_type, username=None, details=''):
     """Log high-level audit events for administrative review"""
     try:
-        log_data = {
+        get_log_writer(AUDIT_LOG_FILE).append({
             'event': event_type,
             'username': username,
             'details': details,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-
-        try:
-            with open(AUDIT_LOG_FILE, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            logs = []
-
-        logs.append(log_data)
-        logs = logs[-1000:]
-
-        os.makedirs(os.path.dirname(AUDIT_LOG_FILE), exist_ok=True)
-        with open(AUDIT_LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
+            'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT)
+        })
     except Exception as e:
         current_app.logger.error(f"Error logging audit event: {str(e)}")
 
@@ -50,61 +37,118 @@ def get_client_ip():
                               request.environ.get('REMOTE_ADDR', 'unknown'))
 
 
-def check_rate_limit(endpoint='contact'):
-    """Check if IP is within rate limit"""
-    client_ip = get_client_ip()
-    current_time = time.time()
-
-    if client_ip not in RATE_LIMIT_REQUESTS:
-        RATE_LIMIT_REQUESTS[client_ip] = []
-
-    # Clean old requests outside the window
-    RATE_LIMIT_REQUESTS[client_ip] = [
-        (ts, ep) for ts, ep in RATE_LIMIT_REQUESTS[client_ip]
-        if current_time - ts < RATE_LIMIT_WINDOW
-    ]
+def check_rate_limit(endpoint='contact', count=True):
+    """
+    Check if IP is within the endpoint's rate limit (RATE_LIMIT_POLICIES in config.py)
 
-    # Check if limit exceeded
-    endpoint_requests = [
-        ep for ts, ep in RATE_LIMIT_REQUESTS[client_ip] if ep == endpoint
-    ]
-    if len(endpoint_requests) >= RATE_LIMIT_MAX_REQUESTS:
-        return False
-
-    # Add current request
-    RATE_LIMIT_REQUESTS[client_ip].append((current_time, endpoint))
-    return True
+    With count=False the check does not use up a request; pair it with a
+    counted call for the outcomes that should be charged.
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return True
+    ip = get_client_ip()
+    result = limiter.hit(endpoint, ip) if count else limiter.peek(endpoint, ip)
+    if not result.allowed:
+        current_app.logger.info(f"Rate limit hit on {endpoint} for {ip}")
+    return result.allowed
 
 
 def log_ip_activity(activity_type, details=''):
     """Log IP activity for security tracking"""
     try:
-        client_ip = get_client_ip()
-        log_data = {
-            'ip': client_ip,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        get_log_writer(IP_LOG_FILE).append({
+            'ip': get_client_ip(),
+            'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT),
             'activity': activity_type,
             'details': details,
             'user_agent': request.headers.get('User-Agent', 'Unknown')[:100]
-        }
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error logging IP activity: {str(e)}")
 
-        # Load existing logs
-        try:
-            with open(IP_LOG_FILE, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            logs = []
 
-        logs.append(log_data)
+def get_security_log_page(log='audit', limit=50, cursor=None):
+    """
+    Page through a security log, newest first, for the admin UI
 
-        # Keep only last 1000 logs
-        logs = logs[-1000:]
+    Args:
+        log (str): 'audit' or 'ip'
+        limit (int): Entries per page
+        cursor (str, optional): next_cursor of the previous page
 
-        os.makedirs(os.path.dirname(IP_LOG_FILE), exist_ok=True)
-        with open(IP_LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        current_app.logger.error(f"Error logging IP activity: {str(e)}")
+    Returns:
+        tuple: (entries, next_cursor)
+    """
+    path = SECURITY_LOGS[log]
+    writer = get_log_writer(path)
+    # Include this worker's queued entries
+    writer.flush()
+    return read_log_page(path, limit, cursor, backups=writer.backups)
+
+
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt'
+
+
+def get_password_hash_method():
+    """
+    Werkzeug hash method from PASSWORD_HASH_METHOD / PASSWORD_HASH_COST
+
+    The cost is scrypt's N or the pbkdf2 iteration count; without one,
+    werkzeug's default parameters for the method apply.
+    """
+    config = current_app.config if has_app_context() else {}
+    method = config.get('PASSWORD_HASH_METHOD') or DEFAULT_PASSWORD_HASH_METHOD
+    cost = str(config.get('PASSWORD_HASH_COST') or '').strip()
+    if not cost:
+        return method
+    if method.startswith('scrypt'):
+        return f'scrypt:{cost}:8:1'
+    if method.startswith('pbkdf2'):
+        digest = method.split(':')[1] if ':' in method else 'sha256'
+        return f'pbkdf2:{digest}:{cost}'
+    return method
+
+
+@lru_cache(maxsize=8)
+def _method_parameters(method):
+    """Full parameter prefix werkzeug stores for a method, e.g. 'scrypt:32768:8:1'"""
+    # Hashing once reveals the defaults werkzeug fills in for a bare method name
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def hash_password(password):
+    """Hash a password with the configured method and cost"""
+    return generate_password_hash(password, method=get_password_hash_method())
+
+
+def password_needs_rehash(password_hash):
+    """True when a stored hash was made with other parameters than the configured ones"""
+    if not password_hash or '$' not in password_hash:
+        return True
+    return password_hash.split('$', 1)[0] != _method_parameters(get_password_hash_method())
+
+
+def rehash_password_if_needed(user, password):
+    """
+    Upgrade user.password_hash after a successful login with old parameters
+
+    Lets PASSWORD_HASH_METHOD / PASSWORD_HASH_COST change without a
+    migration: every user moves to the new parameters on their next login.
+
+    Returns:
+        bool: True when the hash was replaced; the caller commits
+    """
+    if not password_needs_rehash(user.password_hash):
+        return False
+    user.password_hash = hash_password(password)
+    return True
+
+
+@lru_cache(maxsize=4)
+def _hash_secret(secret, method):
+    """Hash a configured secret once per process and method"""
+    return generate_password_hash(secret, method=method)
 
 
 def get_admin_credentials():
@@ -115,7 +159,7 @@ def get_admin_credentials():
         return {'username': None, 'password_hash': None}
     return {
         'username': username,
-        'password_hash': generate_password_hash(password)
+        'password_hash': _hash_secret(password, get_password_hash_method())
     }
 
 
@@ -124,19 +168,40 @@ def verify_password(password, password_hash):
     return check_password_hash(password_hash, password)
 
 
-# Demo credentials
-DEMO_USER_CREDENTIALS = {
-    'username': 'demo_codexx',
-    'password_hash': generate_password_hash('Demo_2026!'),
-    'is_demo': True
-}
+class LazyCredentials(Mapping):
+    """Credentials mapping whose password_hash is only computed on first access"""
+
+    def __init__(self, username, password, **extra):
+        self._password = password
+        self._data = dict(extra, username=username)
+
+    def __getitem__(self, key):
+        if key == 'password_hash':
+            return _hash_secret(self._password, get_password_hash_method())
+        return self._data[key]
+
+    def __iter__(self):
+        yield from self._data
+        yield 'password_hash'
+
+    def __len__(self):
+        return len(self._data) + 1
+
+
+# Demo credentials (hashed on first use, not at import in every worker)
+DEMO_USER_CREDENTIALS = LazyCredentials('demo_codexx', 'Demo_2026!', is_demo=True)
 
 
 __all__ = [
     'get_client_ip',
     'check_rate_limit',
     'log_ip_activity',
+    'get_security_log_page',
     'get_admin_credentials',
+    'get_password_hash_method',
+    'hash_password',
+    'password_needs_rehash',
+    'rehash_password_if_needed',
     'verify_password',
     'log_audit_event',
     'DEMO_USER_CREDENTIALS'
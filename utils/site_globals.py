@@ -0,0 +1,179 @@
+"""
+Site Globals Module - Cached theme and footer links for the context processor
+
+Every render_template runs inject_global_vars, including error pages and
+bot 404s. The two values it needs from the database, the viewer's theme
+and the admin workspace's social links (platform footer), come from a
+small cache instead of a workspace load per render, and are handed to the
+template as lazy values that only resolve when the template reads them.
+
+The cache follows the access cache (utils/access.py): a per-worker LRU
+whose entries live for SITE_GLOBALS_CACHE_TTL seconds, optionally backed
+by a SQLite file shared by the workers on the host. save_data() drops the
+saved workspace's entry in both; other workers' local entries expire.
+"""
+
+import time
+from flask import current_app
+from werkzeug.local import LocalProxy
+from extensions import db
+from models import Workspace
+from .cache import LRUCache, SQLiteCacheBackend
+from .data import get_request_cache
+from .worker_state import app_singleton
+
+
+DEFAULT_THEME = 'luxury-gold'
+ADMIN_WORKSPACE = 'admin'
+
+
+class WorkspaceGlobalsCache:
+    """slug -> {'theme', 'social'}, with a TTL on the local level"""
+
+    def __init__(self, max_entries=1024, ttl=30, backend=None):
+        self.local = LRUCache(max_entries)
+        self.ttl = ttl
+        self.backend = backend
+        self.reads = 0
+
+    def get(self, slug):
+        entry = self.local.get(slug)
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                return value
+            self.local.delete(slug)
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(f'globals:{slug}')
+            except Exception as e:
+                current_app.logger.warning(f"Shared globals cache read failed: {str(e)}")
+                shared = None
+            if shared is not None:
+                self.local.set(slug, (shared[1], time.time()))
+                return shared[1]
+        return None
+
+    def set(self, slug, value):
+        self.local.set(slug, (value, time.time()))
+        if self.backend is not None:
+            try:
+                self.backend.set(f'globals:{slug}', 0, value)
+            except Exception as e:
+                current_app.logger.warning(f"Shared globals cache write failed: {str(e)}")
+
+    def invalidate(self, slug):
+        self.local.delete(slug)
+        if self.backend is not None:
+            try:
+                self.backend.delete(f'globals:{slug}')
+            except Exception as e:
+                current_app.logger.warning(f"Shared globals cache delete failed: {str(e)}")
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['reads'] = self.reads
+        return stats
+
+
+def _create_globals_cache(app):
+    config = app.config
+    backend = None
+    if config.get('SITE_GLOBALS_CACHE_BACKEND') == 'sqlite':
+        try:
+            backend = SQLiteCacheBackend(
+                config.get('SITE_GLOBALS_CACHE_PATH', 'cache/globals.sqlite3'),
+                max_entries=config.get('SITE_GLOBALS_CACHE_MAX_ENTRIES', 1024)
+            )
+        except Exception as e:
+            app.logger.error(f"Could not open shared globals cache: {str(e)}")
+    return WorkspaceGlobalsCache(
+        config.get('SITE_GLOBALS_CACHE_MAX_ENTRIES', 1024),
+        config.get('SITE_GLOBALS_CACHE_TTL', 30),
+        backend
+    )
+
+
+def get_globals_cache():
+    """Get the site globals cache for the current app"""
+    return app_singleton('site_globals_cache', _create_globals_cache)
+
+
+def workspace_globals(slug):
+    """
+    Theme and social links of a workspace
+
+    Reuses the workspace when this request already loaded it, otherwise
+    reads the cache and, on a miss, the two columns.
+
+    Returns:
+        dict: {'theme': str, 'social': dict}; defaults when there is no workspace
+    """
+    request_cache = get_request_cache()
+    if request_cache is not None:
+        entry = request_cache['portfolios'].get(slug)
+        if entry:
+            data = entry['data']
+            return {
+                'theme': (data.get('settings') or {}).get('theme', DEFAULT_THEME),
+                'social': data.get('social') or {}
+            }
+
+    cache = get_globals_cache()
+    value = cache.get(slug)
+    if value is None:
+        cache.reads += 1
+        row = db.session.query(Workspace.settings, Workspace.social).filter_by(slug=slug).first()
+        settings, social = row if row is not None else ({}, {})
+        value = {
+            'theme': (settings or {}).get('theme', DEFAULT_THEME),
+            'social': social or {}
+        }
+        cache.set(slug, value)
+    return value
+
+
+def get_user_theme(username):
+    """Theme of a user's workspace (the default for anonymous visitors)"""
+    if not username:
+        return DEFAULT_THEME
+    return workspace_globals(username)['theme']
+
+
+def get_admin_social():
+    """Social links of the admin workspace, shown in the platform footer"""
+    return workspace_globals(ADMIN_WORKSPACE)['social']
+
+
+def invalidate_workspace_globals(slug):
+    """Drop a workspace's cached theme and social links"""
+    get_globals_cache().invalidate(slug)
+
+
+def lazy(factory):
+    """
+    Template value computed on first use, at most once per render
+
+    Returns a proxy that behaves like factory()'s result in Jinja
+    (printing, comparisons, attribute and item access, concatenation).
+    """
+    resolved = []
+
+    def resolve():
+        if not resolved:
+            resolved.append(factory())
+        return resolved[0]
+
+    return LocalProxy(resolve)
+
+
+__all__ = [
+    'DEFAULT_THEME',
+    'WorkspaceGlobalsCache',
+    'get_globals_cache',
+    'workspace_globals',
+    'get_user_theme',
+    'get_admin_social',
+    'invalidate_workspace_globals',
+    'lazy'
+]
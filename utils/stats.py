@@ -0,0 +1,180 @@
+"""
+Stats Module - Incrementally maintained per-workspace counters
+
+WorkspaceStats holds one row of counters per workspace. Every write path
+adjusts it in the same transaction as the change itself (the caller
+commits), dashboards read that single row instead of counting tables, and
+reconcile_workspace_stats() rebuilds the rows from scratch when they drift.
+"""
+
+from datetime import datetime
+from sqlalchemy import case, func, or_, select
+from extensions import db
+from models import Workspace, WorkspaceStats, Project, Skill, Service, Client, Message, VisitorLog
+
+
+COUNTER_FIELDS = (
+    'projects', 'skills', 'services', 'clients',
+    'messages', 'unread_messages', 'visitors_total'
+)
+
+
+def utc_today():
+    return datetime.utcnow().date()
+
+
+def count_workspace(workspace_id):
+    """Count every tracked table for one workspace in a single SELECT"""
+    def count(model, *criteria):
+        return select(func.count()).select_from(model).where(
+            model.workspace_id == workspace_id, *criteria
+        ).scalar_subquery()
+
+    today_start = datetime.combine(utc_today(), datetime.min.time())
+    row = db.session.query(
+        count(Project).label('projects'),
+        count(Skill).label('skills'),
+        count(Service).label('services'),
+        count(Client).label('clients'),
+        count(Message).label('messages'),
+        count(Message, Message.is_read.is_(False)).label('unread_messages'),
+        count(VisitorLog).label('visitors_total'),
+        count(VisitorLog, VisitorLog.created_at >= today_start).label('visitors_today')
+    ).one()
+    return row._asdict()
+
+
+def recompute_workspace_stats(workspace_id):
+    """Rebuild (or create) the stats row for a workspace; the caller commits"""
+    stats = db.session.get(WorkspaceStats, workspace_id)
+    if stats is None:
+        stats = WorkspaceStats(workspace_id=workspace_id)
+        db.session.add(stats)
+    for field, value in count_workspace(workspace_id).items():
+        setattr(stats, field, value or 0)
+    stats.visitors_day = utc_today()
+    return stats
+
+
+def adjust_workspace_stats(workspace_id, **deltas):
+    """
+    Apply counter deltas, e.g. adjust_workspace_stats(ws_id, projects=1)
+
+    Runs as one UPDATE ... SET col = col + delta inside the caller's
+    transaction. Call it after the change it accounts for: a missing row
+    is rebuilt by counting, which already sees the change.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not workspace_id or not deltas:
+        return
+    updated = db.session.query(WorkspaceStats).filter_by(workspace_id=workspace_id).update(
+        {getattr(WorkspaceStats, field): getattr(WorkspaceStats, field) + delta
+         for field, delta in deltas.items()},
+        synchronize_session=False
+    )
+    if not updated:
+        recompute_workspace_stats(workspace_id)
+
+
+def record_visit(workspace_id, count=1, day=None):
+    """
+    Count portfolio visits made on day (today by default)
+
+    visitors_today restarts when day is newer than visitors_day. Visits
+    from an older day (a late batch flushed after another worker moved
+    to a new day) only add to visitors_total.
+
+    Returns:
+        bool: True when the stats row was missing and rebuilt by counting,
+        which already includes every visit inserted in this transaction
+    """
+    day = day or utc_today()
+    current_day = WorkspaceStats.visitors_day
+    updated = db.session.query(WorkspaceStats).filter_by(workspace_id=workspace_id).update({
+        WorkspaceStats.visitors_total: WorkspaceStats.visitors_total + count,
+        WorkspaceStats.visitors_today: case(
+            (current_day == day, WorkspaceStats.visitors_today + count),
+            (or_(current_day.is_(None), current_day < day), count),
+            else_=WorkspaceStats.visitors_today
+        ),
+        WorkspaceStats.visitors_day: case((current_day > day, current_day), else_=day)
+    }, synchronize_session=False)
+    if not updated:
+        recompute_workspace_stats(workspace_id)
+        return True
+    return False
+
+
+def _message_counts_by_workspace(query):
+    """(workspace_id, total, unread) for the rows of a Message query"""
+    unread = func.sum(case((Message.is_read.is_(False), 1), else_=0))
+    return query.with_entities(Message.workspace_id, func.count(Message.id), unread).group_by(
+        Message.workspace_id
+    ).all()
+
+
+def adjust_for_removed_messages(query):
+    """
+    Decrement message counters for the rows a Message query is about to delete
+
+    Call before query.delete(); the rows may span several workspaces
+    (replies are stored under the sender's workspace).
+    """
+    for workspace_id, total, unread_total in _message_counts_by_workspace(query):
+        adjust_workspace_stats(workspace_id, messages=-total, unread_messages=-(unread_total or 0))
+
+
+def adjust_for_read_messages(query):
+    """Decrement unread counters for the rows a Message query is about to mark read"""
+    for workspace_id, _, unread_total in _message_counts_by_workspace(query):
+        adjust_workspace_stats(workspace_id, unread_messages=-(unread_total or 0))
+
+
+def stats_to_dict(stats):
+    result = {field: getattr(stats, field) or 0 for field in COUNTER_FIELDS}
+    result['visitors_today'] = (stats.visitors_today or 0) if stats.visitors_day == utc_today() else 0
+    return result
+
+
+def get_workspace_stats(workspace_id):
+    """
+    Read the counters for one workspace
+
+    Never commits. A missing row is rebuilt in the session and stored by
+    the caller's next commit (or `flask reconcile-stats`).
+
+    Returns:
+        dict: COUNTER_FIELDS plus visitors_today
+    """
+    stats = db.session.get(WorkspaceStats, workspace_id)
+    if stats is None:
+        stats = recompute_workspace_stats(workspace_id)
+    return stats_to_dict(stats)
+
+
+def reconcile_workspace_stats(batch_size=200):
+    """
+    Recompute every workspace's counters from the source tables
+
+    Returns:
+        int: Number of workspaces reconciled
+    """
+    workspace_ids = [row[0] for row in db.session.query(Workspace.id).order_by(Workspace.id)]
+    for index, workspace_id in enumerate(workspace_ids, start=1):
+        recompute_workspace_stats(workspace_id)
+        if index % batch_size == 0:
+            db.session.commit()
+    db.session.commit()
+    return len(workspace_ids)
+
+
+__all__ = [
+    'COUNTER_FIELDS',
+    'adjust_workspace_stats',
+    'adjust_for_removed_messages',
+    'adjust_for_read_messages',
+    'record_visit',
+    'recompute_workspace_stats',
+    'get_workspace_stats',
+    'reconcile_workspace_stats'
+]
@@ -0,0 +1,179 @@
+"""
+Threads Module - Summary columns for message conversations
+
+Every top-level Message carries its thread summary: reply count, unread
+replies for each side (admin / user) and the time and preview of the last
+reply. Writers update the parent row in the same transaction as the reply
+(the caller commits), so thread lists render from the parent rows alone.
+backfill_thread_summaries() rebuilds every summary from the replies.
+"""
+
+from datetime import datetime
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import aliased
+from extensions import db
+from models import Message
+from .stats import adjust_for_read_messages
+
+
+PREVIEW_LENGTH = 200
+
+
+def reply_preview(text):
+    """Single-line preview of a reply, truncated to PREVIEW_LENGTH"""
+    text = ' '.join((text or '').split())
+    if len(text) > PREVIEW_LENGTH:
+        text = text[:PREVIEW_LENGTH - 3] + '...'
+    return text
+
+
+def _from_admin():
+    return func.coalesce(Message.sender_role, '') == 'admin'
+
+
+def unread_counter(sender_role):
+    """Summary column counting a reply from sender_role as unread"""
+    # Replies from the admin wait for the user, everything else for the admin side
+    return Message.user_unread_count if sender_role == 'admin' else Message.admin_unread_count
+
+
+def record_reply(parent, reply):
+    """
+    Add a new reply to its parent's summary with one UPDATE
+
+    Args:
+        parent (Message): Top-level message being replied to
+        reply (Message): The reply, added to the session but not committed
+    """
+    counter = unread_counter(reply.sender_role)
+    Message.query.filter(Message.id == parent.id).update({
+        Message.reply_count: Message.reply_count + 1,
+        counter: counter + 1,
+        Message.last_reply_at: reply.created_at or datetime.utcnow(),
+        Message.last_reply_preview: reply_preview(reply.message)
+    }, synchronize_session=False)
+
+
+def mark_thread_read(parent, is_admin):
+    """
+    Mark the replies waiting for the viewer's side as read
+
+    Args:
+        parent (Message): Top-level message being viewed
+        is_admin (bool): Whether the viewer is the platform admin
+
+    Returns:
+        bool: True when replies were marked; the caller commits
+    """
+    counter = Message.admin_unread_count if is_admin else Message.user_unread_count
+    if not getattr(parent, counter.key):
+        return False
+    waiting = ~_from_admin() if is_admin else _from_admin()
+    query = Message.query.filter(
+        Message.parent_id == parent.id,
+        Message.is_read == False,
+        waiting
+    )
+    adjust_for_read_messages(query)
+    query.update({Message.is_read: True}, synchronize_session=False)
+    Message.query.filter(Message.id == parent.id).update({counter: 0}, synchronize_session=False)
+    return True
+
+
+def summarize_replies(parent_ids=None):
+    """
+    Compute thread summaries from the replies table
+
+    Args:
+        parent_ids (list, optional): Restrict to these threads
+
+    Returns:
+        dict: {parent_id: summary column values}
+    """
+    parent = aliased(Message)
+    # Joining the parent skips orphaned replies whose thread was removed
+    query = db.session.query(
+        Message.parent_id,
+        func.count(Message.id),
+        func.sum(case((db.and_(Message.is_read == False, ~_from_admin()), 1), else_=0)),
+        func.sum(case((db.and_(Message.is_read == False, _from_admin()), 1), else_=0)),
+        func.max(Message.created_at)
+    ).join(parent, parent.id == Message.parent_id).filter(parent.parent_id.is_(None))
+    if parent_ids is not None:
+        query = query.filter(Message.parent_id.in_(parent_ids))
+    summaries = {}
+    for parent_id, total, admin_unread, user_unread, last_at in query.group_by(Message.parent_id):
+        summaries[parent_id] = {
+            'reply_count': total,
+            'admin_unread_count': admin_unread or 0,
+            'user_unread_count': user_unread or 0,
+            'last_reply_at': last_at,
+            'last_reply_preview': None
+        }
+    if not summaries:
+        return summaries
+
+    # Preview of the newest reply of each thread
+    latest = db.session.query(
+        Message.parent_id.label('parent_id'),
+        func.max(Message.created_at).label('created_at')
+    ).filter(Message.parent_id.isnot(None))
+    if parent_ids is not None:
+        latest = latest.filter(Message.parent_id.in_(parent_ids))
+    latest = latest.group_by(Message.parent_id).subquery()
+    rows = db.session.query(Message.parent_id, Message.message).join(
+        latest, db.and_(
+            Message.parent_id == latest.c.parent_id,
+            Message.created_at == latest.c.created_at
+        )
+    )
+    for parent_id, text in rows:
+        if parent_id in summaries:
+            summaries[parent_id]['last_reply_preview'] = reply_preview(text)
+    return summaries
+
+
+def recompute_thread_summary(parent_id):
+    """Rebuild one thread's summary, e.g. after a reply is deleted; the caller commits"""
+    values = summarize_replies([parent_id]).get(parent_id) or empty_summary()
+    Message.query.filter(Message.id == parent_id).update(values, synchronize_session=False)
+
+
+def empty_summary():
+    return {
+        'reply_count': 0,
+        'admin_unread_count': 0,
+        'user_unread_count': 0,
+        'last_reply_at': None,
+        'last_reply_preview': None
+    }
+
+
+def backfill_thread_summaries(batch_size=500):
+    """
+    Recompute the summary of every top-level message from its replies
+
+    Returns:
+        int: Number of threads that have replies
+    """
+    Message.query.filter(Message.parent_id.is_(None)).update(
+        empty_summary(), synchronize_session=False
+    )
+    summaries = summarize_replies()
+    rows = [dict(values, id=parent_id) for parent_id, values in summaries.items()]
+    for start in range(0, len(rows), batch_size):
+        # Bulk UPDATE by primary key
+        db.session.execute(update(Message), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
+
+
+__all__ = [
+    'PREVIEW_LENGTH',
+    'reply_preview',
+    'record_reply',
+    'mark_thread_read',
+    'summarize_replies',
+    'recompute_thread_summary',
+    'backfill_thread_summaries'
+]
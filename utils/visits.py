@@ -0,0 +1,187 @@
+"""
+Visits Module - Buffered, batched visitor-log ingestion
+
+track_visitor() runs inside every public portfolio request. Instead of a
+write transaction per page view, visits are appended to a per-worker
+buffer and written by a background thread: one transaction per batch with
+multi-row INSERTs into visitor_logs and one counter UPDATE per workspace
+and day (utils/stats.py). A batch goes out once VISITOR_BUFFER_BATCH_SIZE
+visits are waiting or VISITOR_BUFFER_FLUSH_MS after the oldest one.
+
+The buffer is bounded by VISITOR_BUFFER_MAX_PENDING; beyond that visits
+are dropped (and counted) rather than letting memory or the database
+fall behind without limit. What is buffered is flushed at exit.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from sqlalchemy import insert
+from extensions import db
+from models import VisitorLog
+from .stats import record_visit
+from .worker_state import ProcessLocal, app_singleton
+
+
+# Rows per INSERT statement (4 bound values each; SQLite allows 999 per statement)
+INSERT_CHUNK = 200
+
+
+class VisitBuffer(ProcessLocal):
+    """Per-worker queue of visits flushed in batches by a background thread"""
+
+    def __init__(self, app, batch_size=100, flush_interval=1.0, max_pending=10000):
+        self.app = app
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_pending = max(1, int(max_pending))
+        self.counters = {'recorded': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'failed': 0}
+        self._reset()
+
+    def _reset(self):
+        super()._reset()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._oldest = None
+        self._running = True
+
+    def add(self, workspace_id, ip_address):
+        """
+        Queue one visit
+
+        Returns:
+            bool: False when the buffer is full (or closed) and the visit was dropped
+        """
+        self._check_pid()
+        row = {
+            'id': str(uuid.uuid4()),
+            'workspace_id': workspace_id,
+            'ip_address': ip_address,
+            'created_at': datetime.utcnow()
+        }
+        with self._condition:
+            if not self._running or len(self._pending) >= self.max_pending:
+                self.counters['dropped'] += 1
+                return False
+            if not self._pending:
+                # Starts the flush timer of an idle thread
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            self._pending.append(row)
+            self.counters['recorded'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+            self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='visit-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and len(self._pending) < self.batch_size:
+                    if self._pending:
+                        remaining = self._oldest + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if not self._running:
+                    return
+            self.flush()
+
+    def _take(self):
+        with self._condition:
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.batch_size))]
+            self._oldest = time.monotonic() if self._pending else None
+            return batch
+
+    def flush(self):
+        """Write everything buffered now, one batch per transaction"""
+        with self._flush_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                with self.app.app_context():
+                    self._write(batch)
+
+    def _write(self, batch):
+        try:
+            for start in range(0, len(batch), INSERT_CHUNK):
+                db.session.execute(insert(VisitorLog).values(batch[start:start + INSERT_CHUNK]))
+            # Oldest day first, so a batch spanning midnight leaves today's count
+            visits = Counter((row['created_at'].date(), row['workspace_id']) for row in batch)
+            rebuilt = set()
+            for (day, workspace_id), count in sorted(visits.items()):
+                # A rebuilt row already counted this batch's later days too
+                if workspace_id not in rebuilt and record_visit(workspace_id, count=count, day=day):
+                    rebuilt.add(workspace_id)
+            db.session.commit()
+            self.counters['written'] += len(batch)
+            self.counters['batches'] += 1
+        except Exception as e:
+            db.session.rollback()
+            self.counters['failed'] += len(batch)
+            self.app.logger.error(f"Could not write {len(batch)} visitor log rows: {str(e)}")
+
+    def close(self):
+        """Stop the background thread and flush what is buffered (at exit)"""
+        if self._forked():
+            return
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(5)
+        self.flush()
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update({
+            'pending': self.pending(),
+            'batch_size': self.batch_size,
+            'flush_interval_ms': int(self.flush_interval * 1000),
+            'max_pending': self.max_pending
+        })
+        return stats
+
+
+def _create_visit_buffer(app):
+    config = app.config
+    if not config.get('VISITOR_BUFFER_ENABLED', True):
+        return None
+    return VisitBuffer(
+        app,
+        batch_size=config.get('VISITOR_BUFFER_BATCH_SIZE', 100),
+        flush_interval=config.get('VISITOR_BUFFER_FLUSH_MS', 1000) / 1000,
+        max_pending=config.get('VISITOR_BUFFER_MAX_PENDING', 10000)
+    )
+
+
+def get_visit_buffer():
+    """
+    Get this worker's visit buffer for the current app
+
+    Returns:
+        VisitBuffer | None: None when VISITOR_BUFFER_ENABLED is off (visits are written inline)
+    """
+    return app_singleton('visit_buffer', _create_visit_buffer, VisitBuffer.close)
+
+
+__all__ = [
+    'VisitBuffer',
+    'get_visit_buffer'
+]
@@ -0,0 +1,68 @@
+"""
+Worker State Module - Per-app singletons and fork-safe per-process state
+
+Caches, pools, buffers and dispatchers are built on first use and kept in
+current_app.extensions, one per app (app_singleton()). Those that own
+threads, locks or queues derive from ProcessLocal: that state belongs to
+the process that created it, and gunicorn may fork workers from a master
+that already built the object, so a forked copy rebuilds it on first use
+instead of waiting on the parent's threads.
+"""
+
+import atexit
+import os
+from flask import current_app
+
+
+class ProcessLocal:
+    """
+    Base for objects whose threads, locks and queues belong to one process
+
+    Subclasses create that state in _reset(), calling super()._reset()
+    first; __init__ calls it, and _check_pid() calls it again in a forked
+    process.
+    """
+
+    def _reset(self):
+        """(Re)create per-process state"""
+        self._pid = os.getpid()
+
+    def _forked(self):
+        """Whether this process is not the one that created the state"""
+        return os.getpid() != self._pid
+
+    def _check_pid(self):
+        """Rebuild per-process state after a fork"""
+        if self._forked():
+            self._reset()
+
+
+def app_singleton(key, factory, on_exit=None):
+    """
+    Get the current app's object stored under key, creating it on first use
+
+    Args:
+        key (str): Name in current_app.extensions
+        factory (callable): factory(app) builds the object, or returns None
+            when it is disabled in config (nothing is stored then)
+        on_exit (callable, optional): on_exit(obj) is registered with
+            atexit once the object exists (e.g. to drain a queue)
+
+    Returns:
+        The object, or None when the factory returned None
+    """
+    obj = current_app.extensions.get(key)
+    if obj is None:
+        obj = factory(current_app._get_current_object())
+        if obj is None:
+            return None
+        current_app.extensions[key] = obj
+        if on_exit is not None:
+            atexit.register(on_exit, obj)
+    return obj
+
+
+__all__ = [
+    'ProcessLocal',
+    'app_singleton'
+]